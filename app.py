@@ -1,12 +1,23 @@
 import streamlit as st
 import os
-import tempfile
 import base64
-from doc_extraction import PDFProcessor
-from md_generator import process_json_to_markdown, TextGenerator
-from text2speech import text_to_speech
+import json
+import uuid
+from dotenv import load_dotenv
+from extraction_cache import hash_bytes
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+import services
+from tracing import get_tracer
+from resilience import get_metrics
+from llm_cache import get_llm_cache
+from storage import get_storage
+from job_queue import JobQueue, start_workers, DONE, FAILED
 import streamlit.components.v1 as components
 
+load_dotenv()
+# Load the processing backends in the background while the page renders
+services.preload()
+
 # Set page configuration
 st.set_page_config(
     page_title="PDF to Markdown Converter",
@@ -101,23 +112,35 @@ st.markdown("""
 st.markdown('<h1 class="main-header">PDF a Markdown Converter</h1>', unsafe_allow_html=True)
 st.markdown('''
     Esta aplicación convierte documentos PDF en formato Markdown estructurado.
-    Sube un PDF de 1-2 páginas y obtén el código Markdown generado junto con una vista previa renderizada.
+    Sube un PDF y obtén el código Markdown generado junto con una vista previa renderizada.
 ''')
 
-# Create a temporary directory to store uploaded files
-temp_dir = tempfile.TemporaryDirectory()
+# Files and texts of this browser session are kept in the shared session
+# storage, which removes them once the session is idle or over the quota.
+# The session state only holds their paths.
+storage = get_storage()
+session_id = st.session_state.setdefault("storage_session", uuid.uuid4().hex)
+storage.touch(session_id)
+
+def load_text(key):
+    """Read a stored text whose path is in the session state, forgetting it if it was collected"""
+    path = st.session_state.get(key)
+    text = storage.read_text(path) if path else None
+    if path and text is None:
+        st.session_state.pop(key)
+    return text
 
 # Function to display PDF
-@st.cache_data(ttl=300)
-def display_pdf(file_path):
+@st.cache_data(ttl=300, max_entries=8)
+def display_pdf(pdf_hash, _pdf_buffer):
+    """Build the embed HTML for a PDF buffer
+
+    The buffer is skipped by Streamlit's argument hashing (leading underscore);
+    pdf_hash identifies the content instead.
+    """
     try:
-        # Read file in chunks for better memory management
-        with open(file_path, "rb") as f:
-            chunk_size = 1024 * 1024  # 1MB chunks
-            content = b""
-            while chunk := f.read(chunk_size):
-                content += chunk
-            base64_pdf = base64.b64encode(content).decode('utf-8')
+        # Encode straight from the upload buffer, without an intermediate copy
+        base64_pdf = base64.b64encode(_pdf_buffer).decode('ascii')
 
         # Optimized PDF display with preload attribute and explicit dimensions
         pdf_display = f'''
@@ -137,76 +160,154 @@ def display_pdf(file_path):
         st.error(f"Error al cargar el PDF: {str(e)}")
         return None
 
+# Background conversion workers, enabled with JOB_WORKERS=<number of processes>
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "0"))
+
+@st.cache_resource
+def get_job_queue():
+    """Create the job queue and start its worker processes once per server"""
+    queue = JobQueue()
+    start_workers(JOB_WORKERS, queue.db_path, queue.job_dir)
+    return queue
+
+@st.fragment(run_every=2)
+def show_job_status():
+    """Poll the queued conversion and load its result when it finishes"""
+    job_id = st.session_state.get("job_id")
+    job = get_job_queue().get(job_id) if job_id else None
+    if job is None:
+        return
+    if job["status"] == DONE:
+        st.session_state.markdown_path = storage.put_text(session_id, job["result"]["markdown"], ".md")
+        if job["result"]["audio_text"]:
+            st.session_state.audio_text_path = storage.put_text(session_id, job["result"]["audio_text"])
+        st.session_state.pop("job_id")
+        st.rerun()
+    elif job["status"] == FAILED:
+        st.session_state.job_error = job["error"]
+        st.session_state.pop("job_id")
+        st.rerun()
+    else:
+        stage = job["stage"] or "en cola"
+        st.info(f"Conversión en curso ({stage})...")
+
 # Main layout with columns
 col1, col2 = st.columns(2)
 
+# Result column header and a placeholder where markdown is streamed while it is generated
+with col2:
+    st.markdown('<h2 class="sub-header">Resultado Markdown</h2>', unsafe_allow_html=True)
+    markdown_stream_placeholder = st.empty()
+
 with col1:
     st.markdown('<h2 class="sub-header">Subir PDF</h2>', unsafe_allow_html=True)
-    uploaded_file = st.file_uploader("Selecciona un archivo PDF (1-2 páginas)", type="pdf")
+    uploaded_file = st.file_uploader("Selecciona un archivo PDF", type="pdf")
     
     if uploaded_file is not None:
-        # Save the uploaded file to a temporary location
-        temp_pdf_path = os.path.join(temp_dir.name, uploaded_file.name)
-        with open(temp_pdf_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
+        # Work on the uploaded buffer directly instead of a temporary file copy
+        pdf_buffer = uploaded_file.getbuffer()
+        pdf_hash = hash_bytes(pdf_buffer)
         
         # Display the uploaded PDF
         st.markdown("### PDF Subido")
-        st.markdown(display_pdf(temp_pdf_path), unsafe_allow_html=True)
+        st.markdown(display_pdf(pdf_hash, pdf_buffer), unsafe_allow_html=True)
         
         # Process button
         if st.button("Convertir a Markdown"):
-            with st.spinner("Procesando PDF..."):
-                # Process the PDF using the existing framework
-                processor = PDFProcessor()
-                result = processor.process_pdf(temp_pdf_path)
+            if JOB_WORKERS:
+                # Queue the conversion for the worker pool; it keeps running
+                # across reruns and if the user navigates away
+                st.session_state.job_id = get_job_queue().submit(pdf_buffer, uploaded_file.name)
+            else:
+                with st.spinner("Procesando PDF..."), get_tracer().span("conversion", filename=uploaded_file.name) as conversion_span:
+                    st.session_state.setdefault("trace_ids", {})["Conversión"] = conversion_span.trace_id
+                    # Process the PDF using the existing framework
+                    processor = services.PDFProcessor()
+                    result = processor.process_pdf_bytes(pdf_buffer, uploaded_file.name, content_hash=pdf_hash)
                 
-                if result:
-                    try:
-                        # Generate descriptive text for audio
-                        text_generator = TextGenerator()
-                        audio_text = text_generator.generate_text(result)
+                    if result:
+                        if result.get("failed_pages"):
+                            pages = ", ".join(str(page + 1) for page in result["failed_pages"])
+                            st.warning(f"No se pudieron extraer las páginas {pages}; el resultado está incompleto.")
+                        try:
+                            # Stream the markdown into the result column while the
+                            # descriptive text for audio is generated in the background
+                            markdown_stream, narration_future = services.stream_outputs(result)
+                            markdown_content, markdown_error = "", None
+                            try:
+                                for piece in markdown_stream:
+                                    markdown_content += piece
+                                    markdown_stream_placeholder.markdown(markdown_content, unsafe_allow_html=True)
+                            except Exception as e:
+                                # A window failed midway; what was streamed is only part of the document
+                                markdown_error = str(e)
+                            markdown_stream_placeholder.empty()
+                        
+                            try:
+                                audio_text = narration_future.result(timeout=services.DEFAULT_LLM_TIMEOUT)
+                            except FuturesTimeoutError:
+                                audio_text = None
                         
-                        # Process JSON to markdown using md_generator
-                        markdown_content = process_json_to_markdown(result)
+                            # Keep whichever side succeeded, even if the other one failed
+                            markdown_done = bool(markdown_content) and markdown_error is None
+                            if markdown_done:
+                                st.session_state.markdown_path = storage.put_text(session_id, markdown_content, ".md")
+                                # The first document loads the embedding model, so it is indexed in the background
+                                services.index_markdown_in_background(os.path.splitext(uploaded_file.name)[0], markdown_content)
+                            if audio_text:
+                                st.session_state.audio_text_path = storage.put_text(session_id, audio_text)
                         
-                        if markdown_content and audio_text:
-                            # Store the markdown content and audio text in session state
-                            st.session_state.markdown_content = markdown_content
-                            st.session_state.audio_text = audio_text
-                            st.success("¡Conversión a Markdown completada!")
-                        else:
-                            st.error("Error al generar el markdown.")
-                    except Exception as e:
-                        st.error(f"Error durante la conversión: {str(e)}")
-                else:
-                    st.error("Error al procesar el PDF.")
+                            if markdown_done and audio_text:
+                                st.success("¡Conversión a Markdown completada!")
+                            elif markdown_done:
+                                st.warning("Markdown generado, pero falló el texto para audio.")
+                            elif markdown_error is not None:
+                                st.error(f"La conversión a Markdown quedó incompleta: {markdown_error}")
+                            else:
+                                st.error("Error al generar el markdown.")
+                        except Exception as e:
+                            st.error(f"Error durante la conversión: {str(e)}")
+                    else:
+                        st.error("Error al procesar el PDF.")
+
+    if JOB_WORKERS and st.session_state.get("job_id"):
+        show_job_status()
+    if "job_error" in st.session_state:
+        st.error(f"Error durante la conversión: {st.session_state.pop('job_error')}")
 
     # Audio section - Moved outside the PDF processing block
     st.markdown('---')
     st.markdown('<h2 class="sub-header">Generación de Audio</h2>', unsafe_allow_html=True)
     st.markdown("Convierte el contenido del documento en audio para una experiencia más accesible.")
     
-    if 'audio_text' in st.session_state:
+    audio_text = load_text("audio_text_path")
+    if audio_text:
         if st.button("Generar Audio", key="generate_audio"):
-            with st.spinner("Generando audio..."):
+            with st.spinner("Generando audio..."), get_tracer().span("audio") as audio_span:
+                st.session_state.setdefault("trace_ids", {})["Audio"] = audio_span.trace_id
                 try:
-                    # Save audio text to a temporary text file for TTS
-                    temp_text_path = os.path.join(temp_dir.name, "temp_markdown.txt")
-                    with open(temp_text_path, "w", encoding="utf-8") as f:
-                        f.write(st.session_state.audio_text)
+                    # The stored narration is the TTS input file
+                    text_path = st.session_state.audio_text_path
+                    
+                    st.markdown("### 🎧 Resumen de Audio - Haz clic para escuchar")
+                    audio_placeholder = st.empty()
+                    
+                    def play_first_segment(index, segment_path):
+                        # Start playback while the remaining segments are synthesized
+                        if index == 0:
+                            audio_placeholder.audio(segment_path)
                     
                     # Generate audio from the markdown content
-                    audio_result = text_to_speech(
-                        input_file_path=temp_text_path,
-                        output_file_path=os.path.join(temp_dir.name, "output_audio.wav"),
-                        voice_name="af_jessica"
+                    audio_result = services.text_to_speech(
+                        input_file_path=text_path,
+                        output_file_path=storage.scratch_path(session_id, ".wav"),
+                        voice_name="af_jessica",
+                        on_segment=play_first_segment
                     )
                     
                     if audio_result:
-                        audio_path = audio_result[0]
-                        st.markdown("### 🎧 Resumen de Audio - Haz clic para escuchar")
-                        st.audio(audio_path)
+                        audio_path = storage.put_file(session_id, audio_result[0])
+                        audio_placeholder.audio(audio_path)
                         st.success("¡Audio generado exitosamente!")
                     else:
                         st.error("Error al generar el audio.")
@@ -216,20 +317,19 @@ with col1:
         st.info("Primero sube y procesa un PDF para generar el audio.")
 
 with col2:
-    st.markdown('<h2 class="sub-header">Resultado Markdown</h2>', unsafe_allow_html=True)
-    
     # Create tabs for raw markdown and rendered preview
     tab1, tab2 = st.tabs(["Código Markdown", "Vista Previa"])
+    markdown_content = load_text("markdown_path")
     
     with tab1:
-        if 'markdown_content' in st.session_state:
+        if markdown_content:
             # Display the markdown code with syntax highlighting only
-            st.code(st.session_state.markdown_content, language="markdown")
+            st.code(markdown_content, language="markdown")
             
             # Add download button for markdown
             st.download_button(
                 label="Descargar Markdown",
-                data=st.session_state.markdown_content,
+                data=markdown_content,
                 file_name="converted_markdown.md",
                 mime="text/markdown"
             )
@@ -238,21 +338,52 @@ with col2:
             st.info("Sube un PDF y haz clic en 'Convertir a Markdown' para ver el resultado.")
     
     with tab2:
-        if 'markdown_content' in st.session_state:
+        if markdown_content:
             # Direct rendering of markdown with HTML support
-            st.markdown(st.session_state.markdown_content, unsafe_allow_html=True)
+            st.markdown(markdown_content, unsafe_allow_html=True)
         else:
             st.info("Sube un PDF y haz clic en 'Convertir a Markdown' para ver la vista previa.")
 
-# Footer
-st.markdown("---")
-st.markdown("Desarrollado con ❤️ usando Streamlit, Langchain, Landing AI y Groq LLM")
+# Search over every converted document
+st.markdown('---')
+st.markdown('<h2 class="sub-header">Buscar en los documentos</h2>', unsafe_allow_html=True)
+question = st.text_input("Pregunta sobre los documentos convertidos")
+if question and not services.index_ready():
+    services.load_index_in_background()
+    st.info("El índice de búsqueda se está cargando; vuelve a intentarlo en unos segundos.")
+elif question:
+    hits = services.get_index().search(question)
+    if hits:
+        for hit in hits:
+            location = " > ".join(hit["headers"]) or "Sin encabezado"
+            with st.expander(f"{hit['document']}: {location} ({hit['score']:.2f})"):
+                st.markdown(hit["text"], unsafe_allow_html=True)
+    else:
+        st.info("Todavía no hay documentos indexados.")
 
-# Cleanup temporary directory when the app is closed
-# Note: This might not always execute in Streamlit's execution model
-def cleanup():
-    temp_dir.cleanup()
+# Optional per-stage timing panel, enabled with SHOW_TRACE_PANEL=true
+if os.getenv("SHOW_TRACE_PANEL", "").lower() in ("1", "true", "yes") and st.session_state.get("trace_ids"):
+    with st.expander("Tiempos del pipeline"):
+        for label, trace_id in st.session_state.trace_ids.items():
+            st.markdown(f"**{label}**")
+            st.dataframe([
+                {
+                    "etapa": span.name,
+                    "duración (ms)": round(span.duration_ms or 0, 1),
+                    "estado": span.status,
+                    "atributos": json.dumps(span.attributes, default=str),
+                }
+                for span in get_tracer().spans(trace_id)
+            ], use_container_width=True)
+        backend_metrics = get_metrics()
+        if backend_metrics:
+            st.markdown("**Servicios remotos**")
+            st.dataframe(backend_metrics, use_container_width=True)
+        st.markdown("**Caché de respuestas LLM**")
+        st.dataframe([get_llm_cache().stats()], use_container_width=True)
+        st.markdown("**Almacenamiento de sesiones**")
+        st.dataframe([storage.stats()], use_container_width=True)
 
-# Register the cleanup function
-import atexit
-atexit.register(cleanup)
\ No newline at end of file
+# Footer
+st.markdown("---")
+st.markdown("Desarrollado con ❤️ usando Streamlit, Langchain, Landing AI y Groq LLM")
\ No newline at end of file
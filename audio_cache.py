@@ -0,0 +1,72 @@
+import hashlib
+import os
+import shutil
+from disk_cache import DiskCache
+from text_normalization import normalize_text
+
+DEFAULT_CACHE_DIR = os.path.join(".cache", "audio")
+DEFAULT_MAX_SIZE_MB = 1024
+
+
+class AudioCache(DiskCache):
+    """Content-addressed on-disk cache for synthesized narrations
+
+    Entries are WAV files keyed by the normalized text, voice and speed, and
+    the least recently used ones are evicted once the cache exceeds its size.
+    """
+
+    suffix = ".wav"
+
+    def __init__(self, cache_dir=None, max_size_bytes=None, enabled=None):
+        if max_size_bytes is None:
+            max_size_bytes = int(float(os.getenv("AUDIO_CACHE_MAX_MB", DEFAULT_MAX_SIZE_MB)) * 1024 * 1024)
+        if enabled is None:
+            enabled = os.getenv("AUDIO_CACHE_DISABLED", "").lower() not in ("1", "true", "yes")
+        super().__init__(
+            cache_dir or os.getenv("AUDIO_CACHE_DIR", DEFAULT_CACHE_DIR),
+            max_size_bytes, enabled=enabled
+        )
+
+    def make_key(self, text, voice_name, speed):
+        """Build the cache key for a narration
+
+        Args:
+            text (str): Narration text
+            voice_name (str): Voice used for synthesis
+            speed (float): Speech speed multiplier
+
+        Returns:
+            str: Cache key
+        """
+        payload = f"{normalize_text(text)}\0{voice_name}\0{float(speed)}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Return the path of the cached WAV for a key, or None on a miss
+
+        Args:
+            key (str): Cache key from make_key
+
+        Returns:
+            str: Path of the cached WAV file or None
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            path = self._open_entry(key)
+            self._count(path is not None)
+            return path
+
+    def set(self, key, wav_path):
+        """Copy a synthesized WAV into the cache and enforce the size limit
+
+        Args:
+            key (str): Cache key from make_key
+            wav_path (str): WAV file to store
+
+        Returns:
+            str: Path of the cached copy, or wav_path if it was not cached
+        """
+        if not self.enabled:
+            return wav_path
+        return self._store(key, lambda tmp_path: shutil.copyfile(wav_path, tmp_path)) or wav_path
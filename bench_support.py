@@ -0,0 +1,99 @@
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+# Shared by benchmark.py and the tests, so importing this module must not
+# change the environment or load the pipeline modules
+
+# Simulated LLM latencies in seconds
+LLM_FIRST_TOKEN_LATENCY = 0.05
+LLM_CHUNK_LATENCY = 0.001
+
+# Modules app.py imports before rendering the page, on top of streamlit
+APP_STARTUP_MODULES = ["extraction_cache", "services", "tracing", "resilience", "llm_cache", "storage", "job_queue"]
+
+
+def replay_llm_class(completions, first_token_latency=LLM_FIRST_TOKEN_LATENCY, chunk_latency=LLM_CHUNK_LATENCY,
+                     chunk_chars=40):
+    """Build a ChatGroq stand-in that answers with recorded completions in turn"""
+
+    class ReplayLLM:
+        calls = 0
+        # Completion characters handed to callers, to estimate tokens read
+        chars_read = 0
+
+        def __init__(self, api_key=None, model_name=None, **params):
+            self.model_name = model_name
+            self.max_tokens = params.get("max_tokens")
+
+        def _next(self):
+            completion = completions[ReplayLLM.calls % len(completions)]
+            ReplayLLM.calls += 1
+            return completion
+
+        def invoke(self, prompt):
+            completion = self._next()
+            time.sleep(first_token_latency + chunk_latency * len(completion) / chunk_chars)
+            ReplayLLM.chars_read += len(completion)
+            return AIMessage(content=completion)
+
+        async def ainvoke(self, prompt):
+            completion = self._next()
+            await asyncio.sleep(first_token_latency + chunk_latency * len(completion) / chunk_chars)
+            ReplayLLM.chars_read += len(completion)
+            return AIMessage(content=completion)
+
+        def stream(self, prompt):
+            completion = self._next()
+            # Pace chunks against a deadline so sleep overhead does not accumulate
+            deadline = time.perf_counter() + first_token_latency
+            for i in range(0, len(completion), chunk_chars):
+                deadline += chunk_latency
+                time.sleep(max(0.0, deadline - time.perf_counter()))
+                ReplayLLM.chars_read += len(completion[i:i + chunk_chars])
+                yield AIMessageChunk(content=completion[i:i + chunk_chars])
+
+        async def astream(self, prompt):
+            completion = self._next()
+            deadline = time.perf_counter() + first_token_latency
+            for i in range(0, len(completion), chunk_chars):
+                deadline += chunk_latency
+                await asyncio.sleep(max(0.0, deadline - time.perf_counter()))
+                ReplayLLM.chars_read += len(completion[i:i + chunk_chars])
+                yield AIMessageChunk(content=completion[i:i + chunk_chars])
+
+    return ReplayLLM
+
+
+def import_time_ms(modules):
+    """Import modules in a fresh interpreter and return their import time
+
+    streamlit is imported first, so only the time the modules add on top of
+    it is counted, as reported by python -X importtime.
+
+    Returns:
+        float: Cumulative import time of modules in milliseconds
+    """
+    code = "import streamlit, streamlit.components.v1; " + "; ".join(f"import {module}" for module in modules)
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    total_us = 0
+    after_streamlit = False
+    for line in completed.stderr.splitlines():
+        fields = line.split("|")
+        # Top-level imports have a single space before the module name
+        if len(fields) != 3 or fields[2].startswith("  "):
+            continue
+        name = fields[2].strip()
+        if name.startswith("streamlit"):
+            after_streamlit = True
+            total_us = 0
+        elif after_streamlit:
+            total_us += int(fields[1])
+    return total_us / 1000
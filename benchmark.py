@@ -0,0 +1,527 @@
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+import langchain_groq
+from pypdf import PdfReader, PdfWriter
+import llm_pool
+from bench_support import APP_STARTUP_MODULES, import_time_ms, replay_llm_class
+from doc_extraction import DEFAULT_PAGE_GROUP_SIZE, PDFProcessor
+from extraction_cache import DEFAULT_CACHE_DIR
+from local_extraction import text_to_chunks
+from md_generator import (
+    MARKDOWN_PROMPT_TEMPLATE, TEXT_PROMPT_TEMPLATE, build_markdown_windows, create_markdown_prompt,
+    extract_fenced_block, extract_markdown_content, markdown_prompt_variables, stream_complete
+)
+from pipeline import stream_outputs
+from prompt_serializer import compare_token_counts, count_tokens, serialize_extraction, tokenizer_name
+from spliter_doc.split import DEFAULT_OUTPUT_DIR as SAMPLE_PAGES_DIR, split_pdf_into_pages
+from text2speech import text_to_speech
+from tracing import get_tracer
+
+DEFAULT_RESULTS_DIR = ".benchmarks"
+SAMPLE_MARKDOWN_DIR = os.path.join("spliter_doc", "md_docs")
+DEFAULT_SIZES = [1, 5, 20]
+DEFAULT_CONCURRENCY = [1, 4, 8]
+DEFAULT_REPEAT = 5
+# Simulated service latencies in seconds
+REMOTE_EXTRACTION_LATENCY = 0.05
+REMOTE_EXTRACTION_PAGE_LATENCY = 0.1
+TTS_LATENCY = 0.02
+# Regressions above this fraction of the baseline p50 are flagged
+REGRESSION_THRESHOLD = 0.10
+
+
+class ReplayResponse:
+    """requests.Response stand-in carrying a recorded Landing AI payload"""
+
+    status_code = 200
+    headers = {}
+
+    def __init__(self, payload):
+        self.payload = payload
+        self.text = json.dumps(payload)
+
+    def json(self):
+        return self.payload
+
+    def raise_for_status(self):
+        pass
+
+
+class ReplaySession:
+    """requests.Session stand-in that consumes the upload and replays responses in turn"""
+
+    def __init__(self, responses, latency=REMOTE_EXTRACTION_LATENCY):
+        self.responses = responses
+        self.latency = latency
+        self.calls = 0
+
+    def post(self, url, data=None, headers=None, timeout=None):
+        for _ in data:
+            pass
+        time.sleep(self.latency)
+        response = self.responses[self.calls % len(self.responses)]
+        self.calls += 1
+        return ReplayResponse(response)
+
+    def close(self):
+        pass
+
+
+class PagedReplaySession(ReplaySession):
+    """ReplaySession that answers each upload for its own page count, taking longer per page"""
+
+    def __init__(self, page_responses, latency=REMOTE_EXTRACTION_LATENCY, page_latency=REMOTE_EXTRACTION_PAGE_LATENCY):
+        super().__init__([], latency)
+        self.page_responses = page_responses
+        self.page_latency = page_latency
+
+    def post(self, url, data=None, headers=None, timeout=None):
+        body = b"".join(bytes(chunk) for chunk in data)
+        pdf_data = body[body.index(b"%PDF"):body.rindex(b"%%EOF") + len(b"%%EOF")]
+        page_count = len(PdfReader(io.BytesIO(pdf_data)).pages)
+        time.sleep(self.latency + self.page_latency * page_count)
+        self.calls += 1
+        return ReplayResponse(build_response(self.page_responses, page_count))
+
+
+class ReplaySynthesizer:
+    """TTS stand-in writing silent WAV segments sized like real speech"""
+
+    def __init__(self, output_dir, latency=TTS_LATENCY):
+        self.output_dir = output_dir
+        self.latency = latency
+        self.calls = 0
+
+    def __call__(self, text, voice_name=None, speed=1.0):
+        time.sleep(self.latency)
+        self.calls += 1
+        path = os.path.join(self.output_dir, f"segment_{self.calls}_{id(text)}.wav")
+        with wave.open(path, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(24000)
+            # Roughly 15 characters of narration per second of audio
+            wav.writeframes(b"\0\0" * int(24000 * len(text) / 15))
+        return path, {"chars": len(text)}, "replay"
+
+
+def load_fixtures(fixtures_dir=None):
+    """Load recorded Landing AI responses, LLM completions and sample pages
+
+    Landing AI responses come from fixtures_dir or the extraction cache;
+    without any, they are rebuilt from the text layer of the sample pages.
+    Completions are the sample markdown outputs wrapped like LLM answers.
+
+    Returns:
+        dict: {"pages": sample page PDFs, "page_responses": one response per
+        sample page, "completions": recorded LLM answers}
+    """
+    pages = sorted(glob.glob(os.path.join(SAMPLE_PAGES_DIR, "*.pdf")))
+    if not pages:
+        raise SystemExit(f"No sample pages found in {SAMPLE_PAGES_DIR}")
+
+    response_paths = sorted(glob.glob(os.path.join(fixtures_dir or DEFAULT_CACHE_DIR, "*.json")))
+    page_responses = []
+    for path in response_paths:
+        with open(path, "r", encoding="utf-8") as f:
+            page_responses.append(json.load(f))
+    if not page_responses:
+        for page_path in pages:
+            text = PdfReader(page_path).pages[0].extract_text() or ""
+            page_responses.append({"data": {"chunks": text_to_chunks(text, 0)}})
+
+    completions = []
+    for path in sorted(glob.glob(os.path.join(SAMPLE_MARKDOWN_DIR, "*.md"))):
+        with open(path, "r", encoding="utf-8") as f:
+            completions.append(f"```markdown\n{f.read().strip()}\n```")
+    if not completions:
+        completions = ["```markdown\n# Documento\n\nContenido de prueba.\n```"]
+    return {"pages": pages, "page_responses": page_responses, "completions": completions}
+
+
+def build_document(pages, page_count, output_path):
+    """Write a PDF of page_count pages by cycling through the sample pages"""
+    writer = PdfWriter()
+    for i in range(page_count):
+        writer.add_page(PdfReader(pages[i % len(pages)]).pages[0])
+    with open(output_path, "wb") as f:
+        writer.write(f)
+    return output_path
+
+
+def build_response(page_responses, page_count):
+    """Combine recorded single-page responses into a page_count page response"""
+    chunks = []
+    for page in range(page_count):
+        data = page_responses[page % len(page_responses)].get("data", {})
+        for chunk in data.get("chunks") or []:
+            grounding = [{**g, "page": page} for g in chunk.get("grounding") or [{}]]
+            chunks.append({**chunk, "grounding": grounding})
+    return {"data": {"markdown": "", "chunks": chunks}}
+
+
+def measure(name, fn, repeat=DEFAULT_REPEAT, items=1, **params):
+    """Time fn over several runs after one warm-up run
+
+    Args:
+        name (str): Benchmark name
+        fn (callable): Zero-argument callable to time
+        repeat (int): Timed runs
+        items (int): Units of work per run (pages, documents, ...) for throughput
+        **params: Benchmark parameters recorded with the result
+
+    Returns:
+        dict: Latency statistics in milliseconds and throughput in items/s
+    """
+    fn()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    result = {
+        "name": name,
+        "params": params,
+        "runs": repeat,
+        "mean_ms": statistics.mean(timings) * 1000,
+        "p50_ms": timings[len(timings) // 2] * 1000,
+        "p95_ms": timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1000,
+        "min_ms": timings[0] * 1000,
+        "items_per_s": items / statistics.mean(timings),
+    }
+    params_label = " ".join(f"{key}={value}" for key, value in params.items())
+    print(f"{name:24} {params_label:28} p50 {result['p50_ms']:9.1f} ms  "
+          f"p95 {result['p95_ms']:9.1f} ms  {result['items_per_s']:8.1f} items/s")
+    return result
+
+
+def bench_split(fixtures, work_dir, sizes, concurrency, repeat):
+    results = []
+    for size in sizes:
+        input_dir = os.path.join(work_dir, f"split_in_{size}")
+        os.makedirs(input_dir, exist_ok=True)
+        build_document(fixtures["pages"], size, os.path.join(input_dir, f"doc_{size}.pdf"))
+        for workers in concurrency:
+            output_dir = os.path.join(work_dir, f"split_out_{size}_{workers}")
+
+            def run():
+                with contextlib.redirect_stdout(io.StringIO()):
+                    split_pdf_into_pages(input_dir, output_dir, workers=workers, force=True)
+
+            results.append(measure("split_pdf_into_pages", run, repeat, items=size, pages=size, workers=workers))
+    return results
+
+
+def _replay_processor(fixtures, max_workers):
+    processor = PDFProcessor(use_cache=False, url="http://replay.invalid", api_key="replay",
+                             max_workers=max_workers, local_fast_path=False)
+    processor.session = ReplaySession(fixtures["page_responses"])
+    return processor
+
+
+def bench_process_pdf(fixtures, work_dir, sizes, concurrency, repeat):
+    results = []
+    for size in sizes:
+        pages = [fixtures["pages"][i % len(fixtures["pages"])] for i in range(size)]
+        for workers in concurrency:
+            processor = _replay_processor(fixtures, workers)
+
+            def run():
+                for _, result in processor.process_many(pages, max_workers=workers):
+                    assert result is not None
+
+            results.append(measure("process_pdf", run, repeat, items=size, pages=size, workers=workers))
+    return results
+
+
+def bench_prompts(fixtures, work_dir, sizes, concurrency, repeat):
+    """Time prompt building and record the prompt size in tokens"""
+    results = []
+    for size in sizes:
+        response = build_response(fixtures["page_responses"], size)
+        result = measure("serialize_extraction", lambda: serialize_extraction(response), repeat,
+                         items=size, pages=size)
+        raw_tokens, result["prompt_tokens"] = compare_token_counts(response)
+        print(f"{'':24} {'':28} {raw_tokens} raw -> {result['prompt_tokens']} prompt tokens")
+        results.append(result)
+
+        def build_prompts():
+            windows = build_markdown_windows(response)
+            return [create_markdown_prompt(window, part, len(windows)) for part, window in enumerate(windows, 1)]
+
+        result = measure("create_markdown_prompt", build_prompts, repeat, items=size, pages=size)
+        result["prompt_tokens"] = sum(count_tokens(prompt) for prompt in build_prompts())
+        print(f"{'':24} {'':28} {result['prompt_tokens']} prompt tokens")
+        results.append(result)
+    return results
+
+
+def bench_extract_markdown(fixtures, work_dir, sizes, concurrency, repeat):
+    results = []
+    for size in sizes:
+        answer = "\n\n".join(fixtures["completions"][i % len(fixtures["completions"])] for i in range(size))
+        results.append(measure("extract_markdown_content", lambda: extract_markdown_content(answer), repeat * 20,
+                               items=size, completions=size))
+    return results
+
+
+def bench_end_to_end(fixtures, work_dir, sizes, concurrency, repeat):
+    """Upload, stream markdown, wait for narration and synthesize audio, as the app does"""
+    synthesizer = ReplaySynthesizer(os.path.join(work_dir, "tts"))
+    os.makedirs(synthesizer.output_dir, exist_ok=True)
+    results = []
+    for size in sizes:
+        pdf_path = build_document(fixtures["pages"], size, os.path.join(work_dir, f"e2e_{size}.pdf"))
+        with open(pdf_path, "rb") as f:
+            pdf_data = f.read()
+        responses = [build_response(fixtures["page_responses"], size)]
+        for users in concurrency:
+            processor = PDFProcessor(use_cache=False, url="http://replay.invalid", api_key="replay",
+                                     max_workers=users, local_fast_path=False, page_group_size=0)
+            processor.session = ReplaySession(responses)
+
+            def flow(user):
+                result = processor.process_pdf_bytes(pdf_data, f"e2e_{size}.pdf")
+                markdown_stream, narration_future = stream_outputs(result)
+                markdown = "".join(markdown_stream)
+                narration = narration_future.result()
+                text_path = os.path.join(work_dir, f"narration_{size}_{user}.txt")
+                with open(text_path, "w", encoding="utf-8") as f:
+                    f.write(narration)
+                audio = text_to_speech(text_path, os.path.join(work_dir, f"audio_{size}_{user}.wav"),
+                                       synthesizer=synthesizer, use_cache=False)
+                assert markdown and audio
+
+            def run():
+                with contextlib.redirect_stdout(io.StringIO()), ThreadPoolExecutor(max_workers=users) as executor:
+                    list(executor.map(flow, range(users)))
+
+            results.append(measure("end_to_end", run, repeat, items=users, pages=size, users=users))
+    return results
+
+
+def bench_startup(fixtures, work_dir, sizes, concurrency, repeat):
+    """Cold import time of the app's startup modules (tests/test_startup.py checks its budget)"""
+    timings = sorted(import_time_ms(APP_STARTUP_MODULES) for _ in range(repeat))
+    p50 = timings[len(timings) // 2]
+    result = {
+        "name": "app_startup_imports",
+        "params": {},
+        "runs": repeat,
+        "mean_ms": statistics.mean(timings),
+        "p50_ms": p50,
+        "p95_ms": timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+        "min_ms": timings[0],
+    }
+    print(f"{result['name']:24} {'':28} p50 {p50:9.1f} ms")
+    return [result]
+
+
+def bench_page_groups(fixtures, work_dir, sizes, concurrency, repeat):
+    """Extraction latency of one PDF uploaded whole vs. as concurrent page groups"""
+    results = []
+    for size in sizes:
+        pdf_path = build_document(fixtures["pages"], size, os.path.join(work_dir, f"groups_{size}.pdf"))
+        with open(pdf_path, "rb") as f:
+            pdf_data = f.read()
+        for workers in concurrency:
+            for group_size in (0, DEFAULT_PAGE_GROUP_SIZE):
+                processor = PDFProcessor(use_cache=False, url="http://replay.invalid", api_key="replay",
+                                         max_workers=workers, local_fast_path=False, page_group_size=group_size)
+                processor.session = PagedReplaySession(fixtures["page_responses"])
+
+                def run():
+                    result = processor.process_pdf_bytes(pdf_data, f"groups_{size}.pdf")
+                    assert len({chunk["grounding"][0]["page"] for chunk in result["data"]["chunks"]}) == size
+
+                results.append(measure("page_groups", run, repeat, items=size, pages=size, workers=workers,
+                                       group_size=group_size))
+    return results
+
+
+def reasoning_completion(answer, language):
+    """Wrap an answer like a reasoning model: <think> block, fenced answer, trailing remarks"""
+    thought = "Okay, let me look at how this section is structured and what to keep in English. "
+    return (f"<think>\n{thought * max(1, len(answer) // len(thought))}\n</think>\n\n"
+            f"```{language}\n{answer}\n```\n\n"
+            + "I kept the technical terms in English and followed the requested structure. " * 4)
+
+
+def bench_reasoning(fixtures, work_dir, sizes, concurrency, repeat):
+    """Tokens read and latency with and without the cut-off and the fast narration model
+
+    Synthetic: the reasoning completions come from reasoning_completion(),
+    and the fast model's is defined as the bare answer, so its savings only
+    show what skipping that much text is worth, not how a real model behaves.
+    """
+    answer = extract_markdown_content(fixtures["completions"][0])
+    response = build_response(fixtures["page_responses"], 1)
+    markdown_variables = markdown_prompt_variables(response)
+    narration_variables = {"content": answer}
+    variants = {
+        # Previous behavior: read the whole response, then extract the block
+        "markdown_full_response": lambda llm: extract_fenced_block(
+            llm.invoke(create_markdown_prompt(response)).content, "markdown"),
+        "markdown_cutoff": lambda llm: "".join(
+            stream_complete(llm, MARKDOWN_PROMPT_TEMPLATE, markdown_variables, "markdown")),
+        "narration_reasoning_model": lambda llm: "".join(
+            stream_complete(llm, TEXT_PROMPT_TEMPLATE, narration_variables, "text")),
+        "narration_fast_model": lambda llm: "".join(
+            stream_complete(llm, TEXT_PROMPT_TEMPLATE, narration_variables, "text")),
+    }
+    completions = {
+        "markdown_full_response": reasoning_completion(answer, "markdown"),
+        "markdown_cutoff": reasoning_completion(answer, "markdown"),
+        "narration_reasoning_model": reasoning_completion(answer, "text"),
+        # Assumed output of the fast model: the answer without any reasoning
+        "narration_fast_model": f"```text\n{answer}\n```\n\nThis summary covers the main points.",
+    }
+    results = []
+    for variant, run_variant in variants.items():
+        llm_class = replay_llm_class([completions[variant]])
+        llm = llm_class(model_name=variant)
+        result = measure("reasoning", lambda: run_variant(llm), repeat, variant=variant)
+        # Same 4 characters per token as llm_pool.estimate_tokens
+        result["tokens_read"] = llm_class.chars_read // llm_class.calls // 4
+        print(f"{'':24} {'':28} {result['tokens_read']} completion tokens read per call")
+        results.append(result)
+    return results
+
+
+BENCHMARKS = {
+    "split": bench_split,
+    "process_pdf": bench_process_pdf,
+    "prompts": bench_prompts,
+    "extract_markdown": bench_extract_markdown,
+    "end_to_end": bench_end_to_end,
+    "page_groups": bench_page_groups,
+    "reasoning": bench_reasoning,
+    "startup": bench_startup,
+}
+
+
+def install_stand_ins(fixtures):
+    """Route every get_llm() client to the recorded completions"""
+    langchain_groq.ChatGroq = replay_llm_class(fixtures["completions"])
+    with llm_pool._clients_lock:
+        llm_pool._clients.clear()
+
+
+def result_key(result):
+    return f"{result['name']}[{json.dumps(result['params'], sort_keys=True)}]"
+
+
+def compare(results, baseline_path, threshold=REGRESSION_THRESHOLD):
+    """Print the p50 change of every benchmark against a saved run
+
+    Returns:
+        list: Keys of the benchmarks that regressed beyond threshold
+    """
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {result_key(result): result for result in json.load(f)["results"]}
+    regressions = []
+    print(f"\nComparison with {baseline_path}:")
+    for result in results:
+        key = result_key(result)
+        if key not in baseline:
+            print(f"  {key}: new")
+            continue
+        change = result["p50_ms"] / baseline[key]["p50_ms"] - 1
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append(key)
+        print(f"  {key}: {baseline[key]['p50_ms']:.1f} -> {result['p50_ms']:.1f} ms ({change:+.1%}){flag}")
+        if result.get("prompt_tokens") and baseline[key].get("prompt_tokens"):
+            token_change = result["prompt_tokens"] / baseline[key]["prompt_tokens"] - 1
+            token_flag = ""
+            if token_change > threshold:
+                token_flag = "  REGRESSION"
+                regressions.append(f"{key} prompt_tokens")
+            print(f"  {key}: {baseline[key]['prompt_tokens']} -> {result['prompt_tokens']} prompt tokens "
+                  f"({token_change:+.1%}){token_flag}")
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the conversion pipeline against recorded fixtures")
+    parser.add_argument("--only", help=f"Comma-separated benchmarks to run ({', '.join(BENCHMARKS)})")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="Document sizes in pages")
+    parser.add_argument("--concurrency", default=",".join(map(str, DEFAULT_CONCURRENCY)),
+                        help="Worker or concurrent user counts")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Timed runs per benchmark")
+    parser.add_argument("--fixtures", help="Directory of recorded Landing AI responses (default: extraction cache)")
+    parser.add_argument("--output-dir", default=DEFAULT_RESULTS_DIR, help="Directory for the results JSON")
+    parser.add_argument("--compare", help="Previous results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="p50 slowdown flagged as a regression (fraction)")
+    return parser.parse_args()
+
+
+def configure_environment():
+    """Lift the quotas and caches that would throttle or short-circuit the measured code
+
+    Stand-ins replace every remote service, so nothing is sent anywhere.
+    """
+    os.environ["GROQ_REQUESTS_PER_MINUTE"] = "1000000"
+    os.environ.pop("GROQ_TOKENS_PER_MINUTE", None)
+    os.environ["EXTRACTION_CACHE_DISABLED"] = "true"
+    os.environ["AUDIO_CACHE_DISABLED"] = "true"
+    os.environ["LLM_CACHE_DISABLED"] = "true"
+    os.environ.pop("LOCAL_EXTRACTION_ENABLED", None)
+    os.environ.pop("TRACE_JSONL_PATH", None)
+    # The process-wide tracer was created on import
+    get_tracer().export_path = None
+
+
+def main():
+    configure_environment()
+    args = parse_args()
+    sizes = [int(size) for size in args.sizes.split(",")]
+    concurrency = [int(level) for level in args.concurrency.split(",")]
+    selected = args.only.split(",") if args.only else list(BENCHMARKS)
+
+    fixtures = load_fixtures(args.fixtures)
+    install_stand_ins(fixtures)
+    work_dir = tempfile.mkdtemp(prefix="doc2mark-bench-")
+    results = []
+    try:
+        for name in selected:
+            results.extend(BENCHMARKS[name](fixtures, work_dir, sizes, concurrency, args.repeat))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    output_path = os.path.join(args.output_dir, time.strftime("%Y%m%d-%H%M%S") + ".json")
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "created_at": time.time(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "tokenizer": tokenizer_name(),
+            "results": results,
+        }, f, indent=2)
+    print(f"\nResults saved to {output_path}")
+
+    regressions = compare(results, args.compare, args.threshold) if args.compare else []
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import contextlib
+import os
+import threading
+import time
+
+
+class DiskCache:
+    """Directory of cache entries, one file per key, with LRU eviction
+
+    Shared by the extraction and audio caches. An entry's access time records
+    its last hit and its modification time the write, so entries can expire
+    after max_age_seconds (never if None) and the least recently used ones
+    are evicted once the directory exceeds max_size_bytes. Entries are
+    written to a temporary file first, so readers never see a partial one.
+    Subclasses set the file suffix and serialize their own values.
+    """
+
+    suffix = ""
+
+    def __init__(self, cache_dir, max_size_bytes, max_age_seconds=None, enabled=True):
+        self.cache_dir = cache_dir
+        self.max_size_bytes = max_size_bytes
+        self.max_age_seconds = max_age_seconds
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if self.enabled:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}{self.suffix}")
+
+    def _is_expired(self, stat, now):
+        return self.max_age_seconds is not None and now - stat.st_mtime > self.max_age_seconds
+
+    @staticmethod
+    def _remove(path):
+        # Another process sharing the directory may have removed it already
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+
+    def _open_entry(self, key):
+        """Return the path of a live entry and mark it as used, or None
+
+        Expired entries are removed. Callers hold the lock.
+        """
+        path = self._entry_path(key)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        now = time.time()
+        if self._is_expired(stat, now):
+            self._remove(path)
+            return None
+        # Record the access time for LRU eviction, keep mtime as the write time
+        os.utime(path, (now, stat.st_mtime))
+        return path
+
+    def _count(self, hit):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def _store(self, key, write):
+        """Write an entry with write(tmp_path) and enforce the size limit
+
+        A failed write (e.g. a full disk) is reported and leaves the cache
+        without the entry; it is never raised to the caller.
+
+        Returns:
+            str: Path of the entry, or None if it could not be written
+        """
+        path = self._entry_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with self._lock:
+            try:
+                write(tmp_path)
+                os.replace(tmp_path, path)
+                self._evict(keep=path)
+            except OSError as e:
+                print(f"Could not write cache entry in {self.cache_dir}: {str(e)}")
+                self._remove(tmp_path)
+                return None
+        return path
+
+    def _evict(self, keep=None):
+        """Drop expired entries, then least recently used ones over the size limit"""
+        now = time.time()
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(self.suffix):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if self._is_expired(stat, now):
+                self._remove(path)
+                continue
+            entries.append((stat.st_atime, stat.st_size, path))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size_bytes:
+                break
+            if path == keep:
+                continue
+            self._remove(path)
+            total_size -= size
+
+    def _entry_names(self):
+        if not os.path.isdir(self.cache_dir):
+            return []
+        return [name for name in os.listdir(self.cache_dir) if name.endswith(self.suffix)]
+
+    def clear(self):
+        """Remove every entry from the cache"""
+        with self._lock:
+            for name in self._entry_names():
+                self._remove(os.path.join(self.cache_dir, name))
+
+    def stats(self):
+        """Return hit/miss counters and current disk usage
+
+        Returns:
+            dict: Cache statistics
+        """
+        entries = 0
+        size = 0
+        for name in self._entry_names():
+            with contextlib.suppress(FileNotFoundError):
+                size += os.path.getsize(os.path.join(self.cache_dir, name))
+                entries += 1
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": entries,
+            "size_bytes": size,
+        }
@@ -2,19 +2,135 @@ import requests
 from dotenv import load_dotenv
 import os
 import json
+import mmap
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from extraction_cache import ExtractionCache, hash_bytes
+from resilience import get_backend
+from tracing import get_tracer, in_current_context
+
+DEFAULT_MAX_WORKERS = 4
+# Pages per request when a large PDF is extracted in parallel page groups
+DEFAULT_PAGE_GROUP_SIZE = 5
+# Extra attempts for a page group that still failed after the backend's retries
+DEFAULT_GROUP_RETRIES = 1
+DEFAULT_TIMEOUT = (10, 300)  # (connect, read) seconds
+UPLOAD_CHUNK_SIZE = 256 * 1024
+
+class MultipartStream:
+    """Read-only multipart/form-data body that streams a single file field
+
+    The file part is served as memoryview slices of the caller's buffer, so
+    uploading never copies the PDF. requests sends it with a Content-Length
+    header because the total size is known up front.
+    """
+
+    def __init__(self, field_name, filename, data, content_type="application/pdf"):
+        self.boundary = uuid.uuid4().hex
+        safe_filename = filename.replace('"', "_").replace("\r", "_").replace("\n", "_")
+        head = (
+            f"--{self.boundary}\r\n"
+            f'Content-Disposition: form-data; name="{field_name}"; filename="{safe_filename}"\r\n'
+            f"Content-Type: {content_type}\r\n\r\n"
+        ).encode("utf-8")
+        tail = f"\r\n--{self.boundary}--\r\n".encode("utf-8")
+        self._source_view = memoryview(data)
+        self._parts = [memoryview(head), self._source_view.cast("B"), memoryview(tail)]
+        self._length = sum(len(part) for part in self._parts)
+        self._part_index = 0
+        self._offset = 0
+        self.finished_at = None
+
+    @property
+    def content_type(self):
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self):
+        return self._length
+
+    def read(self, size=-1):
+        """Return the next slice of the body, at most size bytes long"""
+        if size is None or size < 0:
+            size = UPLOAD_CHUNK_SIZE
+        while self._part_index < len(self._parts):
+            part = self._parts[self._part_index]
+            if self._offset < len(part):
+                chunk = part[self._offset:self._offset + size]
+                self._offset += len(chunk)
+                return chunk
+            self._part_index += 1
+            self._offset = 0
+        if self.finished_at is None:
+            self.finished_at = time.time()
+        return b""
+
+    def __iter__(self):
+        while chunk := self.read(UPLOAD_CHUNK_SIZE):
+            yield chunk
+
+    def close(self):
+        for part in self._parts:
+            part.release()
+        self._source_view.release()
 
 class PDFProcessor:
-    def __init__(self):
+    def __init__(self, use_cache=True, cache=None, url=None, api_key=None,
+                 timeout=DEFAULT_TIMEOUT, max_workers=DEFAULT_MAX_WORKERS, local_fast_path=None,
+                 page_group_size=None):
         load_dotenv()
-        self.url = os.getenv("LANDING_AI_URL")
-        self.api_key = os.getenv("LANDING_AI_API_KEY")
+        self.url = url or os.getenv("LANDING_AI_URL")
+        self.api_key = api_key or os.getenv("LANDING_AI_API_KEY")
+        self.cache = cache or ExtractionCache(enabled=None if use_cache else False)
+        self.timeout = timeout
+        self.max_workers = max_workers
+        if local_fast_path is None:
+            local_fast_path = os.getenv("LOCAL_EXTRACTION_ENABLED", "").lower() in ("1", "true", "yes")
+        # Extract born-digital pages from their text layer instead of the API.
+        # Opt-in: the text layer loses layout the API keeps, so a misrouted
+        # page comes out worse than it would from the API
+        self.local_fast_path = local_fast_path
+        if page_group_size is None:
+            page_group_size = int(os.getenv("EXTRACTION_PAGE_GROUP_SIZE", DEFAULT_PAGE_GROUP_SIZE))
+        # PDFs with more pages are uploaded as concurrent page groups; 0 disables it
+        self.page_group_size = page_group_size
+        # Every upload, whole or page group, from any thread holds one slot, so
+        # nested pools (process_many with page groups, main.py's workers) never
+        # exceed max_workers requests or the connection pool
+        self._upload_slots = threading.BoundedSemaphore(max_workers)
+        self.session = self._create_session()
+
+    def _create_session(self):
+        """Create an HTTP session whose connection pool fits the worker count
 
-    def process_pdf(self, pdf_path):
+        Returns:
+            requests.Session: Session reused by every upload of this processor
+        """
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def _build_headers(self):
+        return {
+            "Authorization": f"Basic {self.api_key}",
+            "X-Include-Marginalia": "false",
+            "X-Include-Metadata-In-Markdown": "false"
+        }
+
+    def process_pdf(self, pdf_path, bypass_cache=False):
         """
         Process a PDF file and convert it using the Landing AI API
         
+        The file is memory-mapped and streamed to the API, so it is never
+        loaded into memory as a whole.
+        
         Args:
             pdf_path (str): Path to the PDF file
+            bypass_cache (bool): Skip the extraction cache lookup and force a remote call
             
         Returns:
             dict: JSON response from the API
@@ -23,57 +139,344 @@ class PDFProcessor:
             if not os.path.exists(pdf_path):
                 raise FileNotFoundError(f"PDF file not found: {pdf_path}")
 
-            files = {
-                "pdf": open(pdf_path, "rb")
-            }
-            
-            headers = {
-                "Authorization": f"Basic {self.api_key}",
-                "X-Include-Marginalia": "false",
-                "X-Include-Metadata-In-Markdown": "false"
-            }
-            
-            # Validate PDF file size and format before sending
+            # Validate PDF file size before mapping it (empty files cannot be mapped)
             file_size = os.path.getsize(pdf_path)
             if file_size == 0:
                 raise ValueError("PDF file is empty")
+
+            with open(pdf_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return self.process_pdf_bytes(mapped, os.path.basename(pdf_path), bypass_cache)
+        except Exception as e:
+            print(f"Error processing PDF: {str(e)}")
+            return None
+
+    def process_pdf_bytes(self, pdf_data, filename="document.pdf", bypass_cache=False, content_hash=None,
+                          local_fast_path=None, page_groups=True):
+        """
+        Process an in-memory PDF and convert it using the Landing AI API
+        
+        Accepts any buffer (bytes, memoryview, mmap, Streamlit's
+        UploadedFile.getbuffer()) and streams it into the multipart body
+        without copying it. With the local fast path, pages with a clean
+        text layer are extracted locally and only the rest is uploaded. With
+        several workers, PDFs longer than page_group_size pages are uploaded
+        as concurrent page groups (see _process_page_groups).
+        
+        Args:
+            pdf_data (bytes-like): PDF contents
+            filename (str): File name sent with the upload
+            bypass_cache (bool): Skip the extraction cache lookup and force a remote call
+            content_hash (str, optional): Precomputed SHA-256 of pdf_data
+            local_fast_path (bool, optional): Override the processor's local_fast_path
+            page_groups (bool): Allow splitting a large PDF into page groups
             
-            response = requests.post(self.url, files=files, headers=headers)
+        Returns:
+            dict: JSON response from the API
+        """
+        if local_fast_path is None:
+            local_fast_path = self.local_fast_path
+        page_groups = bool(page_groups and self.page_group_size and self.max_workers > 1)
+        if (local_fast_path or page_groups) and len(pdf_data):
+            content_hash = content_hash or hash_bytes(pdf_data)
+            cache_key = self.cache.make_key(content_hash, self._build_headers())
+            # A cached document is served before it is parsed, routed or split
+            if not bypass_cache:
+                with get_tracer().span("cache_lookup", filename=filename) as span:
+                    cached_response = self.cache.get(cache_key)
+                    span.set_attribute("cache_hit", cached_response is not None)
+                if cached_response is not None:
+                    return cached_response
+            handled, response = self._process_split(
+                pdf_data, filename, bypass_cache, content_hash, local_fast_path, page_groups
+            )
+            if handled:
+                # Partial responses are not cached, so their failed pages are retried next time
+                if response is not None and not response.get("failed_pages"):
+                    self.cache.set(cache_key, response)
+                return response
+            # The whole PDF is uploaded as is; the cache was already checked
+            bypass_cache = True
+
+        with get_tracer().span("extraction", filename=filename, size_bytes=len(pdf_data)) as span:
+            response = None
+            try:
+                if len(pdf_data) == 0:
+                    raise ValueError("PDF file is empty")
+
+                headers = self._build_headers()
+
+                # Serve identical PDFs from the cache instead of re-uploading them
+                cache_key = self.cache.make_key(content_hash or hash_bytes(pdf_data), headers)
+                if not bypass_cache:
+                    cached_response = self.cache.get(cache_key)
+                    span.set_attribute("cache_hit", cached_response is not None)
+                    if cached_response is not None:
+                        return cached_response
+
+                # Retries go through the "landing_ai" backend policy: jittered
+                # backoff on 429/5xx and connection errors, and a circuit breaker
+                response = get_backend("landing_ai").call(lambda: self._post_pdf(pdf_data, filename, headers))
             
-            # Check response status and provide detailed error messages
-            if response.status_code == 422:
-                error_detail = response.json().get('detail', 'Unknown error')
-                raise requests.exceptions.HTTPError(
-                    f"PDF processing failed (422): {error_detail}. "
-                    "Please ensure the PDF is valid and not corrupted."
-                )
-            response.raise_for_status()
+                # Check response status and provide detailed error messages
+                if response.status_code == 422:
+                    error_detail = response.json().get('detail', 'Unknown error')
+                    raise requests.exceptions.HTTPError(
+                        f"PDF processing failed (422): {error_detail}. "
+                        "Please ensure the PDF is valid and not corrupted."
+                    )
+                response.raise_for_status()
+            
+                # Validate JSON response
+                try:
+                    json_response = response.json()
+                    if not json_response:
+                        raise ValueError("Empty response from API")
+                except json.JSONDecodeError as je:
+                    span.status, span.error = "error", f"Invalid JSON response: {str(je)}"
+                    print(f"Invalid JSON response: {str(je)}")
+                    print(f"Response content: {response.text}")
+                    return None
             
-            # Validate JSON response
+            except requests.exceptions.RequestException as re:
+                error_msg = f"API request error: {str(re)}"
+                span.status, span.error = "error", error_msg
+                if response is not None and response.status_code == 422:
+                    error_msg += "\nPossible causes:\n- PDF file may be corrupted\n- File format not supported\n- File size too large"
+                print(error_msg)
+                return None
+            except Exception as e:
+                span.status, span.error = "error", str(e)
+                print(f"Error processing PDF: {str(e)}")
+                return None
+
+            # Stored outside the try, so a cache problem never discards a good response
+            self.cache.set(cache_key, json_response)
+            return json_response
+
+    def _post_pdf(self, pdf_data, filename, headers):
+        """Upload a PDF once, raising HTTPError for retryable (429/5xx) responses
+        
+        Every attempt streams a fresh multipart body, since a body can only be
+        read once.
+        
+        Returns:
+            requests.Response: Response with any other status code
+        """
+        body = MultipartStream("pdf", filename, pdf_data)
+        try:
+            with self._upload_slots:
+                request_start = time.time()
+                response = self.session.post(
+                    self.url, data=body, headers={**headers, "Content-Type": body.content_type},
+                    timeout=self.timeout
+                )
+            self._record_request_spans(request_start, body, response)
+            if response.status_code == 429 or response.status_code >= 500:
+                response.raise_for_status()
+            return response
+        finally:
+            # Release the views on pdf_data so a caller's mmap can be closed
+            body.close()
+
+    def _process_split(self, pdf_data, filename, bypass_cache, content_hash, local_fast_path, page_groups):
+        """Extract a PDF through the local fast path and/or page groups
+        
+        Returns:
+            tuple: (handled, response). handled is False when neither applies
+            (no local pages, too few pages or an unparsable PDF), so the PDF
+            is uploaded whole
+        """
+        routed = self._route_pages(pdf_data, filename) if local_fast_path else None
+        if routed is not None and len(routed["remote_pages"]) < len(routed["pages"]):
+            return True, self._process_routed(routed, pdf_data, filename, bypass_cache, content_hash, page_groups)
+        if not page_groups:
+            return False, None
+        page_count = len(routed["pages"]) if routed is not None else self._page_count(pdf_data)
+        if page_count <= self.page_group_size:
+            return False, None
+        return True, self._process_page_groups(pdf_data, list(range(page_count)), filename, bypass_cache, content_hash)
+
+    def _page_count(self, pdf_data):
+        """Return the number of pages of a PDF, or 0 if it cannot be parsed"""
+        from local_extraction import pdf_reader
+
+        try:
+            with pdf_reader(pdf_data) as reader:
+                return len(reader.pages)
+        except Exception as e:
+            print(f"Could not split the PDF into page groups, uploading it whole: {str(e)}")
+            return 0
+
+    def _route_pages(self, pdf_data, filename):
+        """Classify the pages of a PDF for the local fast path
+        
+        Returns:
+            dict: Routing from local_extraction.route_pdf, or None if routing
+            failed, so the whole PDF is processed as usual
+        """
+        # pypdf is only needed for the fast path, so load it on first use
+        from local_extraction import route_pdf
+
+        with get_tracer().span("routing", filename=filename) as span:
             try:
-                json_response = response.json()
-                if not json_response:
-                    raise ValueError("Empty response from API")
-                return json_response
-            except json.JSONDecodeError as je:
-                print(f"Invalid JSON response: {str(je)}")
-                print(f"Response content: {response.text}")
+                routed = route_pdf(pdf_data)
+            except Exception as e:
+                span.status, span.error = "error", str(e)
+                print(f"Local routing failed, using the remote API: {str(e)}")
                 return None
-            
-        except requests.exceptions.RequestException as re:
-            error_msg = f"API request error: {str(re)}"
-            if response.status_code == 422:
-                error_msg += "\nPossible causes:\n- PDF file may be corrupted\n- File format not supported\n- File size too large"
-            print(error_msg)
+            span.set_attribute("pages", len(routed["pages"]))
+            span.set_attribute("local_pages", len(routed["pages"]) - len(routed["remote_pages"]))
+            return routed
+
+    def _process_routed(self, routed, pdf_data, filename, bypass_cache, content_hash, page_groups):
+        """Merge the locally extracted pages with the API response for the others
+        
+        Returns:
+            dict: Response with a per-page "routing" report, or None if the
+            remote extraction failed
+        """
+        from local_extraction import merge_responses
+
+        remote_pages = routed["remote_pages"]
+        remote_response, page_map = None, remote_pages
+        if page_groups and len(remote_pages) > self.page_group_size:
+            # Groups are cut from the original PDF, so their pages are already mapped
+            remote_response = self._process_page_groups(pdf_data, remote_pages, filename, bypass_cache, content_hash)
+            page_map = list(range(len(routed["pages"])))
+        elif remote_pages:
+            remote_response = self._extract_subset(pdf_data, remote_pages, filename, bypass_cache, content_hash)
+        if remote_pages and remote_response is None:
             return None
+        return merge_responses(routed["local_chunks"], remote_response, page_map, routed["pages"])
+
+    def _extract_subset(self, pdf_data, pages, filename, bypass_cache, content_hash):
+        """Upload a PDF made of some pages of pdf_data
+        
+        The subset is written to a temporary file and uploaded from its
+        memory map, so it is never held in memory.
+        
+        Returns:
+            dict: Response whose page numbers refer to the subset, or None
+        """
+        from local_extraction import subset_pdf
+
+        # The subset PDF bytes are not reproducible, so derive a stable cache key
+        subset_hash = hash_bytes(f"{content_hash}:{','.join(map(str, pages))}".encode("utf-8"))
+        subset_name = f"{os.path.splitext(filename)[0]}_pages_{pages[0] + 1}-{pages[-1] + 1}.pdf"
+        try:
+            with subset_pdf(pdf_data, pages) as subset:
+                return self.process_pdf_bytes(
+                    subset, subset_name, bypass_cache, content_hash=subset_hash,
+                    local_fast_path=False, page_groups=False
+                )
         except Exception as e:
-            print(f"Error processing PDF: {str(e)}")
+            print(f"Could not extract pages {pages[0] + 1}-{pages[-1] + 1} of {filename}: {str(e)}")
             return None
-        finally:
-            if 'files' in locals() and 'pdf' in files:
-                files['pdf'].close()
+
+    def _process_page_groups(self, pdf_data, pages, filename, bypass_cache, content_hash):
+        """Extract pages in concurrent groups and merge them into one response
+        
+        Every group is a separate upload (and cache entry), so a large PDF
+        takes about as long as its slowest group. Groups that still fail
+        after the backend's retries are retried on their own; pages of groups
+        that never succeed are listed in the response's "failed_pages". A
+        group's subset PDF is written when its upload starts and dropped when
+        it ends.
+        
+        Args:
+            pages (list): 0-indexed pages of pdf_data to extract
+        
+        Returns:
+            dict: Response in the Landing AI layout with the original page
+            numbers, or None if every group failed
+        """
+        from local_extraction import remap_chunks, response_from_chunks
+        from spliter_doc.split import plan_chunks
+
+        groups = plan_chunks(
+            max(pages) + 1, page_range=[page + 1 for page in pages], pages_per_chunk=self.page_group_size
+        )
+        with get_tracer().span("page_groups", filename=filename, groups=len(groups)) as span:
+            responses = {}
+            pending = [tuple(group) for group in groups]
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                for attempt in range(DEFAULT_GROUP_RETRIES + 1):
+                    if attempt:
+                        print(f"Retrying {len(pending)} failed page group(s) of {filename}")
+                    futures = {
+                        executor.submit(
+                            in_current_context(self._extract_subset),
+                            pdf_data, list(group), filename, bypass_cache, content_hash
+                        ): group
+                        for group in pending
+                    }
+                    for future in as_completed(futures):
+                        if future.result() is not None:
+                            responses[futures[future]] = future.result()
+                    pending = [group for group in pending if group not in responses]
+                    if not pending:
+                        break
+
+            failed_pages = [page for group in pending for page in group]
+            span.set_attribute("failed_groups", len(pending))
+            if not responses:
+                span.status, span.error = "error", "every page group failed"
+                return None
+            response = response_from_chunks(
+                chunk for group, group_response in responses.items() for chunk in remap_chunks(group_response, group)
+            )
+            if failed_pages:
+                span.status, span.error = "error", f"{len(pending)} page group(s) failed"
+                print(f"Extraction failed for pages {[page + 1 for page in failed_pages]} of {filename}")
+                response["failed_pages"] = failed_pages
+            return response
+
+    def _record_request_spans(self, request_start, body, response):
+        """Split a finished upload request into upload and remote extraction spans
+        
+        The upload ends when the last byte of the body has been read; the
+        remaining time until the response is the remote processing.
+        """
+        response_end = time.time()
+        upload_end = body.finished_at or response_end
+        tracer = get_tracer()
+        tracer.record_span("upload", request_start, upload_end, bytes=len(body))
+        tracer.record_span("remote_extraction", upload_end, response_end, status_code=response.status_code)
+
+    def process_many(self, pdf_paths, max_workers=None, bypass_cache=False):
+        """
+        Process several PDF files concurrently over the shared HTTP session
+        
+        Args:
+            pdf_paths (iterable): Paths to the PDF files
+            max_workers (int, optional): Maximum number of in-flight uploads,
+                capped at the processor's connection pool size
+            bypass_cache (bool): Skip the extraction cache lookup and force remote calls
+            
+        Yields:
+            tuple: (pdf_path, result) pairs in completion order, where result
+            is the JSON response or None if processing failed
+        """
+        max_workers = min(max_workers or self.max_workers, self.max_workers)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(in_current_context(self.process_pdf), pdf_path, bypass_cache): pdf_path
+                for pdf_path in pdf_paths
+            }
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+    def close(self):
+        """Release the pooled HTTP connections"""
+        self.session.close()
 
 # Example usage:
 # processor = PDFProcessor()
 # result = processor.process_pdf("spliter_doc/splitted_docs/2502.01143v2_page_10.pdf")
 # print(result)
+#
+# Batch usage:
+# processor = PDFProcessor(max_workers=8)
+# pages = sorted(glob.glob("spliter_doc/splitted_docs/*.pdf"))
+# for path, result in processor.process_many(pages):
+#     print(path, bool(result))
@@ -0,0 +1,612 @@
+import argparse
+import glob
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+DEFAULT_INDEX_DIR = os.path.join(".cache", "doc_index")
+# Multilingual, since converted documents are in Spanish with English terms
+DEFAULT_EMBEDDING_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+HASHING_DIMENSIONS = 1024
+# Sections longer than this are split at paragraph boundaries
+DEFAULT_CHUNK_CHARS = 1500
+DEFAULT_TOP_K = 5
+# Rows scored per matrix product, bounding memory on large indexes
+SEARCH_BLOCK_ROWS = 65536
+# The files are rewritten without removed rows once these exceed this fraction
+COMPACT_DEAD_RATIO = 0.5
+
+HEADER_LINE_PATTERN = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+FENCE_PATTERN = re.compile(r"^\s*(```|~~~)")
+TOKEN_PATTERN = re.compile(r"\w+")
+
+_embedder = None
+_embedder_lock = threading.Lock()
+_index = None
+_index_lock = threading.Lock()
+_index_executor = None
+
+
+def _lock_file(lock_file):
+    """Block until this process holds the exclusive lock of an open file"""
+    if fcntl is not None:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+    elif msvcrt is not None:
+        # Windows locks byte ranges; everyone locks the first byte
+        lock_file.seek(0)
+        while True:
+            try:
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                # LK_LOCK gives up after ten one-second attempts
+                continue
+
+
+def _unlock_file(lock_file):
+    if fcntl is not None:
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+    elif msvcrt is not None:
+        lock_file.seek(0)
+        msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def split_markdown_sections(markdown, max_chars=DEFAULT_CHUNK_CHARS):
+    """Chunk markdown by its header hierarchy
+
+    Every chunk keeps the path of headers above it. Headers inside code
+    fences are ignored, and sections longer than max_chars are split between
+    paragraphs.
+
+    Args:
+        markdown (str): Markdown document
+        max_chars (int): Preferred maximum chunk length
+
+    Returns:
+        list: {"headers": [titles from the top level down], "text"} dicts
+    """
+    sections = []
+    headers = []
+    lines = []
+    in_fence = False
+
+    def flush():
+        text = "\n".join(lines).strip()
+        if not text:
+            return
+        titles = [title for _, title in headers]
+        part = ""
+        for paragraph in re.split(r"\n\s*\n", text):
+            if part and len(part) + len(paragraph) + 2 > max_chars:
+                sections.append({"headers": titles, "text": part})
+                part = ""
+            part = f"{part}\n\n{paragraph}" if part else paragraph
+        if part:
+            sections.append({"headers": titles, "text": part})
+
+    for line in markdown.splitlines():
+        if FENCE_PATTERN.match(line):
+            in_fence = not in_fence
+        match = None if in_fence else HEADER_LINE_PATTERN.match(line)
+        if match:
+            flush()
+            lines = []
+            level = len(match.group(1))
+            while headers and headers[-1][0] >= level:
+                headers.pop()
+            headers.append((level, match.group(2)))
+        else:
+            lines.append(line)
+    flush()
+    return sections
+
+
+def section_text(section):
+    """Text embedded for a section: its header path followed by its body"""
+    if not section["headers"]:
+        return section["text"]
+    return " > ".join(section["headers"]) + "\n" + section["text"]
+
+
+def _fold(token):
+    """Lowercase a token and strip its accents"""
+    decomposed = unicodedata.normalize("NFKD", token.lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+class HashingEmbedder:
+    """Dependency-free embedder hashing word unigrams and bigrams into a fixed-size vector
+
+    Matches are lexical rather than semantic. It is used when
+    sentence-transformers is not installed or DOC_INDEX_EMBEDDER=hashing.
+    """
+
+    def __init__(self, dimensions=HASHING_DIMENSIONS):
+        self.dimensions = dimensions
+        self.name = f"hashing-{dimensions}"
+
+    def embed(self, texts):
+        """Embed texts as L2-normalized float32 rows
+
+        Args:
+            texts (list): Texts to embed
+
+        Returns:
+            numpy.ndarray: (len(texts), dimensions) matrix
+        """
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = [_fold(token) for token in TOKEN_PATTERN.findall(text)]
+            counts = {}
+            for feature in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+                counts[feature] = counts.get(feature, 0) + 1
+            for feature, count in counts.items():
+                digest = zlib.crc32(feature.encode("utf-8"))
+                sign = 1.0 if digest & 0x80000000 else -1.0
+                vectors[row, digest % self.dimensions] += sign * (1.0 + math.log(count))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+class SentenceTransformerEmbedder:
+    """Local CPU embedding model loaded through sentence-transformers"""
+
+    def __init__(self, model_name=DEFAULT_EMBEDDING_MODEL, batch_size=32):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.name = model_name
+        self.dimensions = self.model.get_sentence_embedding_dimension()
+        self.batch_size = batch_size
+
+    def embed(self, texts):
+        """Embed texts as L2-normalized float32 rows"""
+        vectors = self.model.encode(
+            list(texts), batch_size=self.batch_size, normalize_embeddings=True, convert_to_numpy=True
+        )
+        return np.asarray(vectors, dtype=np.float32).reshape(len(texts), self.dimensions)
+
+
+def get_embedder():
+    """Return the process-wide embedder
+
+    DOC_INDEX_EMBEDDER selects a sentence-transformers model (default:
+    DEFAULT_EMBEDDING_MODEL) or "hashing". The hashing embedder is also used
+    when the model cannot be loaded.
+
+    Returns:
+        Embedder with name, dimensions and embed(texts)
+    """
+    global _embedder
+    with _embedder_lock:
+        if _embedder is None:
+            model_name = os.getenv("DOC_INDEX_EMBEDDER", DEFAULT_EMBEDDING_MODEL)
+            if model_name == "hashing":
+                _embedder = HashingEmbedder()
+            else:
+                try:
+                    _embedder = SentenceTransformerEmbedder(model_name)
+                except Exception as e:
+                    print(f"Embedding model {model_name} unavailable ({str(e)}), using hashing embeddings")
+                    _embedder = HashingEmbedder()
+        return _embedder
+
+
+class DocumentIndex:
+    """On-disk vector index of converted markdown documents
+
+    Chunk vectors are appended to a raw float32 file that searches
+    memory-map, and chunk texts to a JSON Lines file. index.json records the
+    row range of every document and is replaced atomically after each
+    update, so readers never see a half-written document. Re-indexing or
+    removing a document leaves its old rows unused until the index is
+    compacted into a new generation of files.
+    """
+
+    def __init__(self, index_dir=None, embedder=None):
+        self.index_dir = index_dir or os.getenv("DOC_INDEX_DIR", DEFAULT_INDEX_DIR)
+        self.embedder = embedder or get_embedder()
+        self.state_path = os.path.join(self.index_dir, "index.json")
+        self._lock = threading.Lock()
+        self._loaded_version = None
+        self._snapshot = None
+        os.makedirs(self.index_dir, exist_ok=True)
+
+    @contextmanager
+    def _file_lock(self):
+        """Serialize writers across processes (e.g. the job workers)"""
+        with open(os.path.join(self.index_dir, ".lock"), "a+") as lock_file:
+            _lock_file(lock_file)
+            try:
+                yield
+            finally:
+                _unlock_file(lock_file)
+
+    def _data_paths(self, state):
+        """Vector and chunk files of the state's generation"""
+        generation = state["generation"]
+        return (os.path.join(self.index_dir, f"vectors.{generation}.f32"),
+                os.path.join(self.index_dir, f"chunks.{generation}.jsonl"))
+
+    def _empty_state(self, generation=0):
+        return {
+            "embedder": self.embedder.name,
+            "dimensions": self.embedder.dimensions,
+            "generation": generation,
+            "rows": 0,
+            "chunks_bytes": 0,
+            "documents": {},
+        }
+
+    def _read_state(self):
+        """Load index.json, starting over if it was built with another embedder"""
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return self._empty_state()
+        if state["embedder"] != self.embedder.name or state["dimensions"] != self.embedder.dimensions:
+            print(f"Index built with {state['embedder']}, rebuilding for {self.embedder.name}")
+            return self._empty_state(state["generation"] + 1)
+        return state
+
+    def _write_state(self, state):
+        tmp_path = f"{self.state_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+
+    def _append(self, state, vectors, chunks):
+        """Append rows after the last committed one, dropping leftovers of an interrupted write"""
+        vectors_path, chunks_path = self._data_paths(state)
+        with open(vectors_path, "ab") as f:
+            f.truncate(state["rows"] * state["dimensions"] * 4)
+            f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        with open(chunks_path, "ab") as f:
+            f.truncate(state["chunks_bytes"])
+            for chunk in chunks:
+                f.write((json.dumps(chunk, ensure_ascii=False) + "\n").encode("utf-8"))
+            chunks_bytes = f.tell()
+        start = state["rows"]
+        state["rows"] += len(chunks)
+        state["chunks_bytes"] = chunks_bytes
+        return start
+
+    def add_document(self, name, markdown):
+        """Index a document, replacing its previous version
+
+        Args:
+            name (str): Document name, e.g. the source PDF stem
+            markdown (str): Converted markdown
+
+        Returns:
+            int: Chunks indexed, 0 if the document was already indexed unchanged
+        """
+        fingerprint = hashlib.sha256(f"{self.embedder.name}\0{markdown}".encode("utf-8")).hexdigest()
+        # Skip the embedding work when nothing changed; re-checked under the lock
+        if self._read_state()["documents"].get(name, {}).get("fingerprint") == fingerprint:
+            return 0
+        sections = split_markdown_sections(markdown)
+        vectors = self.embedder.embed([section_text(section) for section in sections]) if sections else \
+            np.zeros((0, self.embedder.dimensions), dtype=np.float32)
+        chunks = [{"document": name, **section} for section in sections]
+
+        with self._lock, self._file_lock():
+            state = self._read_state()
+            if state["documents"].get(name, {}).get("fingerprint") == fingerprint:
+                return 0
+            start = self._append(state, vectors, chunks)
+            state["documents"][name] = {
+                "fingerprint": fingerprint,
+                "start": start,
+                "count": len(chunks),
+                "indexed_at": time.time(),
+            }
+            self._commit(state)
+        return len(chunks)
+
+    def remove_document(self, name):
+        """Drop a document from the index
+
+        Returns:
+            bool: True if the document was indexed
+        """
+        with self._lock, self._file_lock():
+            state = self._read_state()
+            if state["documents"].pop(name, None) is None:
+                return False
+            self._commit(state)
+        return True
+
+    def _commit(self, state):
+        """Publish a state, first compacting it if too many rows are unused"""
+        live_rows = sum(document["count"] for document in state["documents"].values())
+        if state["rows"] - live_rows > state["rows"] * COMPACT_DEAD_RATIO:
+            vectors, chunks, _ = self._open_files(state)
+            compacted = self._empty_state(state["generation"] + 1)
+            for name, document in state["documents"].items():
+                rows = slice(document["start"], document["start"] + document["count"])
+                start = self._append(compacted, vectors[rows], chunks[rows])
+                compacted["documents"][name] = {**document, "start": start}
+            del vectors
+            state = compacted
+        self._write_state(state)
+        # Searches reload the new state; release this process's maps first
+        self._snapshot = None
+        self._loaded_version = None
+        self._remove_old_generations(state)
+
+    def _remove_old_generations(self, state):
+        """Delete the files of older generations
+
+        On POSIX, open memory maps keep a deleted file readable until they
+        are released. Windows refuses to delete a mapped file instead, so
+        files still mapped by a search, here or in another process, are
+        left for a later commit to remove.
+        """
+        current = {os.path.basename(path) for path in self._data_paths(state)}
+        for name in os.listdir(self.index_dir):
+            if name.startswith(("vectors.", "chunks.")) and name not in current:
+                try:
+                    os.remove(os.path.join(self.index_dir, name))
+                except (FileNotFoundError, PermissionError):
+                    continue
+
+    def _open_files(self, state):
+        """Memory-map the committed vectors and load the chunk texts
+
+        Returns:
+            tuple: (vectors, chunks, live row mask)
+        """
+        rows, dimensions = state["rows"], state["dimensions"]
+        vectors_path, chunks_path = self._data_paths(state)
+        if rows:
+            vectors = np.memmap(vectors_path, dtype=np.float32, mode="r", shape=(rows, dimensions))
+        else:
+            vectors = np.zeros((0, dimensions), dtype=np.float32)
+        chunks = []
+        if rows:
+            with open(chunks_path, "rb") as f:
+                chunks = [json.loads(line) for line in f.read(state["chunks_bytes"]).splitlines()]
+        live = np.zeros(rows, dtype=bool)
+        for document in state["documents"].values():
+            live[document["start"]:document["start"] + document["count"]] = True
+        return vectors, chunks, live
+
+    def _load(self):
+        """Return the current (vectors, chunks, live) snapshot, reloading it after writes"""
+        try:
+            stat = os.stat(self.state_path)
+            version = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        except FileNotFoundError:
+            version = None
+        with self._lock:
+            if self._snapshot is None or version != self._loaded_version:
+                try:
+                    self._snapshot = self._open_files(self._read_state())
+                except FileNotFoundError:
+                    # Another process compacted the index between both reads
+                    self._snapshot = self._open_files(self._read_state())
+                self._loaded_version = version
+            return self._snapshot
+
+    def search(self, queries, k=DEFAULT_TOP_K):
+        """Return the chunks closest to one or more queries
+
+        Queries are embedded together and scored against the memory-mapped
+        vectors in blocks of SEARCH_BLOCK_ROWS rows.
+
+        Args:
+            queries (str or list): Question, or a batch of questions
+            k (int): Hits per query
+
+        Returns:
+            list: Hits ({"score", "document", "headers", "text"}) in
+            descending score order, or one such list per query for a batch
+        """
+        single = isinstance(queries, str)
+        queries = [queries] if single else list(queries)
+        vectors, chunks, live = self._load()
+        k = min(k, int(live.sum()))
+        if not queries or k == 0:
+            return [] if single else [[] for _ in queries]
+
+        query_vectors = self.embedder.embed(queries)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        for start in range(0, len(vectors), SEARCH_BLOCK_ROWS):
+            block = np.asarray(vectors[start:start + SEARCH_BLOCK_ROWS])
+            scores = query_vectors @ block.T
+            scores[:, ~live[start:start + len(block)]] = -np.inf
+            rows = np.broadcast_to(np.arange(start, start + len(block)), scores.shape)
+            scores = np.concatenate([best_scores, scores], axis=1)
+            rows = np.concatenate([best_rows, rows], axis=1)
+            if scores.shape[1] > k:
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                scores = np.take_along_axis(scores, top, axis=1)
+                rows = np.take_along_axis(rows, top, axis=1)
+            best_scores, best_rows = scores, rows
+
+        order = np.argsort(-best_scores, axis=1)
+        results = []
+        for query_scores, query_rows in zip(np.take_along_axis(best_scores, order, axis=1),
+                                            np.take_along_axis(best_rows, order, axis=1)):
+            results.append([
+                {"score": float(score), **chunks[row]}
+                for score, row in zip(query_scores, query_rows) if np.isfinite(score)
+            ])
+        return results[0] if single else results
+
+    def documents(self):
+        """Return the indexed documents and their chunk counts
+
+        Returns:
+            dict: {name: {"fingerprint", "start", "count", "indexed_at"}}
+        """
+        return self._read_state()["documents"]
+
+    def stats(self):
+        """Return index size and composition
+
+        Returns:
+            dict: Index statistics
+        """
+        state = self._read_state()
+        live_rows = sum(document["count"] for document in state["documents"].values())
+        size = sum(
+            os.path.getsize(path) for path in (*self._data_paths(state), self.state_path)
+            if os.path.exists(path)
+        )
+        return {
+            "embedder": state["embedder"],
+            "dimensions": state["dimensions"],
+            "documents": len(state["documents"]),
+            "chunks": live_rows,
+            "unused_rows": state["rows"] - live_rows,
+            "size_bytes": size,
+        }
+
+
+def get_index():
+    """Return the process-wide document index
+
+    Returns:
+        DocumentIndex: Shared index in DOC_INDEX_DIR
+    """
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = DocumentIndex()
+        return _index
+
+
+def _get_index_executor():
+    global _index_executor
+    with _index_lock:
+        if _index_executor is None:
+            _index_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="doc-index")
+        return _index_executor
+
+
+def index_ready():
+    """Return whether the shared index is loaded, so searching will not wait for the embedder"""
+    return _index is not None
+
+
+def load_index_in_background():
+    """Start loading the shared index and its embedder in a background thread
+
+    The first load can download the embedding model, which takes far longer
+    than a Streamlit rerun should.
+
+    Returns:
+        concurrent.futures.Future: Resolves to the DocumentIndex
+    """
+    return _get_index_executor().submit(get_index)
+
+
+def index_markdown_in_background(name, markdown):
+    """Queue converted markdown for indexing in a background thread
+
+    Documents are indexed one at a time, in the order they are queued, by
+    the thread that loads the index, so the caller never waits for the
+    embedding model.
+
+    Returns:
+        concurrent.futures.Future: Resolves to index_markdown's result
+    """
+    return _get_index_executor().submit(index_markdown, name, markdown)
+
+
+def index_markdown(name, markdown):
+    """Add converted markdown to the shared index
+
+    Args:
+        name (str): Document name
+        markdown (str): Converted markdown
+
+    Returns:
+        int: Chunks indexed (0 if unchanged), or None if indexing failed
+    """
+    try:
+        return get_index().add_document(name, markdown)
+    except Exception as e:
+        print(f"Error indexing {name}: {str(e)}")
+        return None
+
+
+def index_files(paths):
+    """Index markdown files, named after their file stem
+
+    Args:
+        paths (list): Markdown files or directories of them
+
+    Returns:
+        dict: {document name: chunks indexed, or None on failure}
+    """
+    files = []
+    for path in paths:
+        files.extend(sorted(glob.glob(os.path.join(path, "*.md"))) if os.path.isdir(path) else [path])
+    indexed = {}
+    for file_path in files:
+        name = os.path.splitext(os.path.basename(file_path))[0]
+        with open(file_path, "r", encoding="utf-8") as f:
+            indexed[name] = index_markdown(name, f.read())
+    return indexed
+
+
+if __name__ == "__main__":
+    # Usage:
+    #   python doc_index.py add spliter_doc/md_docs
+    #   python doc_index.py query "¿Qué es un embedding?" -k 5
+    #   python doc_index.py stats
+    parser = argparse.ArgumentParser(description="Index converted markdown and query it")
+    commands = parser.add_subparsers(dest="command", required=True)
+    add_parser = commands.add_parser("add", help="Index markdown files or directories")
+    add_parser.add_argument("paths", nargs="+")
+    query_parser = commands.add_parser("query", help="Search the index")
+    query_parser.add_argument("questions", nargs="+")
+    query_parser.add_argument("-k", type=int, default=DEFAULT_TOP_K, help="Hits per question")
+    remove_parser = commands.add_parser("remove", help="Drop documents from the index")
+    remove_parser.add_argument("names", nargs="+")
+    commands.add_parser("stats", help="Show index statistics")
+    args = parser.parse_args()
+
+    if args.command == "add":
+        for name, count in index_files(args.paths).items():
+            print(f"{name}: {'failed' if count is None else f'{count} chunks' if count else 'unchanged'}")
+    elif args.command == "query":
+        index = get_index()
+        start = time.perf_counter()
+        results = index.search(args.questions, k=args.k)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        for question, hits in zip(args.questions, results):
+            print(f"\n{question}")
+            for hit in hits:
+                location = " > ".join(hit["headers"]) or "(sin encabezado)"
+                preview = " ".join(hit["text"].split())[:160]
+                print(f"  {hit['score']:.3f}  {hit['document']}: {location}\n         {preview}")
+        print(f"\n{len(args.questions)} queries in {elapsed_ms:.1f} ms")
+    elif args.command == "remove":
+        for name in args.names:
+            print(f"{name}: {'removed' if get_index().remove_document(name) else 'not indexed'}")
+    else:
+        print(json.dumps(get_index().stats(), indent=2))
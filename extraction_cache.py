@@ -0,0 +1,113 @@
+import hashlib
+import json
+import os
+from disk_cache import DiskCache
+
+DEFAULT_CACHE_DIR = os.path.join(".cache", "extractions")
+DEFAULT_MAX_SIZE_MB = 512
+DEFAULT_MAX_AGE_HOURS = 24 * 7
+
+
+def hash_file(file_path, chunk_size=1024 * 1024):
+    """Compute the SHA-256 digest of a file without loading it in memory
+
+    Args:
+        file_path (str): Path to the file
+        chunk_size (int): Bytes read per iteration
+
+    Returns:
+        str: Hex digest of the file contents
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_bytes(data):
+    """Compute the SHA-256 digest of an in-memory buffer without copying it
+
+    Args:
+        data (bytes-like): bytes, memoryview or mmap
+
+    Returns:
+        str: Hex digest of the buffer
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+class ExtractionCache(DiskCache):
+    """Persistent on-disk cache for Landing AI extraction responses
+
+    Entries are keyed by the PDF content hash plus the request headers that
+    change the API output, so renamed or re-uploaded copies of the same file
+    are served without a remote call.
+    """
+
+    suffix = ".json"
+
+    def __init__(self, cache_dir=None, max_size_bytes=None, max_age_seconds=None, enabled=None):
+        if max_size_bytes is None:
+            max_size_bytes = int(float(os.getenv("EXTRACTION_CACHE_MAX_MB", DEFAULT_MAX_SIZE_MB)) * 1024 * 1024)
+        if max_age_seconds is None:
+            max_age_seconds = int(float(os.getenv("EXTRACTION_CACHE_MAX_AGE_HOURS", DEFAULT_MAX_AGE_HOURS)) * 3600)
+        if enabled is None:
+            enabled = os.getenv("EXTRACTION_CACHE_DISABLED", "").lower() not in ("1", "true", "yes")
+        super().__init__(
+            cache_dir or os.getenv("EXTRACTION_CACHE_DIR", DEFAULT_CACHE_DIR),
+            max_size_bytes, max_age_seconds, enabled
+        )
+
+    def make_key(self, content_hash, headers):
+        """Build the cache key for a PDF and the headers sent with it
+
+        Args:
+            content_hash (str): SHA-256 hex digest of the PDF bytes
+            headers (dict): Request headers; the Authorization header is ignored
+
+        Returns:
+            str: Cache key
+        """
+        relevant = {k: v for k, v in sorted(headers.items()) if k.lower() != "authorization"}
+        payload = content_hash + json.dumps(relevant, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Return the cached response for a key, or None on a miss
+
+        Args:
+            key (str): Cache key from make_key
+
+        Returns:
+            dict: Cached JSON response or None
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            value = None
+            path = self._open_entry(key)
+            if path is not None:
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        value = json.load(f)
+                except (FileNotFoundError, json.JSONDecodeError):
+                    value = None
+            self._count(value is not None)
+            return value
+
+    def set(self, key, value):
+        """Store a response in the cache and enforce the size limit
+
+        Args:
+            key (str): Cache key from make_key
+            value (dict): JSON response to store
+        """
+        if not self.enabled:
+            return
+
+        def write(tmp_path):
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(value, f)
+
+        self._store(key, write)
@@ -0,0 +1,435 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from extraction_cache import hash_bytes
+
+DEFAULT_DB_PATH = os.path.join(".cache", "jobs.sqlite3")
+DEFAULT_JOB_DIR = os.path.join(".cache", "jobs")
+DEFAULT_POLL_INTERVAL = 1.0
+# Workers refresh their running job's updated_at this often, whatever its stage
+DEFAULT_HEARTBEAT_INTERVAL = 60
+# Running jobs not updated for this long are assumed to belong to a dead worker
+DEFAULT_STALE_AFTER = 15 * 60
+# Jobs whose worker died this many times are failed rather than requeued again
+DEFAULT_MAX_ATTEMPTS = 3
+# Finished jobs and their files are removed after this long
+DEFAULT_MAX_AGE_HOURS = 24
+DEFAULT_CLEANUP_INTERVAL = 10 * 60
+# Unreferenced PDFs younger than this may be about to be linked by submit()
+FILE_GRACE_SECONDS = 60
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    dedupe_key TEXT NOT NULL,
+    status TEXT NOT NULL,
+    stage TEXT,
+    pdf_path TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    options TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    worker TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS jobs_in_flight ON jobs (dedupe_key)
+    WHERE status IN ('queued', 'running');
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+"""
+
+
+class JobQueue:
+    """Durable conversion queue stored in SQLite
+
+    Identical submissions (same PDF bytes and options) that are still queued
+    or running share a single job, enforced by a partial unique index.
+    Finished jobs are kept for max_age_seconds; cleanup() then removes them
+    with their files.
+    """
+
+    def __init__(self, db_path=None, job_dir=None, max_age_seconds=None):
+        self.db_path = db_path or os.getenv("JOB_DB_PATH", DEFAULT_DB_PATH)
+        self.job_dir = job_dir or os.getenv("JOB_DIR", DEFAULT_JOB_DIR)
+        if max_age_seconds is None:
+            max_age_seconds = int(float(os.getenv("JOB_MAX_AGE_HOURS", DEFAULT_MAX_AGE_HOURS)) * 3600)
+        self.max_age_seconds = max_age_seconds
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        os.makedirs(self.job_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            # Queues created before attempts were counted
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "attempts" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def submit(self, pdf_data, filename, options=None):
+        """Queue a conversion, or return the in-flight job for the same input
+
+        Args:
+            pdf_data (bytes-like): PDF contents
+            filename (str): Original file name
+            options (dict, optional): Stage options, e.g. {"tts": True}
+
+        Returns:
+            str: Job id
+        """
+        options = options or {}
+        content_hash = hash_bytes(pdf_data)
+        dedupe_key = content_hash + json.dumps(options, sort_keys=True)
+
+        # PDFs are stored by content hash, so duplicates are written once
+        pdf_path = os.path.join(self.job_dir, f"{content_hash}.pdf")
+        if os.path.exists(pdf_path):
+            # A recent modification time keeps cleanup() from removing it before the job is inserted
+            os.utime(pdf_path)
+        else:
+            tmp_path = f"{pdf_path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(pdf_data)
+            os.replace(tmp_path, pdf_path)
+
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        with self._connect() as conn:
+            try:
+                conn.execute(
+                    "INSERT INTO jobs (id, dedupe_key, status, pdf_path, filename, options, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, dedupe_key, QUEUED, pdf_path, filename, json.dumps(options), now, now)
+                )
+                return job_id
+            except sqlite3.IntegrityError:
+                row = conn.execute(
+                    "SELECT id FROM jobs WHERE dedupe_key = ? AND status IN (?, ?)",
+                    (dedupe_key, QUEUED, RUNNING)
+                ).fetchone()
+                return row["id"]
+
+    def claim(self, worker_id):
+        """Atomically take the oldest queued job
+
+        Args:
+            worker_id (str): Identifier of the claiming worker
+
+        Returns:
+            dict: Claimed job, or None if the queue is empty
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT * FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (QUEUED,)
+                ).fetchone()
+                if row is not None:
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, worker = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                        (RUNNING, worker_id, time.time(), row["id"])
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        job = self._to_dict(row)
+        job["status"] = RUNNING
+        job["attempts"] += 1
+        return job
+
+    def set_stage(self, job_id, stage):
+        """Record the stage a running job has reached"""
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET stage = ?, updated_at = ? WHERE id = ?", (stage, time.time(), job_id))
+
+    def heartbeat(self, job_id):
+        """Record that a running job's worker is still alive"""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET updated_at = ? WHERE id = ? AND status = ?", (time.time(), job_id, RUNNING)
+            )
+
+    def complete(self, job_id, result, worker_id):
+        """Mark a job as done and store its result
+
+        Only the worker running the job may finish it: a job requeued after
+        its worker stopped responding, and claimed by another one, is left
+        to its new worker.
+
+        Args:
+            job_id (str): Job identifier
+            result (dict): Job result
+            worker_id (str): Identifier the job was claimed with
+
+        Returns:
+            bool: True if the job was still running on this worker
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, stage = NULL, result = ?, updated_at = ? "
+                "WHERE id = ? AND status = ? AND worker = ?",
+                (DONE, json.dumps(result), time.time(), job_id, RUNNING, worker_id)
+            )
+            return cursor.rowcount == 1
+
+    def fail(self, job_id, error, worker_id):
+        """Mark a job as failed, if it is still running on this worker (see complete())
+
+        Returns:
+            bool: True if the job was still running on this worker
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ? AND status = ? AND worker = ?",
+                (FAILED, error, time.time(), job_id, RUNNING, worker_id)
+            )
+            return cursor.rowcount == 1
+
+    def get(self, job_id):
+        """Return a job with its decoded options and result, or None"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def requeue_stale(self, stale_after=DEFAULT_STALE_AFTER, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        """Put running jobs of dead workers back in the queue
+
+        Live workers send heartbeats, so only jobs whose worker stopped are
+        stale. A job that has already been claimed max_attempts times is
+        failed instead, so a PDF that kills its worker is not retried forever.
+
+        Returns:
+            int: Number of requeued jobs
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, updated_at = ? "
+                    "WHERE status = ? AND updated_at < ? AND attempts >= ?",
+                    (FAILED, f"Worker stopped responding {max_attempts} times", now,
+                     RUNNING, now - stale_after, max_attempts)
+                )
+                cursor = conn.execute(
+                    "UPDATE jobs SET status = ?, worker = NULL, updated_at = ? WHERE status = ? AND updated_at < ?",
+                    (QUEUED, now, RUNNING, now - stale_after)
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            return cursor.rowcount
+
+    def cleanup(self, max_age_seconds=None):
+        """Remove finished jobs older than max_age_seconds and files no job uses
+
+        The rows of done and failed jobs go first. Then the job directory is
+        swept: PDFs no remaining job refers to, the <job_id>.txt narrations
+        and <job_id>.wav audio of removed jobs, and abandoned temporary files.
+        Files younger than FILE_GRACE_SECONDS are kept, since submit() writes
+        a PDF before inserting its job.
+
+        Args:
+            max_age_seconds (float, optional): Age limit, the queue's max_age_seconds by default
+
+        Returns:
+            dict: Number of removed jobs and files, and bytes freed
+        """
+        if max_age_seconds is None:
+            max_age_seconds = self.max_age_seconds
+        now = time.time()
+        with self._connect() as conn:
+            removed_jobs = conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?", (DONE, FAILED, now - max_age_seconds)
+            ).rowcount
+            rows = conn.execute("SELECT id, pdf_path FROM jobs").fetchall()
+        job_ids = {row["id"] for row in rows}
+        pdf_names = {os.path.basename(row["pdf_path"]) for row in rows}
+
+        removed_files, removed_bytes = 0, 0
+        for name in os.listdir(self.job_dir):
+            stem, suffix = os.path.splitext(name)
+            if suffix == ".pdf":
+                used = name in pdf_names
+            elif suffix in (".txt", ".wav"):
+                used = stem in job_ids
+            else:
+                used = suffix != ".tmp"
+            path = os.path.join(self.job_dir, name)
+            try:
+                stat = os.stat(path)
+                if used or now - stat.st_mtime < FILE_GRACE_SECONDS:
+                    continue
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            removed_files += 1
+            removed_bytes += stat.st_size
+        return {"jobs": removed_jobs, "files": removed_files, "bytes": removed_bytes}
+
+    def counts(self):
+        """Return the number of jobs per status"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+    @staticmethod
+    def _to_dict(row):
+        job = dict(row)
+        job["options"] = json.loads(job["options"]) if job["options"] else {}
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+
+def run_job(queue, job):
+    """Run the extraction → markdown → index → (optional) TTS stages of a job
+
+    Returns:
+        dict: Job result with markdown, audio_text, audio_path and errors
+    """
+    # Imported here so that submitting or polling jobs does not load the
+    # extraction, LLM and TTS stacks
+    from doc_extraction import PDFProcessor
+    from doc_index import index_markdown
+    from pipeline import generate_outputs
+    from text2speech import text_to_speech
+
+    queue.set_stage(job["id"], "extraction")
+    result = PDFProcessor().process_pdf(job["pdf_path"])
+    if not result:
+        raise RuntimeError("PDF extraction failed")
+
+    queue.set_stage(job["id"], "markdown")
+    outputs = generate_outputs(result)
+    if not outputs["markdown"]:
+        raise RuntimeError(outputs["errors"].get("markdown", "Markdown generation failed"))
+    if result.get("failed_pages"):
+        pages = ", ".join(str(page + 1) for page in result["failed_pages"])
+        outputs["errors"]["extraction"] = f"Extraction failed for pages {pages}"
+
+    queue.set_stage(job["id"], "index")
+    if index_markdown(os.path.splitext(job["filename"])[0], outputs["markdown"]) is None:
+        outputs["errors"]["index"] = "Indexing failed"
+
+    outputs["audio_path"] = None
+    if job["options"].get("tts") and outputs["audio_text"]:
+        queue.set_stage(job["id"], "tts")
+        text_path = os.path.join(queue.job_dir, f"{job['id']}.txt")
+        with open(text_path, "w", encoding="utf-8") as f:
+            f.write(outputs["audio_text"])
+        audio_result = text_to_speech(
+            input_file_path=text_path,
+            output_file_path=os.path.join(queue.job_dir, f"{job['id']}.wav"),
+            voice_name=job["options"].get("voice", "af_jessica")
+        )
+        if audio_result:
+            outputs["audio_path"] = audio_result[0]
+        else:
+            outputs["errors"]["tts"] = "Audio generation failed"
+    return outputs
+
+
+@contextmanager
+def heartbeat(queue, job_id, interval=DEFAULT_HEARTBEAT_INTERVAL):
+    """Send heartbeats for a job from a background thread for the duration of a block
+
+    Stages can run for longer than the stale timeout (a long extraction or
+    narration), so liveness cannot rely on stage changes alone.
+    """
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(interval):
+            try:
+                queue.heartbeat(job_id)
+            except Exception as e:
+                print(f"Heartbeat for job {job_id} failed: {str(e)}")
+
+    thread = threading.Thread(target=beat, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def worker_loop(db_path=None, job_dir=None, poll_interval=DEFAULT_POLL_INTERVAL, max_jobs=None,
+                heartbeat_interval=DEFAULT_HEARTBEAT_INTERVAL):
+    """Claim and run jobs until max_jobs have been processed (forever by default)"""
+    queue = JobQueue(db_path, job_dir)
+    worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    processed = 0
+    last_cleanup = 0.0
+    while max_jobs is None or processed < max_jobs:
+        job = queue.claim(worker_id)
+        if job is None:
+            queue.requeue_stale()
+            if time.time() - last_cleanup >= DEFAULT_CLEANUP_INTERVAL:
+                last_cleanup = time.time()
+                queue.cleanup()
+            time.sleep(poll_interval)
+            continue
+        try:
+            with heartbeat(queue, job["id"], heartbeat_interval):
+                outputs = run_job(queue, job)
+            finished = queue.complete(job["id"], outputs, worker_id)
+        except Exception as e:
+            print(f"Job {job['id']} failed: {str(e)}")
+            finished = queue.fail(job["id"], str(e), worker_id)
+        if not finished:
+            print(f"Job {job['id']} was taken over by another worker, result discarded")
+        processed += 1
+
+
+def start_workers(count, db_path=None, job_dir=None):
+    """Start worker processes that drain the queue
+
+    Workers are spawned rather than forked so they do not inherit the
+    threads of the calling process (e.g. the Streamlit server).
+
+    Returns:
+        list: Started multiprocessing.Process objects
+    """
+    context = multiprocessing.get_context("spawn")
+    workers = []
+    for _ in range(count):
+        process = context.Process(target=worker_loop, args=(db_path, job_dir), daemon=True)
+        process.start()
+        workers.append(process)
+    return workers
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run conversion workers for the job queue")
+    parser.add_argument("--workers", type=int, default=2, help="Number of worker processes")
+    parser.add_argument("--db", default=None, help="SQLite queue path")
+    args = parser.parse_args()
+
+    processes = start_workers(args.workers, args.db)
+    print(f"Started {len(processes)} workers")
+    for process in processes:
+        process.join()
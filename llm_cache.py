@@ -0,0 +1,197 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from text_normalization import normalize_text
+
+DEFAULT_DB_PATH = os.path.join(".cache", "llm_responses.sqlite3")
+DEFAULT_MAX_SIZE_MB = 256
+DEFAULT_MAX_AGE_HOURS = 24 * 30
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    template_version TEXT NOT NULL,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at);
+"""
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def template_version(template):
+    """Short hash of a prompt template's text, so editing it invalidates its entries
+
+    Args:
+        template (str): Template text
+
+    Returns:
+        str: Template version
+    """
+    return hashlib.sha256(template.encode("utf-8")).hexdigest()[:16]
+
+
+class LLMCache:
+    """SQLite cache of LLM completions
+
+    Entries are keyed by the model and its sampling parameters, the prompt
+    template version and the hash of the normalized template variables, so
+    the same content converted with the same template is never sent twice.
+    Entries expire after max_age_seconds and the least recently used ones
+    are evicted once the cache exceeds its size.
+    """
+
+    def __init__(self, db_path=None, max_size_bytes=None, max_age_seconds=None, enabled=None):
+        self.db_path = db_path or os.getenv("LLM_CACHE_PATH", DEFAULT_DB_PATH)
+        if max_size_bytes is None:
+            max_size_bytes = int(float(os.getenv("LLM_CACHE_MAX_MB", DEFAULT_MAX_SIZE_MB)) * 1024 * 1024)
+        if max_age_seconds is None:
+            max_age_seconds = int(float(os.getenv("LLM_CACHE_MAX_AGE_HOURS", DEFAULT_MAX_AGE_HOURS)) * 3600)
+        if enabled is None:
+            enabled = os.getenv("LLM_CACHE_DISABLED", "").lower() not in ("1", "true", "yes")
+        self.max_size_bytes = max_size_bytes
+        self.max_age_seconds = max_age_seconds
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if self.enabled:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            with self._connect() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def make_key(self, model, template, variables, params=None):
+        """Build the cache key for a completion
+
+        Args:
+            model (str): Model name
+            template (str): Prompt template text
+            variables (dict): Values the template is filled with
+            params (dict, optional): Sampling parameters that change the output
+
+        Returns:
+            str: Cache key
+        """
+        normalized = {name: normalize_text(str(value)) for name, value in variables.items()}
+        content_hash = hashlib.sha256(json.dumps(normalized, sort_keys=True).encode("utf-8")).hexdigest()
+        payload = json.dumps([model, params or {}, template_version(template), content_hash], sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Return the cached completion for a key, or None on a miss
+
+        Args:
+            key (str): Cache key from make_key
+
+        Returns:
+            str: Cached completion text or None
+        """
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[1] > self.max_age_seconds:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                row = None
+            if row is not None:
+                conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return row[0]
+
+    def set(self, key, response, model="", template=""):
+        """Store a completion and enforce the size limit
+
+        Args:
+            key (str): Cache key from make_key
+            response (str): Completion text
+            model (str): Model name, kept for inspection
+            template (str): Prompt template text, kept as its version
+        """
+        if not self.enabled:
+            return
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(key, model, template_version, response, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model, template_version(template), response, len(response.encode("utf-8")), now, now)
+            )
+            self._evict(conn, now, keep=key)
+
+    def _evict(self, conn, now, keep=None):
+        """Drop expired entries, then least recently used ones over the size limit"""
+        conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.max_age_seconds,))
+        total_size = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total_size <= self.max_size_bytes:
+            return
+        stale = []
+        for key, size in conn.execute(
+            "SELECT key, size FROM responses WHERE key != ? ORDER BY accessed_at", (keep or "",)
+        ).fetchall():
+            if total_size <= self.max_size_bytes:
+                break
+            stale.append((key,))
+            total_size -= size
+        conn.executemany("DELETE FROM responses WHERE key = ?", stale)
+
+    def clear(self):
+        """Remove every entry from the cache"""
+        if not self.enabled:
+            return
+        with self._connect() as conn:
+            conn.execute("DELETE FROM responses")
+
+    def stats(self):
+        """Return hit/miss counters and current usage
+
+        Returns:
+            dict: Cache statistics
+        """
+        entries, size = 0, 0
+        if self.enabled:
+            with self._connect() as conn:
+                entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": entries,
+            "size_bytes": size,
+        }
+
+
+def get_llm_cache():
+    """Return the process-wide LLM response cache
+
+    Returns:
+        LLMCache: Shared cache configured from the LLM_CACHE_* variables
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache()
+        return _cache
@@ -0,0 +1,430 @@
+import asyncio
+import os
+import threading
+import time
+from dotenv import load_dotenv
+from resilience import get_backend, status_code
+from tracing import get_tracer
+
+DEFAULT_MODEL = "deepseek-r1-distill-llama-70b"
+# Model and completion budget per generation task. Narration is plain prose,
+# so it uses a fast non-reasoning model; the markdown budget leaves room for
+# the reasoning model's <think> block on top of the translated window
+TASK_DEFAULTS = {
+    "markdown": {"model": DEFAULT_MODEL, "max_tokens": 6144},
+    "narration": {"model": "llama-3.3-70b-versatile", "max_tokens": 2048},
+}
+# Groq free-tier request quota; the token quota depends on the account tier,
+# so it is only enforced when GROQ_TOKENS_PER_MINUTE is set
+DEFAULT_REQUESTS_PER_MINUTE = 30
+# Completion tokens reserved per call on top of the prompt estimate
+DEFAULT_COMPLETION_TOKENS = 1024
+DEFAULT_MAX_RETRIES = 3
+# Seconds before a Groq HTTP request is abandoned
+DEFAULT_REQUEST_TIMEOUT = 120
+
+_env_lock = threading.Lock()
+_env_loaded = False
+_clients = {}
+_clients_lock = threading.Lock()
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def _load_env():
+    """Load the .env file once per process"""
+    global _env_loaded
+    with _env_lock:
+        if not _env_loaded:
+            load_dotenv()
+            _env_loaded = True
+
+
+def get_llm(model_name=DEFAULT_MODEL, **params):
+    """Return the shared Groq client for a model and parameter set
+
+    Clients are created lazily on first use and reused afterwards, so their
+    HTTP connection pools are shared across calls and threads. Requests time
+    out after GROQ_REQUEST_TIMEOUT seconds, and the client's own retries are
+    disabled because invoke_llm retries through the "groq" backend.
+
+    Args:
+        model_name (str): Groq model name
+        **params: Extra ChatGroq parameters (temperature, max_tokens, ...)
+
+    Returns:
+        ChatGroq: Shared LLM instance
+    """
+    key = (model_name, tuple(sorted(params.items())))
+    with _clients_lock:
+        if key not in _clients:
+            from langchain_groq import ChatGroq
+
+            _load_env()
+            client_params = {
+                "request_timeout": float(os.getenv("GROQ_REQUEST_TIMEOUT", DEFAULT_REQUEST_TIMEOUT)),
+                "max_retries": 0,
+                **params,
+            }
+            _clients[key] = ChatGroq(
+                api_key=os.getenv("GROQ_API_KEY"),
+                model_name=model_name,
+                **client_params
+            )
+        return _clients[key]
+
+
+def get_task_llm(task):
+    """Return the shared client configured for a generation task
+
+    The model and max tokens come from GROQ_<TASK>_MODEL and
+    GROQ_<TASK>_MAX_TOKENS (e.g. GROQ_NARRATION_MODEL), defaulting to
+    TASK_DEFAULTS.
+
+    Args:
+        task (str): "markdown" or "narration"
+
+    Returns:
+        ChatGroq: Shared LLM instance
+    """
+    _load_env()
+    defaults = TASK_DEFAULTS[task]
+    prefix = f"GROQ_{task.upper()}"
+    return get_llm(
+        os.getenv(f"{prefix}_MODEL", defaults["model"]),
+        max_tokens=int(os.getenv(f"{prefix}_MAX_TOKENS", defaults["max_tokens"]))
+    )
+
+
+def estimate_tokens(text):
+    """Roughly estimate the token count of a text (about 4 characters per token)
+
+    Args:
+        text (str): Text to measure
+
+    Returns:
+        int: Estimated number of tokens
+    """
+    return max(1, len(text) // 4)
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at a per-minute rate
+
+    reserve() never blocks: it takes the tokens, letting the bucket go into
+    debt, and returns how long the caller must wait before proceeding. This
+    lets the same bucket serve threads (time.sleep) and coroutines
+    (asyncio.sleep).
+    """
+
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount=1):
+        """Take tokens from the bucket
+
+        Args:
+            amount (float): Number of tokens to take
+
+        Returns:
+            float: Seconds to wait until the reservation is covered
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+
+class RateLimiter:
+    """Request and token quotas for one model, with retry-after pauses"""
+
+    def __init__(self, requests_per_minute, tokens_per_minute=None):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self, estimated_tokens):
+        """Reserve one request and its tokens
+
+        Returns:
+            float: Seconds to wait before sending the request
+        """
+        wait = self.requests.reserve(1)
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.reserve(estimated_tokens))
+        with self._lock:
+            return max(wait, self.blocked_until - time.monotonic())
+
+    def acquire(self, estimated_tokens):
+        """Block the current thread until the request may be sent"""
+        wait = self.reserve(estimated_tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def aacquire(self, estimated_tokens):
+        """Suspend the current coroutine until the request may be sent"""
+        wait = self.reserve(estimated_tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds):
+        """Hold back every caller of this limiter for the given time"""
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+def get_rate_limiter(model_name=DEFAULT_MODEL):
+    """Return the process-wide rate limiter for a model
+
+    Quotas come from GROQ_REQUESTS_PER_MINUTE and GROQ_TOKENS_PER_MINUTE.
+
+    Args:
+        model_name (str): Groq model name
+
+    Returns:
+        RateLimiter: Shared limiter for the model
+    """
+    with _limiters_lock:
+        if model_name not in _limiters:
+            _load_env()
+            tokens_per_minute = os.getenv("GROQ_TOKENS_PER_MINUTE")
+            _limiters[model_name] = RateLimiter(
+                int(os.getenv("GROQ_REQUESTS_PER_MINUTE", DEFAULT_REQUESTS_PER_MINUTE)),
+                int(tokens_per_minute) if tokens_per_minute else None
+            )
+        return _limiters[model_name]
+
+
+def _pause_on_rate_limit(limiter):
+    """Return an on_retry hook that holds back every caller of the limiter after a 429"""
+    def on_retry(error, delay):
+        if status_code(error) == 429:
+            limiter.pause(delay)
+    return on_retry
+
+
+def _estimate_call_tokens(llm, prompt):
+    max_tokens = getattr(llm, "max_tokens", None) or DEFAULT_COMPLETION_TOKENS
+    return estimate_tokens(prompt) + max_tokens
+
+
+def _usage_attributes(prompt, response_text, usage):
+    """Prompt and completion token counts, from provider usage when available"""
+    usage = usage or {}
+    return {
+        "prompt_tokens": usage.get("input_tokens") or estimate_tokens(prompt),
+        "completion_tokens": usage.get("output_tokens") or estimate_tokens(response_text),
+    }
+
+
+def _record_response(span, prompt, response):
+    content = getattr(response, "content", None)
+    response_text = content if isinstance(content, str) else str(response)
+    for key, value in _usage_attributes(prompt, response_text, getattr(response, "usage_metadata", None)).items():
+        span.set_attribute(key, value)
+
+
+def invoke_llm(llm, prompt, max_retries=DEFAULT_MAX_RETRIES):
+    """Invoke an LLM under its model's rate limiter and the "groq" backend policy
+
+    Throttling (429, honoring Retry-After), server errors and connection
+    failures are retried with jittered backoff; repeated failures open the
+    backend's circuit breaker so later calls fail fast.
+
+    Args:
+        llm: LangChain chat model (or any object with invoke())
+        prompt (str): Prompt to send
+        max_retries (int): Number of retries after transient errors
+
+    Returns:
+        The LLM response message
+    """
+    model_name = getattr(llm, "model_name", DEFAULT_MODEL)
+    limiter = get_rate_limiter(model_name)
+    estimated_tokens = _estimate_call_tokens(llm, prompt)
+    attempts = 0
+
+    def before_attempt():
+        nonlocal attempts
+        attempts += 1
+        limiter.acquire(estimated_tokens)
+
+    with get_tracer().span("llm.invoke", model=model_name) as span:
+        try:
+            response = get_backend("groq").call(
+                lambda: llm.invoke(prompt),
+                max_attempts=max_retries + 1,
+                before_attempt=before_attempt,
+                on_retry=_pause_on_rate_limit(limiter)
+            )
+        finally:
+            span.set_attribute("attempts", attempts)
+        _record_response(span, prompt, response)
+        return response
+
+
+async def ainvoke_llm(llm, prompt, max_retries=DEFAULT_MAX_RETRIES):
+    """Asynchronous counterpart of invoke_llm"""
+    model_name = getattr(llm, "model_name", DEFAULT_MODEL)
+    limiter = get_rate_limiter(model_name)
+    estimated_tokens = _estimate_call_tokens(llm, prompt)
+    attempts = 0
+
+    async def before_attempt():
+        nonlocal attempts
+        attempts += 1
+        await limiter.aacquire(estimated_tokens)
+
+    with get_tracer().span("llm.invoke", model=model_name) as span:
+        try:
+            response = await get_backend("groq").acall(
+                lambda: llm.ainvoke(prompt),
+                max_attempts=max_retries + 1,
+                before_attempt=before_attempt,
+                on_retry=_pause_on_rate_limit(limiter)
+            )
+        finally:
+            span.set_attribute("attempts", attempts)
+        _record_response(span, prompt, response)
+        return response
+
+
+def stream_llm(llm, prompt, max_retries=DEFAULT_MAX_RETRIES):
+    """Stream an LLM response under its model's rate limiter
+
+    Transient errors are retried only before the first chunk is received,
+    so callers never see a response restart midway.
+
+    Args:
+        llm: LangChain chat model (or any object with stream())
+        prompt (str): Prompt to send
+        max_retries (int): Number of retries after transient errors
+
+    Yields:
+        Response message chunks
+    """
+    model_name = getattr(llm, "model_name", DEFAULT_MODEL)
+    limiter = get_rate_limiter(model_name)
+    estimated_tokens = _estimate_call_tokens(llm, prompt)
+    # Generators cannot hold a span open across yields without leaking it
+    # into the consumer's context, so the stream is timed by hand
+    start = time.time()
+    first_chunk_at = None
+    response_text = ""
+    usage = None
+    status, error = "ok", None
+    backend = get_backend("groq")
+    on_retry = _pause_on_rate_limit(limiter)
+    try:
+        for attempt in range(max_retries + 1):
+            backend.acquire()
+            try:
+                limiter.acquire(estimated_tokens)
+            except BaseException:
+                backend.release()
+                raise
+            attempt_start = time.monotonic()
+            started = False
+            try:
+                for chunk in llm.stream(prompt):
+                    if not started:
+                        started = True
+                        first_chunk_at = time.time()
+                    content = getattr(chunk, "content", None)
+                    response_text += content if isinstance(content, str) else str(chunk)
+                    usage = getattr(chunk, "usage_metadata", None) or usage
+                    yield chunk
+                backend.record_success(time.monotonic() - attempt_start)
+                return
+            except GeneratorExit:
+                # The consumer stopped reading (e.g. at the closing fence). The
+                # backend answered, so this counts as a success and releases a
+                # half-open probe; it can only happen after a chunk was yielded
+                backend.record_success(time.monotonic() - attempt_start)
+                raise
+            except Exception as e:
+                retryable = backend.record_failure(e, time.monotonic() - attempt_start)
+                if started or not retryable or attempt == max_retries:
+                    raise
+                delay = backend.retry_delay(e, attempt)
+                backend.metrics.increment("retries")
+                print(f"Groq stream failed ({str(e)}), retrying in {delay:.1f}s")
+                on_retry(e, delay)
+                time.sleep(delay)
+    except Exception as e:
+        status, error = "error", str(e)
+        raise
+    finally:
+        get_tracer().record_span(
+            "llm.stream", start, time.time(), status, error, model=model_name,
+            time_to_first_chunk_ms=(first_chunk_at - start) * 1000 if first_chunk_at else None,
+            **_usage_attributes(prompt, response_text, usage)
+        )
+
+
+async def astream_llm(llm, prompt, max_retries=DEFAULT_MAX_RETRIES):
+    """Asynchronous counterpart of stream_llm
+
+    Close the stream with aclose() to stop reading before it ends.
+    """
+    model_name = getattr(llm, "model_name", DEFAULT_MODEL)
+    limiter = get_rate_limiter(model_name)
+    estimated_tokens = _estimate_call_tokens(llm, prompt)
+    start = time.time()
+    first_chunk_at = None
+    response_text = ""
+    usage = None
+    status, error = "ok", None
+    backend = get_backend("groq")
+    on_retry = _pause_on_rate_limit(limiter)
+    try:
+        for attempt in range(max_retries + 1):
+            backend.acquire()
+            try:
+                await limiter.aacquire(estimated_tokens)
+            except BaseException:
+                backend.release()
+                raise
+            attempt_start = time.monotonic()
+            started = False
+            try:
+                async for chunk in llm.astream(prompt):
+                    if not started:
+                        started = True
+                        first_chunk_at = time.time()
+                    content = getattr(chunk, "content", None)
+                    response_text += content if isinstance(content, str) else str(chunk)
+                    usage = getattr(chunk, "usage_metadata", None) or usage
+                    yield chunk
+                backend.record_success(time.monotonic() - attempt_start)
+                return
+            except GeneratorExit:
+                backend.record_success(time.monotonic() - attempt_start)
+                raise
+            except Exception as e:
+                retryable = backend.record_failure(e, time.monotonic() - attempt_start)
+                if started or not retryable or attempt == max_retries:
+                    raise
+                delay = backend.retry_delay(e, attempt)
+                backend.metrics.increment("retries")
+                print(f"Groq stream failed ({str(e)}), retrying in {delay:.1f}s")
+                on_retry(e, delay)
+                await asyncio.sleep(delay)
+    except Exception as e:
+        status, error = "error", str(e)
+        raise
+    finally:
+        get_tracer().record_span(
+            "llm.stream", start, time.time(), status, error, model=model_name,
+            time_to_first_chunk_ms=(first_chunk_at - start) * 1000 if first_chunk_at else None,
+            **_usage_attributes(prompt, response_text, usage)
+        )
@@ -0,0 +1,400 @@
+import glob
+import io
+import mmap
+import os
+import re
+import sys
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+from pypdf import PdfReader, PdfWriter
+
+MIN_TEXT_CHARS = 200
+# Pages with more short lines than this are usually diagrams, tables or forms
+MAX_SHORT_LINE_RATIO = 0.3
+SHORT_LINE_CHARS = 25
+# Math symbols per 1000 characters above which formulas would come out garbled
+MAX_MATH_SYMBOLS_PER_1000 = 8
+
+TABLE_CAPTION_PATTERN = re.compile(r"^\s*(TABLE|Table)\s+[IVXLC\d]+\b", re.MULTILINE)
+SECTION_HEADING_PATTERN = re.compile(r"^(?:[IVXLC]+\.|[A-Z]\.|\d+(?:\.\d+)*\.?)\s+[A-Z][^.]{0,80}$|^[A-Z][A-Z ]{3,40}$")
+SENTENCE_END_PATTERN = re.compile(r"[.:!?)\]]$")
+# Algorithm boxes and listings lose their indentation and line numbers in the
+# text layer, so pages with a caption or several numbered lines go remote
+ALGORITHM_CAPTION_PATTERN = re.compile(r"^\s*(?:Algorithm|ALGORITHM|Listing|Procedure)\s+\d+\b", re.MULTILINE)
+NUMBERED_LINE_PATTERN = re.compile(r"^\s*\d{1,3}:\s", re.MULTILINE)
+MAX_NUMBERED_LINES = 3
+# Pages classified per PdfReader. A reader keeps every object it resolves,
+# images included, so routing opens a fresh one for each batch of pages
+ROUTING_BATCH_PAGES = 8
+
+
+def _is_math_symbol(char):
+    code = ord(char)
+    return 0x1D400 <= code <= 0x1D7FF or 0x0370 <= code <= 0x03FF or 0x2200 <= code <= 0x22FF
+
+
+def _count_xobjects(page):
+    """Count image and form XObjects (embedded figures) on a page"""
+    resources = page.get("/Resources")
+    if resources is None:
+        return 0
+    xobjects = resources.get_object().get("/XObject")
+    if xobjects is None:
+        return 0
+    xobjects = xobjects.get_object()
+    return sum(
+        1 for name in xobjects
+        if xobjects[name].get_object().get("/Subtype") in ("/Image", "/Form")
+    )
+
+
+def classify_page(page):
+    """Decide whether a page can be extracted from its text layer
+
+    A page is extracted locally only if it has a real text layer and no
+    figures, tables, dense math or fragmented layout, which the remote API
+    handles far better.
+
+    Args:
+        page (pypdf.PageObject): Page to classify
+
+    Returns:
+        dict: {"route": "local" or "remote", "reason", "text_chars", "text"}
+    """
+    text = page.extract_text() or ""
+    stripped = text.strip()
+    lines = [line for line in stripped.splitlines() if line.strip()]
+    result = {"route": "remote", "reason": None, "text_chars": len(stripped), "text": stripped}
+
+    if len(stripped) < MIN_TEXT_CHARS:
+        result["reason"] = "no text layer"
+    elif "�" in stripped or "(cid:" in stripped:
+        result["reason"] = "unmapped glyphs"
+    elif _count_xobjects(page):
+        result["reason"] = "figures"
+    elif TABLE_CAPTION_PATTERN.search(stripped):
+        result["reason"] = "tables"
+    elif (ALGORITHM_CAPTION_PATTERN.search(stripped)
+          or len(NUMBERED_LINE_PATTERN.findall(stripped)) >= MAX_NUMBERED_LINES):
+        result["reason"] = "algorithm"
+    elif sum(1 for char in stripped if _is_math_symbol(char)) * 1000 / len(stripped) > MAX_MATH_SYMBOLS_PER_1000:
+        result["reason"] = "math"
+    elif sum(1 for line in lines if len(line) < SHORT_LINE_CHARS) / len(lines) > MAX_SHORT_LINE_RATIO:
+        result["reason"] = "fragmented layout"
+    else:
+        result["route"] = "local"
+        result["reason"] = "text layer"
+    return result
+
+
+def text_to_chunks(text, page_index):
+    """Rebuild paragraphs and headings from a page's text layer
+
+    Lines are joined into a paragraph until one ends a sentence noticeably
+    short of the usual line width; hyphenated line breaks are merged.
+
+    Args:
+        text (str): Text extracted from the page
+        page_index (int): 0-indexed page number
+
+    Returns:
+        list: Chunks in the Landing AI response layout
+    """
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    if not lines:
+        return []
+    widths = sorted(len(line) for line in lines)
+    full_width = widths[int(len(widths) * 0.9)]
+
+    chunks = []
+    paragraph = ""
+
+    def add_chunk(chunk_text, chunk_type):
+        chunks.append({
+            "text": chunk_text,
+            "chunk_type": chunk_type,
+            "chunk_id": uuid.uuid4().hex,
+            "grounding": [{"page": page_index, "box": None}],
+        })
+
+    for line in lines:
+        if SECTION_HEADING_PATTERN.match(line) and len(line) < full_width * 0.75:
+            if paragraph:
+                add_chunk(paragraph, "text")
+                paragraph = ""
+            add_chunk(line, "title")
+            continue
+        if paragraph.endswith("-") and line[:1].islower():
+            paragraph = paragraph[:-1] + line
+        else:
+            paragraph = f"{paragraph} {line}" if paragraph else line
+        if SENTENCE_END_PATTERN.search(line) and len(line) < full_width * 0.85:
+            add_chunk(paragraph, "text")
+            paragraph = ""
+    if paragraph:
+        add_chunk(paragraph, "text")
+    return chunks
+
+
+def chunks_to_markdown(chunks):
+    """Render chunks as markdown, with plain-text titles as level 2 headers"""
+    return "\n\n".join(
+        f"## {chunk['text']}" if chunk.get("chunk_type") == "title" and not chunk["text"].startswith("#")
+        else chunk.get("text", "")
+        for chunk in chunks
+    )
+
+
+class BufferStream(io.RawIOBase):
+    """Seekable read-only file over a bytes-like buffer (bytes, memoryview, mmap)
+
+    Unlike io.BytesIO, it does not copy the buffer, and each stream has its
+    own position, so several readers can share one buffer across threads.
+    """
+
+    def __init__(self, data):
+        self._view = memoryview(data).cast("B")
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        count = max(0, min(len(buffer), len(self._view) - self._position))
+        buffer[:count] = self._view[self._position:self._position + count]
+        self._position += count
+        return count
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: len(self._view)}[whence]
+        self._position = max(0, base + offset)
+        return self._position
+
+    def tell(self):
+        return self._position
+
+    def close(self):
+        # Release the view so the caller can close an mmap it was taken from
+        if not self.closed:
+            self._view.release()
+        super().close()
+
+
+def open_pdf(pdf_data):
+    """Open a PDF from a path, a bytes-like buffer or a seekable stream, without copying it
+
+    Buffers (bytes, memoryview, mmap) are read through a BufferStream; close
+    reader.stream, or use pdf_reader(), to release it.
+    """
+    if isinstance(pdf_data, str):
+        return PdfReader(pdf_data)
+    try:
+        stream = BufferStream(pdf_data)
+    except TypeError:
+        # Not a buffer, e.g. an open file or Streamlit's UploadedFile
+        return PdfReader(pdf_data)
+    return PdfReader(stream)
+
+
+@contextmanager
+def pdf_reader(pdf_data):
+    """Open a PDF with open_pdf() for the duration of a block
+
+    The reader keeps every object it has parsed, image streams included, so
+    it is closed at the end of the block, which drops them.
+    """
+    reader = open_pdf(pdf_data)
+    try:
+        yield reader
+    finally:
+        stream = reader.stream
+        reader.close()
+        if isinstance(stream, BufferStream):
+            stream.close()
+
+
+def _route_page(page, index):
+    start = time.time()
+    try:
+        decision = classify_page(page)
+    except Exception as e:
+        decision = {"route": "remote", "reason": f"unreadable: {str(e)}", "text_chars": 0, "text": ""}
+    chunks = text_to_chunks(decision["text"], index) if decision["route"] == "local" else None
+    report = {
+        "page": index + 1,
+        "route": decision["route"],
+        "reason": decision["reason"],
+        "text_chars": decision["text_chars"],
+        "local_ms": (time.time() - start) * 1000,
+    }
+    return report, chunks
+
+
+def route_pdf(pdf_data, batch_pages=ROUTING_BATCH_PAGES):
+    """Classify every page and extract the local ones
+
+    Classifying a page resolves its images, so the pages are read in
+    batches, each with a reader of its own that is dropped afterwards.
+    Routing a document never holds more than one batch's objects.
+
+    Args:
+        pdf_data (bytes-like): PDF contents (see open_pdf)
+        batch_pages (int): Pages classified per reader
+
+    Returns:
+        dict: {"pages": per-page routing report, "local_chunks": chunks of
+        the local pages, "remote_pages": 0-indexed pages for the remote API}
+    """
+    pages, local_chunks, remote_pages = [], [], []
+    page_count = None
+    batch_start = 0
+    while page_count is None or batch_start < page_count:
+        with pdf_reader(pdf_data) as reader:
+            page_count = len(reader.pages)
+            for index in range(batch_start, min(batch_start + batch_pages, page_count)):
+                report, chunks = _route_page(reader.pages[index], index)
+                if chunks is None:
+                    remote_pages.append(index)
+                else:
+                    local_chunks.extend(chunks)
+                pages.append(report)
+        batch_start += batch_pages
+    return {"pages": pages, "local_chunks": local_chunks, "remote_pages": remote_pages}
+
+
+def _write_subset(pdf_data, page_indices, output):
+    with pdf_reader(pdf_data) as reader:
+        writer = PdfWriter()
+        for index in page_indices:
+            writer.add_page(reader.pages[index])
+        writer.write(output)
+
+
+@contextmanager
+def subset_pdf(pdf_data, page_indices):
+    """Write the given pages of a PDF to a temporary file and map it
+
+    The pages are copied with a reader of their own, which is dropped once
+    the subset is written, and the subset lives on disk rather than in
+    memory, so it can be uploaded without copying. Concurrent callers each
+    hold their own pages' objects while writing, so the number of subsets
+    written at once is bounded by the caller's workers.
+
+    Args:
+        pdf_data (bytes-like): PDF contents (see open_pdf)
+        page_indices (list): 0-indexed pages to keep, in order
+
+    Yields:
+        mmap.mmap: Read-only map of the subset PDF
+    """
+    with tempfile.TemporaryFile() as output:
+        _write_subset(pdf_data, page_indices, output)
+        output.flush()
+        with mmap.mmap(output.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
+
+
+def remap_chunks(response, page_map):
+    """Return the chunks of a subset PDF's response with pages of the original document
+
+    Args:
+        response (dict): Landing AI response for the subset PDF
+        page_map (list): Original 0-indexed page of each subset page
+
+    Returns:
+        list: Chunks with remapped groundings
+    """
+    data = response.get("data", response)
+    chunks = []
+    for chunk in data.get("chunks") or []:
+        chunk = dict(chunk)
+        chunk["grounding"] = [
+            {**grounding, "page": page_map[grounding.get("page") or 0]}
+            for grounding in chunk.get("grounding") or [{"page": 0}]
+        ]
+        chunks.append(chunk)
+    return chunks
+
+
+def response_from_chunks(chunks):
+    """Build a response in the Landing AI layout from chunks of any pages"""
+    chunks = list(chunks)
+    # Stable sort keeps the reading order within each page
+    chunks.sort(key=lambda chunk: (chunk.get("grounding") or [{}])[0].get("page") or 0)
+    return {"data": {"markdown": chunks_to_markdown(chunks), "chunks": chunks}}
+
+
+def merge_responses(local_chunks, remote_response, remote_pages, routing=None):
+    """Combine local chunks with the remote response for the remaining pages
+
+    Remote page numbers, including any "failed_pages", refer to the subset
+    PDF and are mapped back to the original document.
+
+    Args:
+        local_chunks (list): Chunks extracted locally
+        remote_response (dict): Landing AI response for the subset PDF, or None
+        remote_pages (list): Original 0-indexed page of each subset page
+        routing (list, optional): Per-page routing report to attach
+
+    Returns:
+        dict: Response in the Landing AI layout
+    """
+    chunks = list(local_chunks)
+    if remote_response:
+        chunks.extend(remap_chunks(remote_response, remote_pages))
+    response = response_from_chunks(chunks)
+    if remote_response and remote_response.get("failed_pages"):
+        response["failed_pages"] = [remote_pages[page] for page in remote_response["failed_pages"]]
+    if routing is not None:
+        response["routing"] = routing
+    return response
+
+
+def routing_report(pdf_paths):
+    """Route every page of a corpus without calling the remote API
+
+    Args:
+        pdf_paths (list): PDFs to classify
+
+    Returns:
+        list: (pdf_path, page report) rows
+    """
+    rows = []
+    for pdf_path in pdf_paths:
+        # Map the file so every routing batch reads it in place
+        with open(pdf_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            routed = route_pdf(mapped)
+        rows.extend((pdf_path, page) for page in routed["pages"])
+    return rows
+
+
+if __name__ == "__main__":
+    # Usage: python local_extraction.py [file.pdf | directory ...]
+    # Defaults to the split pages in spliter_doc/splitted_docs
+    inputs = sys.argv[1:] or [os.path.join("spliter_doc", "splitted_docs")]
+    paths = []
+    for item in inputs:
+        paths.extend(sorted(glob.glob(os.path.join(item, "*.pdf"))) if os.path.isdir(item) else [item])
+    if not paths:
+        print("No PDFs found")
+        sys.exit(1)
+
+    rows = routing_report(paths)
+    reasons = {}
+    for path, page in rows:
+        reasons[page["reason"]] = reasons.get(page["reason"], 0) + 1
+        print(f"{os.path.basename(path)} p{page['page']}: {page['route']:6} "
+              f"({page['reason']}, {page['text_chars']} chars, {page['local_ms']:.0f} ms)")
+
+    local_pages = [page for _, page in rows if page["route"] == "local"]
+    print(f"\nPages: {len(rows)}  Local: {len(local_pages)}  Remote: {len(rows) - len(local_pages)} "
+          f"({100 * len(local_pages) / len(rows):.1f}% of remote calls avoided)")
+    print(f"Average routing + local extraction time: "
+          f"{sum(page['local_ms'] for _, page in rows) / len(rows):.0f} ms/page")
+    for reason, count in sorted(reasons.items(), key=lambda item: -item[1]):
+        print(f"  {reason}: {count}")
@@ -0,0 +1,344 @@
+import argparse
+import glob
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from doc_extraction import PDFProcessor
+from doc_index import index_markdown
+from llm_cache import get_llm_cache
+from md_generator import process_json_to_markdown
+from resilience import get_metrics
+from spliter_doc.split import DEFAULT_OUTPUT_DIR as DEFAULT_SPLIT_DIR, iter_split_files, parse_page_range, pdf_fingerprint
+from tracing import get_tracer, in_current_context
+
+DEFAULT_MARKDOWN_DIR = os.path.join("spliter_doc", "md_docs")
+DEFAULT_MANIFEST_NAME = "manifest.json"
+DEFAULT_WORKERS = 4
+# Split outputs are named "<document>_page_<n>.pdf" or "<document>_pages_<a>-<b>.pdf"
+SPLIT_PAGE_PATTERN = re.compile(r"^(?P<document>.+)_pages?_(?P<first_page>\d+)(?:-\d+)?$")
+
+
+class ProgressManifest:
+    """JSON record of the converted pages, so re-runs only redo what changed
+
+    Each entry maps a split page PDF to its content fingerprint, extraction
+    JSON and markdown output. A page is skipped on the next run if it is
+    marked done, its markdown still exists and its fingerprint is unchanged;
+    its stored extraction is reused if only the markdown step has to rerun.
+    Source PDFs that could not be split are recorded as failed too.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.pages = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.pages = json.load(f).get("pages", {})
+
+    def get(self, page_path):
+        return self.pages.get(os.path.abspath(page_path), {})
+
+    def is_done(self, page_path, fingerprint):
+        entry = self.get(page_path)
+        return bool(
+            entry.get("status") == "done"
+            and entry.get("fingerprint") == fingerprint
+            and os.path.exists(entry.get("markdown") or "")
+        )
+
+    def stored_extraction(self, page_path, fingerprint):
+        """Return the saved extraction JSON path for an unchanged page, or None"""
+        entry = self.get(page_path)
+        extraction_path = entry.get("extraction")
+        if entry.get("fingerprint") == fingerprint and extraction_path and os.path.exists(extraction_path):
+            return extraction_path
+        return None
+
+    def record(self, page_path, status, fingerprint, markdown_path=None, extraction_path=None, error=None):
+        """Store the outcome of a page and persist the manifest"""
+        with self._lock:
+            self.pages[os.path.abspath(page_path)] = {
+                "status": status,
+                "fingerprint": fingerprint,
+                "markdown": markdown_path,
+                "extraction": extraction_path,
+                "error": error,
+                "updated_at": time.time(),
+            }
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"pages": self.pages}, f, indent=2)
+            os.replace(tmp_path, self.path)
+
+
+def collect_pdfs(inputs):
+    """Expand directories, glob patterns and file paths into a sorted list of PDFs
+
+    Args:
+        inputs (list): Directories, glob patterns or PDF paths
+
+    Returns:
+        list: Unique PDF paths
+    """
+    pdf_paths = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            pdf_paths.update(glob.glob(os.path.join(item, "*.pdf")))
+        else:
+            pdf_paths.update(path for path in glob.glob(item) if path.lower().endswith(".pdf"))
+    return sorted(pdf_paths)
+
+
+def convert_page(processor, page_path, output_dir, extraction_path=None):
+    """Extract a page PDF and write its markdown
+
+    The extraction JSON is saved next to the markdown, so a later run can
+    regenerate the markdown without extracting the page again.
+
+    Args:
+        processor (PDFProcessor): Shared processor
+        page_path (str): Split page PDF
+        output_dir (str): Directory for the JSON and markdown outputs
+        extraction_path (str, optional): Stored extraction to reuse
+
+    Returns:
+        tuple: (markdown_path, extraction_path), with None for the stages that failed
+    """
+    stem = os.path.splitext(os.path.basename(page_path))[0]
+    with get_tracer().span("page_conversion", page=stem, reused_extraction=extraction_path is not None):
+        if extraction_path:
+            with open(extraction_path, "r", encoding="utf-8") as f:
+                result = json.load(f)
+        else:
+            result = processor.process_pdf(page_path)
+            if not result:
+                return None, None
+            extraction_path = os.path.join(output_dir, f"{stem}.json")
+            with open(extraction_path, "w", encoding="utf-8") as f:
+                json.dump(result, f, ensure_ascii=False)
+        markdown_path = os.path.join(output_dir, f"{stem}.md")
+        markdown_content = process_json_to_markdown(result, markdown_path)
+        return (markdown_path if markdown_content else None), extraction_path
+
+
+def assemble_documents(page_markdowns, output_dir, failures=None):
+    """Concatenate the page markdowns of each document in page order
+
+    Documents with failed or missing pages are reported and not written, so
+    an incomplete "<document>.md" is never passed off as the whole document.
+
+    Args:
+        page_markdowns (dict): {document name: {first page: markdown path}}
+        output_dir (str): Directory for the "<document>.md" files
+        failures (dict, optional): {document name: [failure descriptions]}
+
+    Returns:
+        list: Paths of the assembled documents
+    """
+    failures = failures or {}
+    assembled = []
+    for document, pages in page_markdowns.items():
+        if failures.get(document):
+            print(f"Incomplete: {document} not assembled ({'; '.join(failures[document])})")
+            continue
+        parts = []
+        for first_page in sorted(pages):
+            with open(pages[first_page], "r", encoding="utf-8") as f:
+                parts.append(f.read().strip())
+        document_path = os.path.join(output_dir, f"{document}.md")
+        with open(document_path, "w", encoding="utf-8") as f:
+            f.write("\n\n".join(parts) + "\n")
+        assembled.append(document_path)
+    return assembled
+
+
+def run_pipeline(inputs, output_dir=DEFAULT_MARKDOWN_DIR, split_dir=DEFAULT_SPLIT_DIR, page_range=None,
+                 pages_per_chunk=1, workers=DEFAULT_WORKERS, split_workers=None, manifest_path=None,
+                 split=True, index=True):
+    """Split, extract and convert a corpus of PDFs to markdown
+
+    Pages are handed to the extraction workers as soon as the splitter yields
+    them, so conversion starts before splitting finishes. Only pages whose
+    content fingerprint changed since the last run are converted again, then
+    each affected document is reassembled into "<document>.md" and indexed
+    for retrieval.
+
+    Args:
+        inputs (list): Directories, glob patterns or PDF paths
+        output_dir (str): Directory for the generated markdown files
+        split_dir (str): Directory for the split page PDFs
+        page_range (list, optional): 1-indexed pages to keep, all pages if None
+        pages_per_chunk (int): Pages per split PDF
+        workers (int): Pages extracted and converted concurrently
+        split_workers (int, optional): Splitter processes, defaults to the CPU count
+        manifest_path (str, optional): Progress manifest, defaults to output_dir/manifest.json
+        split (bool): If False, inputs are treated as already split pages
+        index (bool): If False, documents are not added to the retrieval index
+
+    A source PDF or page that cannot be read or converted is recorded as
+    failed in the manifest and the summary, and the batch carries on; its
+    document is reported as incomplete and is neither assembled nor indexed.
+
+    Returns:
+        dict: Throughput summary, with the failures of every incomplete document
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = ProgressManifest(manifest_path or os.path.join(output_dir, DEFAULT_MANIFEST_NAME))
+    processor = PDFProcessor(max_workers=workers)
+    pdf_paths = collect_pdfs(inputs)
+
+    counts = {"converted": 0, "skipped": 0, "failed": 0}
+    # Markdown of every page per document, the documents with changed pages
+    # and the failures that leave a document incomplete
+    page_markdowns = {}
+    changed_documents = set()
+    failures = {}
+
+    def track_page(page_path, markdown_path, changed, error=None):
+        match = SPLIT_PAGE_PATTERN.match(os.path.splitext(os.path.basename(page_path))[0])
+        if not match:
+            return
+        document = match.group("document")
+        if markdown_path:
+            page_markdowns.setdefault(document, {})[int(match.group("first_page"))] = markdown_path
+        if changed:
+            changed_documents.add(document)
+        if error is not None:
+            failures.setdefault(document, []).append(f"page {match.group('first_page')}: {error}")
+
+    def split_failed(pdf_path, error):
+        counts["failed"] += 1
+        manifest.record(pdf_path, "failed", None, error=str(error))
+        document = os.path.splitext(os.path.basename(pdf_path))[0]
+        failures.setdefault(document, []).append(f"split: {error}")
+
+    def page_failed(page_path, fingerprint, error, extraction_path=None):
+        counts["failed"] += 1
+        manifest.record(page_path, "failed", fingerprint, extraction_path=extraction_path, error=error)
+        track_page(page_path, None, changed=True, error=error)
+        print(f"Failed: {os.path.basename(page_path)} ({error})")
+
+    if split:
+        pages = (page_path for page_path, _ in iter_split_files(
+            pdf_paths, split_dir, page_range, pages_per_chunk, split_workers, on_error=split_failed))
+    else:
+        pages = iter(pdf_paths)
+
+    start = time.time()
+    with get_tracer().span("batch", inputs=len(pdf_paths)), ThreadPoolExecutor(max_workers=workers) as executor:
+        convert = in_current_context(convert_page)
+        futures = {}
+        for page_path in pages:
+            try:
+                fingerprint = pdf_fingerprint(page_path)
+            except Exception as e:
+                page_failed(page_path, None, f"unreadable page PDF: {e}")
+                continue
+            if manifest.is_done(page_path, fingerprint):
+                counts["skipped"] += 1
+                track_page(page_path, manifest.get(page_path)["markdown"], changed=False)
+                continue
+            extraction_path = manifest.stored_extraction(page_path, fingerprint)
+            future = executor.submit(convert, processor, page_path, output_dir, extraction_path)
+            futures[future] = (page_path, fingerprint)
+
+        for future in as_completed(futures):
+            page_path, fingerprint = futures[future]
+            try:
+                markdown_path, extraction_path = future.result()
+                error = None if markdown_path else "extraction or markdown generation failed"
+            except Exception as e:
+                markdown_path, extraction_path, error = None, None, str(e)
+            if markdown_path:
+                counts["converted"] += 1
+                track_page(page_path, markdown_path, changed=True)
+                manifest.record(page_path, "done", fingerprint, markdown_path, extraction_path)
+                print(f"Converted: {os.path.basename(page_path)} -> {markdown_path}")
+            else:
+                page_failed(page_path, fingerprint, error, extraction_path)
+    processor.close()
+
+    # Only documents with a changed page, or never assembled, are rewritten
+    to_assemble = {
+        document: pages for document, pages in page_markdowns.items()
+        if document in changed_documents or not os.path.exists(os.path.join(output_dir, f"{document}.md"))
+    }
+    for document_path in assemble_documents(to_assemble, output_dir, failures):
+        print(f"Assembled: {document_path}")
+
+    if index:
+        # Unchanged documents are skipped by the index itself
+        for document in page_markdowns:
+            if document in failures:
+                continue
+            with open(os.path.join(output_dir, f"{document}.md"), "r", encoding="utf-8") as f:
+                indexed = index_markdown(document, f.read())
+            if indexed:
+                print(f"Indexed: {document} ({indexed} chunks)")
+
+    elapsed = time.time() - start
+    return {
+        **counts,
+        "elapsed_seconds": elapsed,
+        "pages_per_minute": counts["converted"] / elapsed * 60 if elapsed else 0.0,
+        "incomplete_documents": failures,
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Convert PDFs to markdown without the Streamlit UI")
+    parser.add_argument("inputs", nargs="*", help="PDF files, directories or glob patterns")
+    parser.add_argument("--pdf", help="Single PDF file to convert")
+    parser.add_argument("--page", type=int, help="Single page to convert (0-indexed)")
+    parser.add_argument("--pages", help="Pages to convert, 1-indexed, e.g. '1-5,8'")
+    parser.add_argument("--chunk-size", type=int, default=1, help="Pages per split PDF")
+    parser.add_argument("--output-dir", default=DEFAULT_MARKDOWN_DIR, help="Directory for markdown outputs")
+    parser.add_argument("--split-dir", default=str(DEFAULT_SPLIT_DIR), help="Directory for split page PDFs")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Concurrent page conversions")
+    parser.add_argument("--split-workers", type=int, default=None, help="Splitter processes (default: CPU count)")
+    parser.add_argument("--manifest", help="Progress manifest path (default: <output-dir>/manifest.json)")
+    parser.add_argument("--no-split", action="store_true", help="Treat inputs as already split page PDFs")
+    parser.add_argument("--no-index", action="store_true", help="Do not add documents to the retrieval index")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    inputs = list(args.inputs)
+    if args.pdf:
+        inputs.append(args.pdf)
+    if not inputs:
+        raise SystemExit("No input PDFs given")
+    page_range = parse_page_range(args.pages)
+    if args.page is not None:
+        page_range = [args.page + 1]
+
+    summary = run_pipeline(
+        inputs,
+        output_dir=args.output_dir,
+        split_dir=args.split_dir,
+        page_range=page_range,
+        pages_per_chunk=args.chunk_size,
+        workers=args.workers,
+        split_workers=args.split_workers,
+        manifest_path=args.manifest,
+        split=not args.no_split,
+        index=not args.no_index
+    )
+
+    print(f"\nConverted: {summary['converted']}  Skipped: {summary['skipped']}  Failed: {summary['failed']}")
+    print(f"Elapsed: {summary['elapsed_seconds']:.1f}s  Throughput: {summary['pages_per_minute']:.1f} pages/min")
+    for document, document_failures in summary["incomplete_documents"].items():
+        print(f"  Incomplete {document}: {'; '.join(document_failures)}")
+    for stage in get_tracer().summary():
+        print(f"  {stage['name']}: {stage['count']} calls, {stage['avg_ms']:.0f} ms avg")
+    for backend in get_metrics():
+        p99 = f"{backend['p99_ms']:.0f} ms" if backend["p99_ms"] is not None else "n/a"
+        print(f"  {backend['backend']} [{backend['state']}]: {backend['calls']} attempts, "
+              f"{backend['retries']} retries, {backend['failures']} failures, p99 {p99}")
+    llm_cache = get_llm_cache().stats()
+    print(f"  LLM cache: {llm_cache['hits']} hits, {llm_cache['misses']} misses")
@@ -1,13 +1,194 @@
+import asyncio
+import functools
 import os
 import re
-from langchain_groq import ChatGroq
-from dotenv import load_dotenv
-from langchain.prompts import PromptTemplate
-from doc_extraction import PDFProcessor
+from concurrent.futures import ThreadPoolExecutor
+from llm_cache import get_llm_cache
+from llm_pool import get_task_llm, astream_llm, stream_llm, estimate_tokens, DEFAULT_MODEL
+from prompt_serializer import iter_extraction_chunks, serialize_chunks, serialize_extraction
+from tracing import get_tracer, in_current_context
+
+# Estimated input tokens per markdown conversion window
+DEFAULT_WINDOW_TOKENS = 3000
+DEFAULT_MAP_WORKERS = 4
+HEADER_PATTERN = re.compile(r'^(#{1,6})(?=\s)')
+# Reasoning models wrap their chain of thought in these tags before answering
+THINK_OPEN = "<think>"
+THINK_CLOSE = "</think>"
+# finish_reason values of a reply that ended on its own rather than at max_tokens
+STOP_FINISH_REASONS = ("stop", "end_turn", "stop_sequence")
+
+TEXT_PROMPT_TEMPLATE = """Generate a clear, descriptive summary of the following content in English. Focus on creating well-structured paragraphs that flow naturally when read aloud:
+
+Guidelines:
+- Present technical terms and equations in a clear, spoken-word format
+- Create coherent paragraphs suitable for text-to-speech
+- Ensure natural transitions between topics
+- Keep the tone professional but accessible
+- Format mathematical equations in a way that's easy to understand when read aloud
+- Wrap the output in ```text and ``` tags
+
+Content to summarize:
+{content}"""
+
+MARKDOWN_PROMPT_TEMPLATE = """Convert the following content into a well-structured markdown format while preserving the original information and technical details. Translate the content to Spanish while keeping technical terms in English:
+
+Guidelines:
+- Maintain all technical terms (like 'deep learning', 'embedding'), numbers, and mathematical formulas in English exactly as they appear
+- Translate all non-technical content to Spanish
+- Preserve the hierarchical structure of the content
+- Use appropriate markdown syntax for:
+  * Headers (using #, ##, ###)
+  * Lists (using - or * for bullets)
+  * Code blocks (using ```)
+  * Mathematical equations in md format
+- Keep all references and citations in their original format
+- Generate tables info, their contents, and abbreviations in English
+- Ensure the output is wrapped in ```markdown and ``` tags{part_guidelines}
+
+Content to format:
+{content}"""
+
+@functools.lru_cache(maxsize=None)
+def compile_prompt_template(template):
+    """Build a PromptTemplate once and reuse it for every prompt
+    
+    langchain is imported on first use rather than with this module, so
+    importing md_generator stays cheap until a prompt is actually needed.
+    
+    Args:
+        template (str): Template text with {variable} placeholders
+        
+    Returns:
+        PromptTemplate: Compiled template
+    """
+    from langchain.prompts import PromptTemplate
+
+    return PromptTemplate.from_template(template)
+
+def _lookup_completion(llm, template, variables):
+    """Look up a completion in the LLM response cache
+    
+    Returns:
+        tuple: (cache key, cached completion text or None)
+    """
+    model_name = getattr(llm, "model_name", DEFAULT_MODEL)
+    params = {"temperature": getattr(llm, "temperature", None), "max_tokens": getattr(llm, "max_tokens", None)}
+    cache = get_llm_cache()
+    key = cache.make_key(model_name, template, variables, params)
+    with get_tracer().span("llm.cache", model=model_name) as span:
+        cached = cache.get(key)
+        span.set_attribute("hit", cached is not None)
+    return key, cached
+
+def _finish_reason(message):
+    """Return why the LLM stopped generating a message or chunk, if it says"""
+    return (getattr(message, "response_metadata", None) or {}).get("finish_reason")
+
+def _store_completion(llm, template, key, text, language, finish_reason):
+    """Cache the text of a completion, if its answer is complete
+    
+    A completion is stored when its fenced block was closed, or when the
+    model reports it stopped on its own and a non-empty block can be
+    extracted. A reply cut off at max_tokens (finish_reason "length"), or
+    made only of reasoning, is not, so it is generated again next time
+    instead of being replayed for as long as the cache keeps it.
+    """
+    stripper = FencedBlockStripper(language)
+    block = stripper.feed(text)
+    closed = stripper.done
+    block += stripper.flush()
+    if closed or (finish_reason in STOP_FINISH_REASONS and block.strip()):
+        get_llm_cache().set(key, text, getattr(llm, "model_name", DEFAULT_MODEL), template)
+
+async def acomplete(llm, template, variables, language):
+    """Fill a prompt template and return the LLM completion text
+    
+    Completions already generated for the same model, template and content
+    are served from the LLM response cache without calling the LLM. The
+    completion is streamed and the stream closed as soon as the closing
+    fence arrives, so no tokens are read past the answer.
+    
+    Args:
+        llm: LangChain chat model
+        template (str): Prompt template text
+        variables (dict): Values to fill the template with
+        language (str): Language tag of the completion's fenced block ("markdown", "text")
+        
+    Returns:
+        str: Completion text, up to the closing fence
+    """
+    key, cached = _lookup_completion(llm, template, variables)
+    if cached is not None:
+        return cached
+    stream = astream_llm(llm, compile_prompt_template(template).format(**variables))
+    stripper = FencedBlockStripper(language)
+    text = ""
+    finish_reason = None
+    try:
+        async for chunk in stream:
+            piece = _message_text(chunk)
+            finish_reason = _finish_reason(chunk) or finish_reason
+            text += piece
+            stripper.feed(piece)
+            if stripper.done:
+                break
+    finally:
+        await stream.aclose()
+    _store_completion(llm, template, key, text, language, finish_reason)
+    return text
+
+def stream_complete(llm, template, variables, language):
+    """Stream the fenced block of a completion as it is generated
+    
+    Reasoning is dropped as it arrives and the stream is closed as soon as
+    the closing fence does, so no tokens are read past the answer. A cached
+    completion is replayed at once instead, and a streamed one is cached.
+    
+    Args:
+        llm: LangChain chat model
+        template (str): Prompt template text
+        variables (dict): Values to fill the template with
+        language (str): Language tag of the fenced block ("markdown", "text")
+        
+    Yields:
+        str: Consecutive pieces of the block's content
+    """
+    key, cached = _lookup_completion(llm, template, variables)
+    stream = None
+    if cached is not None:
+        chunks = [cached]
+    else:
+        stream = stream_llm(llm, compile_prompt_template(template).format(**variables))
+        chunks = stream
+    stripper = FencedBlockStripper(language)
+    response_text = ""
+    finish_reason = None
+    try:
+        for chunk in chunks:
+            text = _message_text(chunk)
+            # Streaming APIs report it on the last chunk
+            finish_reason = _finish_reason(chunk) or finish_reason
+            response_text += text
+            piece = stripper.feed(text)
+            if piece:
+                yield piece
+            if stripper.done:
+                break
+    finally:
+        if stream is not None:
+            stream.close()
+    piece = stripper.flush()
+    if piece:
+        yield piece
+    # Only reached when the stream ended or its block was closed; a failed
+    # or abandoned stream is never cached
+    if cached is None:
+        _store_completion(llm, template, key, response_text, language, finish_reason)
 
 class TextGenerator:
     def __init__(self):
-        self.llm = init_llm()
+        self.llm = init_llm("narration")
 
     def create_text_prompt(self, json_response):
         """Create a prompt for generating descriptive paragraphs
@@ -18,22 +199,12 @@ class TextGenerator:
         Returns:
             str: Formatted prompt for the LLM
         """
-        prompt_template = PromptTemplate(
-            input_variables=["content"],
-            template="""Generate a clear, descriptive summary of the following content in English. Focus on creating well-structured paragraphs that flow naturally when read aloud:
+        prompt_template = compile_prompt_template(TEXT_PROMPT_TEMPLATE)
+        return prompt_template.format(**self.text_prompt_variables(json_response))
 
-Guidelines:
-- Present technical terms and equations in a clear, spoken-word format
-- Create coherent paragraphs suitable for text-to-speech
-- Ensure natural transitions between topics
-- Keep the tone professional but accessible
-- Format mathematical equations in a way that's easy to understand when read aloud
-- Wrap the output in ```text and ``` tags
-
-Content to summarize:
-{content}"""
-        )
-        return prompt_template.format(content=json_response)
+    def text_prompt_variables(self, json_response):
+        """Values the narration prompt template is filled with"""
+        return {"content": serialize_extraction(json_response)}
 
     def extract_text_content(self, llm_response):
         """Extract clean text content from between code blocks
@@ -44,11 +215,7 @@ Content to summarize:
         Returns:
             str: Extracted text content
         """
-        pattern = r'```text\n(.+?)\n```'
-        match = re.search(pattern, llm_response, re.DOTALL)
-        if match:
-            return match.group(1).strip()
-        return llm_response
+        return extract_fenced_block(llm_response, "text")
 
     def generate_text(self, json_response):
         """Generate descriptive text from JSON response
@@ -60,56 +227,140 @@ Content to summarize:
             str: Generated text content or None if error occurs
         """
         try:
-            prompt = self.create_text_prompt(json_response)
-            raw_response = self.llm.invoke(prompt)
-            message_content = raw_response.content if hasattr(raw_response, 'content') else str(raw_response)
+            variables = self.text_prompt_variables(json_response)
+            return "".join(stream_complete(self.llm, TEXT_PROMPT_TEMPLATE, variables, "text"))
+        except Exception as e:
+            print(f"Error generating text: {str(e)}")
+            return None
+
+    async def agenerate_text(self, json_response):
+        """Asynchronously generate descriptive text from JSON response
+        
+        Args:
+            json_response (dict): JSON response from Landing AI API
+            
+        Returns:
+            str: Generated text content or None if error occurs
+        """
+        try:
+            message_content = await acomplete(
+                self.llm, TEXT_PROMPT_TEMPLATE, self.text_prompt_variables(json_response), "text"
+            )
             return self.extract_text_content(message_content)
         except Exception as e:
             print(f"Error generating text: {str(e)}")
             return None
 
-def init_llm():
-    """Initialize the Groq LLM with environment variables
+def init_llm(task="markdown"):
+    """Return the shared Groq LLM client configured for a generation task
+    
+    Args:
+        task (str): "markdown" or "narration", see llm_pool.TASK_DEFAULTS
+    
+    Returns:
+        ChatGroq: Shared LLM instance from the process-wide pool
+    """
+    return get_task_llm(task)
+
+def pack_windows(chunks, max_tokens=DEFAULT_WINDOW_TOKENS):
+    """Pack consecutive chunks into windows that fit a token budget
+    
+    A chunk larger than the budget gets a window of its own.
     
+    Args:
+        chunks (iterable): Chunks in reading order
+        max_tokens (int): Estimated token budget per window
+        
     Returns:
-        ChatGroq: Initialized LLM instance
+        list: Lists of chunks, one list per window
     """
-    load_dotenv()
-    return ChatGroq(
-        api_key=os.getenv("GROQ_API_KEY"),
-        model_name="deepseek-r1-distill-llama-70b"
-    )
+    windows = []
+    current, current_tokens = [], 0
+    for chunk in chunks:
+        chunk_tokens = estimate_tokens(chunk["text"])
+        if current and current_tokens + chunk_tokens > max_tokens:
+            windows.append(current)
+            current, current_tokens = [], 0
+        current.append(chunk)
+        current_tokens += chunk_tokens
+    if current:
+        windows.append(current)
+    return windows
 
-def create_markdown_prompt(json_response):
-    """Create a prompt for markdown conversion with language specifications
+def build_markdown_windows(json_response, max_tokens=DEFAULT_WINDOW_TOKENS):
+    """Split a Landing AI response into prompt-sized contents
+    
+    Responses without chunks are passed through whole, as a single window.
     
     Args:
         json_response (dict): JSON response from Landing AI API
+        max_tokens (int): Estimated token budget per window
         
     Returns:
-        str: Formatted prompt for the LLM
+        list: Window contents in document order
     """
-    prompt_template = PromptTemplate(
-        input_variables=["content"],
-        template="""Convert the following content into a well-structured markdown format while preserving the original information and technical details. Translate the content to Spanish while keeping technical terms in English:
+    windows = pack_windows(iter_extraction_chunks(json_response), max_tokens)
+    if not windows:
+        return [serialize_extraction(json_response)]
+    return [serialize_chunks(window) for window in windows]
 
-Guidelines:
-- Maintain all technical terms (like 'deep learning', 'embedding'), numbers, and mathematical formulas in English exactly as they appear
-- Translate all non-technical content to Spanish
-- Preserve the hierarchical structure of the content
-- Use appropriate markdown syntax for:
-  * Headers (using #, ##, ###)
-  * Lists (using - or * for bullets)
-  * Code blocks (using ```)
-  * Mathematical equations in md format
-- Keep all references and citations in their original format
-- Generate tables info, their contents, and abbreviations in English
-- Ensure the output is wrapped in ```markdown and ``` tags
+def normalize_header_levels(markdown_content, min_level=2):
+    """Demote headers so the shallowest one is at least min_level
+    
+    Used on continuation windows so that only the first window can emit
+    a top-level title. Lines inside fenced code blocks are left untouched.
+    
+    Args:
+        markdown_content (str): Markdown of one window
+        min_level (int): Minimum header level allowed
+        
+    Returns:
+        str: Markdown with shifted headers
+    """
+    lines = markdown_content.split("\n")
+    header_lines = []
+    in_code_block = False
+    for index, line in enumerate(lines):
+        if line.lstrip().startswith("```"):
+            in_code_block = not in_code_block
+            continue
+        match = HEADER_PATTERN.match(line)
+        if match and not in_code_block:
+            header_lines.append((index, len(match.group(1))))
 
-Content to format:
-{content}"""
-    )
-    return prompt_template.format(content=json_response)
+    if not header_lines:
+        return markdown_content
+    shift = min_level - min(level for _, level in header_lines)
+    if shift <= 0:
+        return markdown_content
+    for index, level in header_lines:
+        new_level = min(level + shift, 6)
+        lines[index] = "#" * new_level + lines[index][level:]
+    return "\n".join(lines)
+
+def create_markdown_prompt(json_response, part=None, total_parts=None):
+    """Create a prompt for markdown conversion with language specifications
+    
+    Args:
+        json_response (dict or str): JSON response from Landing AI API, or one serialized window of it
+        part (int, optional): 1-indexed window number when the document is split
+        total_parts (int, optional): Total number of windows
+        
+    Returns:
+        str: Formatted prompt for the LLM
+    """
+    prompt_template = compile_prompt_template(MARKDOWN_PROMPT_TEMPLATE)
+    return prompt_template.format(**markdown_prompt_variables(json_response, part, total_parts))
+
+def markdown_prompt_variables(json_response, part=None, total_parts=None):
+    """Values the markdown prompt template is filled with (see create_markdown_prompt)"""
+    part_guidelines = ""
+    if total_parts and total_parts > 1:
+        part_guidelines = f"\n- This is part {part} of {total_parts} of a longer document"
+        if part > 1:
+            part_guidelines += ": continue it without adding a document title, using ## or deeper headers"
+    content = json_response if isinstance(json_response, str) else serialize_extraction(json_response)
+    return {"content": content, "part_guidelines": part_guidelines}
 
 def extract_markdown_content(llm_response):
     """Extract markdown content from between code blocks
@@ -120,11 +371,106 @@ def extract_markdown_content(llm_response):
     Returns:
         str: Extracted markdown content
     """
-    pattern = r'```markdown\n(.+?)\n```'
-    match = re.search(pattern, llm_response, re.DOTALL)
-    if match:
-        return match.group(1).strip()
-    return llm_response
+    return extract_fenced_block(llm_response, "markdown")
+
+def extract_fenced_block(llm_response, language):
+    """Extract the content of the first ```<language> block of a complete response
+    
+    Reasoning (<think> blocks) before the block is skipped. Without a fence,
+    the whole response minus its reasoning is returned.
+    
+    Args:
+        llm_response (str): Raw response from LLM
+        language (str): Language tag of the fenced block
+        
+    Returns:
+        str: Block content
+    """
+    stripper = FencedBlockStripper(language)
+    return stripper.feed(llm_response) + stripper.flush()
+
+class FencedBlockStripper:
+    """Incrementally extract a fenced block from a streamed LLM response
+    
+    Streaming counterpart of extract_markdown_content and
+    TextGenerator.extract_text_content. <think> reasoning is dropped as it
+    arrives and other text before the opening fence is held back. Content is
+    released as it arrives, except for a few trailing characters that could
+    be the start of the closing fence. Once the closing fence arrives, done
+    is set so the caller can stop reading the stream. If no fence ever
+    appears, flush() returns the whole response without its reasoning, like
+    the non-streaming fallback.
+    """
+
+    CLOSE_FENCE = "\n```"
+
+    def __init__(self, language="markdown"):
+        self.open_fence = f"```{language}\n"
+        self._buffer = ""
+        self._reasoning = ""
+        self._thinking = False
+        self._inside = False
+        self._started = False
+        self.done = False
+
+    def feed(self, text):
+        """Add streamed text and return the content that can be shown now
+        
+        Args:
+            text (str): Next piece of the LLM response
+            
+        Returns:
+            str: Markdown content ready to emit, possibly empty
+        """
+        if self.done:
+            return ""
+        if not self._inside:
+            if self._thinking:
+                self._reasoning += text
+                end = self._reasoning.find(THINK_CLOSE)
+                if end == -1:
+                    # Only a partial closing tag needs to be kept
+                    self._reasoning = self._reasoning[-(len(THINK_CLOSE) - 1):]
+                    return ""
+                text = self._reasoning[end + len(THINK_CLOSE):]
+                self._reasoning = ""
+                self._thinking = False
+            self._buffer += text
+            start = self._buffer.find(self.open_fence)
+            think = self._buffer.find(THINK_OPEN)
+            if think != -1 and (start == -1 or think < start):
+                rest = self._buffer[think + len(THINK_OPEN):]
+                self._buffer = self._buffer[:think]
+                self._thinking = True
+                return self.feed(rest)
+            if start == -1:
+                return ""
+            self._buffer = self._buffer[start + len(self.open_fence):]
+            self._inside = True
+        else:
+            self._buffer += text
+
+        end = self._buffer.find(self.CLOSE_FENCE)
+        if end != -1:
+            ready = self._buffer[:end].rstrip()
+            self._buffer = ""
+            self.done = True
+        else:
+            # Hold back a possible partial closing fence
+            holdback = len(self.CLOSE_FENCE) - 1
+            ready = self._buffer[:-holdback] if len(self._buffer) > holdback else ""
+            self._buffer = self._buffer[len(ready):]
+        if not self._started:
+            ready = ready.lstrip()
+            self._started = bool(ready)
+        return ready
+
+    def flush(self):
+        """Return whatever is still buffered once the stream has ended"""
+        remaining = "" if self.done else self._buffer
+        self._buffer = ""
+        self.done = True
+        return remaining.strip() if not self._started else remaining.rstrip()
 
 def save_markdown(content, output_path):
     """Save markdown content to file
@@ -138,23 +484,56 @@ def save_markdown(content, output_path):
         f.write(content)
     print(f"Markdown file saved successfully at: {output_path}")
 
-def process_json_to_markdown(json_response, output_path=None):
+def _message_text(raw_response):
+    # Extract content from AIMessage object
+    return raw_response.content if hasattr(raw_response, 'content') else str(raw_response)
+
+def _convert_window(llm, window, part, total_parts):
+    """Convert one window, reading the LLM stream only up to its closing fence"""
+    variables = markdown_prompt_variables(window, part, total_parts)
+    markdown_content = "".join(stream_complete(llm, MARKDOWN_PROMPT_TEMPLATE, variables, "markdown"))
+    # The fence is stripped while streaming, so only the header pass is timed
+    with get_tracer().span("markdown_extraction", part=part, markdown_chars=len(markdown_content)):
+        if part > 1:
+            markdown_content = normalize_header_levels(markdown_content)
+        return markdown_content
+
+def _window_markdown(message_content, part):
+    """Extract the markdown of one window, demoting headers after the first"""
+    with get_tracer().span("markdown_extraction", part=part, response_chars=len(message_content)) as span:
+        markdown_content = extract_markdown_content(message_content)
+        span.set_attribute("markdown_chars", len(markdown_content))
+        if part > 1:
+            markdown_content = normalize_header_levels(markdown_content)
+        return markdown_content
+
+def process_json_to_markdown(json_response, output_path=None, max_tokens=DEFAULT_WINDOW_TOKENS,
+                             max_workers=DEFAULT_MAP_WORKERS):
     """Convert JSON response to markdown format using Groq LLM
     
+    Long documents are packed into token-budgeted windows that are converted
+    in parallel and stitched back together in order.
+    
     Args:
         json_response (dict): JSON response from Landing AI API
         output_path (str, optional): Path to save the markdown file. If None, only returns the content
+        max_tokens (int): Estimated token budget per window
+        max_workers (int): Maximum number of windows converted concurrently
         
     Returns:
         str: Generated markdown content or None if error occurs
     """
     try:
         llm = init_llm()
-        prompt = create_markdown_prompt(json_response)
-        raw_response = llm.invoke(prompt)
-        # Extract content from AIMessage object
-        message_content = raw_response.content if hasattr(raw_response, 'content') else str(raw_response)
-        markdown_content = extract_markdown_content(message_content)
+        windows = build_markdown_windows(json_response, max_tokens)
+        total_parts = len(windows)
+
+        def convert(part):
+            return _convert_window(llm, windows[part - 1], part, total_parts)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            parts = list(executor.map(in_current_context(convert), range(1, total_parts + 1)))
+        markdown_content = "\n\n".join(parts)
         
         if output_path:
             save_markdown(markdown_content, output_path)
@@ -164,6 +543,88 @@ def process_json_to_markdown(json_response, output_path=None):
         print(f"Error generating markdown: {str(e)}")
         return None
 
+async def aprocess_json_to_markdown(json_response, output_path=None, max_tokens=DEFAULT_WINDOW_TOKENS,
+                                    max_workers=DEFAULT_MAP_WORKERS):
+    """Asynchronously convert JSON response to markdown format using Groq LLM
+    
+    Args:
+        json_response (dict): JSON response from Landing AI API
+        output_path (str, optional): Path to save the markdown file. If None, only returns the content
+        max_tokens (int): Estimated token budget per window
+        max_workers (int): Maximum number of windows converted concurrently
+        
+    Returns:
+        str: Generated markdown content or None if error occurs
+    """
+    try:
+        llm = init_llm()
+        windows = build_markdown_windows(json_response, max_tokens)
+        total_parts = len(windows)
+        semaphore = asyncio.Semaphore(max_workers)
+
+        async def convert(part):
+            variables = markdown_prompt_variables(windows[part - 1], part, total_parts)
+            async with semaphore:
+                message_content = await acomplete(llm, MARKDOWN_PROMPT_TEMPLATE, variables, "markdown")
+            return _window_markdown(message_content, part)
+
+        parts = await asyncio.gather(*(convert(part) for part in range(1, total_parts + 1)))
+        markdown_content = "\n\n".join(parts)
+        
+        if output_path:
+            save_markdown(markdown_content, output_path)
+            
+        return markdown_content
+    except Exception as e:
+        print(f"Error generating markdown: {str(e)}")
+        return None
+
+def stream_json_to_markdown(json_response, llm=None, max_tokens=DEFAULT_WINDOW_TOKENS,
+                            max_workers=DEFAULT_MAP_WORKERS):
+    """Stream the markdown conversion of a JSON response as it is generated
+    
+    The first window is streamed token by token with its fence stripped on
+    the fly. Later windows of long documents are converted in parallel in the
+    background and yielded in order once the first window is done.
+    
+    Args:
+        json_response (dict): JSON response from Landing AI API
+        llm (optional): Chat model to use, defaults to the shared Groq client
+        max_tokens (int): Estimated token budget per window
+        max_workers (int): Maximum number of background windows converted concurrently
+        
+    Yields:
+        str: Consecutive pieces of the markdown content
+        
+    Raises:
+        Exception: Whatever made a window fail, after the pieces already
+        yielded, so the caller knows the markdown is incomplete
+    """
+    try:
+        llm = llm or init_llm()
+        windows = build_markdown_windows(json_response, max_tokens)
+        total_parts = len(windows)
+
+        def convert(part):
+            return _convert_window(llm, windows[part - 1], part, total_parts)
+
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            remaining_parts = [executor.submit(in_current_context(convert), part) for part in range(2, total_parts + 1)]
+            variables = markdown_prompt_variables(windows[0], 1, total_parts)
+            yield from stream_complete(llm, MARKDOWN_PROMPT_TEMPLATE, variables, "markdown")
+
+            for future in remaining_parts:
+                yield "\n\n" + future.result()
+        finally:
+            # Windows that have not started are not needed once the stream has
+            # failed or the caller has stopped reading it, and closing an
+            # abandoned stream must not wait for the running ones
+            executor.shutdown(wait=False, cancel_futures=True)
+    except Exception as e:
+        print(f"Error generating markdown: {str(e)}")
+        raise
+
 # # Example usage:
 # processor = PDFProcessor()
 # result = processor.process_pdf("spliter_doc/splitted_docs/2502.20396v1_page_3.pdf")
@@ -0,0 +1,75 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from md_generator import TextGenerator, aprocess_json_to_markdown, stream_json_to_markdown
+from tracing import in_current_context
+
+DEFAULT_LLM_TIMEOUT = 180  # seconds per generation
+
+async def agenerate_outputs(json_response, timeout=DEFAULT_LLM_TIMEOUT):
+    """Run markdown and narration generation concurrently on one extraction
+
+    Both generations are independent LLM calls, so the total latency is the
+    slower of the two instead of their sum. A failure or timeout on one side
+    does not discard the other side's result.
+
+    Args:
+        json_response (dict): JSON response from Landing AI API
+        timeout (float): Maximum seconds allowed for each generation
+
+    Returns:
+        dict: {"markdown": str or None, "audio_text": str or None,
+               "errors": {task_name: error message}}
+    """
+    tasks = {
+        "markdown": aprocess_json_to_markdown(json_response),
+        "audio_text": TextGenerator().agenerate_text(json_response),
+    }
+    results = await asyncio.gather(
+        *(asyncio.wait_for(task, timeout) for task in tasks.values()),
+        return_exceptions=True
+    )
+
+    outputs = {"errors": {}}
+    for name, result in zip(tasks, results):
+        if isinstance(result, asyncio.TimeoutError):
+            outputs[name] = None
+            outputs["errors"][name] = f"Timed out after {timeout} seconds"
+        elif isinstance(result, BaseException):
+            outputs[name] = None
+            outputs["errors"][name] = str(result)
+        elif not result:
+            outputs[name] = None
+            outputs["errors"][name] = "Generation returned no content"
+        else:
+            outputs[name] = result
+    return outputs
+
+def generate_outputs(json_response, timeout=DEFAULT_LLM_TIMEOUT):
+    """Synchronous wrapper around agenerate_outputs for scripts and Streamlit
+
+    Args:
+        json_response (dict): JSON response from Landing AI API
+        timeout (float): Maximum seconds allowed for each generation
+
+    Returns:
+        dict: See agenerate_outputs
+    """
+    return asyncio.run(agenerate_outputs(json_response, timeout))
+
+def stream_outputs(json_response):
+    """Stream the markdown while the narration is generated in the background
+
+    Args:
+        json_response (dict): JSON response from Landing AI API
+
+    Returns:
+        tuple: (markdown_stream, narration_future) where markdown_stream
+        yields markdown pieces (and raises if the conversion fails midway)
+        and narration_future resolves to the narration text, or None if its
+        generation failed
+    """
+    executor = ThreadPoolExecutor(max_workers=1)
+    narration_future = executor.submit(in_current_context(TextGenerator().generate_text), json_response)
+    # Let the worker thread exit once the narration is done
+    executor.shutdown(wait=False)
+    return stream_json_to_markdown(json_response), narration_future
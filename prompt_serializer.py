@@ -0,0 +1,218 @@
+import glob
+import json
+import os
+import re
+import sys
+import threading
+from extraction_cache import DEFAULT_CACHE_DIR
+from llm_pool import estimate_tokens
+
+# Landing AI anchors and comments carry chunk IDs that are useless to the LLM
+ANCHOR_PATTERN = re.compile(r"<a id=['\"][^'\"]*['\"]>\s*</a>")
+COMMENT_PATTERN = re.compile(r"<!--.*?-->", re.DOTALL)
+BLANK_LINES_PATTERN = re.compile(r"\n{3,}")
+TRAILING_SPACE_PATTERN = re.compile(r"[ \t]+\n")
+# BPE vocabulary used to count prompt tokens; the Groq models have their own
+# vocabularies, but a real tokenizer tracks them far better than a character ratio
+DEFAULT_TOKENIZER_ENCODING = "cl100k_base"
+
+_encoding = None
+_encoding_loaded = False
+_encoding_lock = threading.Lock()
+
+
+def iter_extraction_chunks(json_response):
+    """Yield the chunks of a Landing AI response in reading order
+
+    Chunks are ordered by the first page they are grounded on; the API order
+    is kept within a page.
+
+    Args:
+        json_response (dict): JSON response from Landing AI API
+
+    Yields:
+        dict: Chunk with at least a "text" key
+    """
+    data = json_response.get("data", json_response) if isinstance(json_response, dict) else {}
+    chunks = data.get("chunks") or []
+
+    def first_page(indexed_chunk):
+        index, chunk = indexed_chunk
+        grounding = chunk.get("grounding") or [{}]
+        return (grounding[0].get("page") or 0, index)
+
+    for _, chunk in sorted(enumerate(chunks), key=first_page):
+        if chunk.get("text", "").strip():
+            yield chunk
+
+
+def clean_text(text):
+    """Remove ID anchors, comments and redundant whitespace from chunk text"""
+    text = ANCHOR_PATTERN.sub("", text)
+    text = COMMENT_PATTERN.sub("", text)
+    text = TRAILING_SPACE_PATTERN.sub("\n", text)
+    return BLANK_LINES_PATTERN.sub("\n\n", text).strip()
+
+
+def project_chunk(chunk, order):
+    """Keep only the fields of a chunk that the LLM needs
+
+    Args:
+        chunk (dict): Chunk from the Landing AI response
+        order (int): Position of the chunk in reading order
+
+    Returns:
+        dict: {"text", "type", "page", "order"} with a 1-indexed page
+    """
+    grounding = chunk.get("grounding") or [{}]
+    return {
+        "text": clean_text(chunk.get("text", "")),
+        "type": chunk.get("chunk_type") or "text",
+        "page": (grounding[0].get("page") or 0) + 1,
+        "order": order,
+    }
+
+
+def serialize_chunks(chunks):
+    """Serialize chunks into a compact, line-oriented prompt layout
+
+    A "<page N>" marker is written whenever the page changes and each chunk
+    is prefixed with its type, e.g. "[table]". Order is implied by position.
+
+    Args:
+        chunks (iterable): Chunks in reading order
+
+    Returns:
+        str: Prompt content
+    """
+    lines = []
+    current_page = None
+    for order, chunk in enumerate(chunks):
+        projected = project_chunk(chunk, order)
+        if not projected["text"]:
+            continue
+        if projected["page"] != current_page:
+            current_page = projected["page"]
+            lines.append(f"<page {current_page}>")
+        lines.append(f"[{projected['type']}] {projected['text']}")
+    return "\n".join(lines)
+
+
+def serialize_extraction(json_response):
+    """Serialize a whole Landing AI response for a prompt
+
+    Falls back to the response markdown, then to compact JSON, when the
+    response has no chunks.
+
+    Args:
+        json_response (dict): JSON response from Landing AI API
+
+    Returns:
+        str: Prompt content
+    """
+    chunks = list(iter_extraction_chunks(json_response))
+    if chunks:
+        return serialize_chunks(chunks)
+    data = json_response.get("data", json_response) if isinstance(json_response, dict) else {}
+    if isinstance(data, dict) and data.get("markdown"):
+        return clean_text(data["markdown"])
+    return json.dumps(json_response, ensure_ascii=False, separators=(",", ":"))
+
+
+def _get_encoding():
+    """Load the tiktoken encoding once, or None when tiktoken is not available"""
+    global _encoding, _encoding_loaded
+    with _encoding_lock:
+        if not _encoding_loaded:
+            _encoding_loaded = True
+            try:
+                import tiktoken
+
+                _encoding = tiktoken.get_encoding(os.getenv("TOKENIZER_ENCODING", DEFAULT_TOKENIZER_ENCODING))
+            except Exception as e:
+                print(f"tiktoken unavailable ({str(e)}), estimating tokens from characters")
+        return _encoding
+
+
+def count_tokens(text):
+    """Count the tokens of a text with a BPE tokenizer
+
+    Uses tiktoken (pip install ".[bench]") and falls back to
+    llm_pool.estimate_tokens when it is not installed.
+
+    Args:
+        text (str): Text to measure
+
+    Returns:
+        int: Number of tokens
+    """
+    encoding = _get_encoding()
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def tokenizer_name():
+    """Describe how count_tokens counts, for benchmark reports"""
+    encoding = _get_encoding()
+    return f"tiktoken {encoding.name}" if encoding is not None else "estimate (4 characters per token)"
+
+
+def compare_token_counts(json_response):
+    """Prompt tokens of a response as a raw dict repr and in the compact layout
+
+    Returns:
+        tuple: (raw_tokens, compact_tokens)
+    """
+    return count_tokens(str(json_response)), count_tokens(serialize_extraction(json_response))
+
+
+def benchmark(json_paths):
+    """Compare prompt token counts of the raw dict repr and the compact layout
+
+    Args:
+        json_paths (list): Paths to saved Landing AI responses
+
+    Returns:
+        list: (path, raw_tokens, compact_tokens) per file
+    """
+    rows = []
+    for json_path in json_paths:
+        with open(json_path, "r", encoding="utf-8") as f:
+            json_response = json.load(f)
+        rows.append((json_path, *compare_token_counts(json_response)))
+    return rows
+
+
+def benchmark_sample_pages():
+    """Compare token counts on responses rebuilt from the sample page PDFs
+
+    Used when no recorded responses are available, e.g. on a fresh checkout.
+
+    Returns:
+        list: (page name, raw_tokens, compact_tokens) per sample page
+    """
+    from benchmark import load_fixtures
+
+    fixtures = load_fixtures()
+    return [
+        (page_path, *compare_token_counts(json_response))
+        for page_path, json_response in zip(fixtures["pages"], fixtures["page_responses"])
+    ]
+
+
+if __name__ == "__main__":
+    # Usage: python prompt_serializer.py [response.json ...]
+    # Defaults to the responses stored in the extraction cache, then to the sample pages
+    paths = sys.argv[1:] or sorted(glob.glob(os.path.join(os.getenv("EXTRACTION_CACHE_DIR", DEFAULT_CACHE_DIR), "*.json")))
+    rows = benchmark(paths) if paths else benchmark_sample_pages()
+
+    print(f"Token counts: {tokenizer_name()}")
+    total_raw = total_compact = 0
+    for path, raw_tokens, compact_tokens in rows:
+        total_raw += raw_tokens
+        total_compact += compact_tokens
+        print(f"{os.path.basename(path)}: {raw_tokens} -> {compact_tokens} tokens "
+              f"({100 * (1 - compact_tokens / raw_tokens):.1f}% fewer)")
+    print(f"Total: {total_raw} -> {total_compact} tokens "
+          f"({100 * (1 - total_compact / total_raw):.1f}% fewer)")
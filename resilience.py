@@ -0,0 +1,564 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from types import SimpleNamespace
+from tracing import in_current_context
+
+# HTTP statuses worth retrying: throttling, timeouts and server errors
+TRANSIENT_STATUS_CODES = {408, 425, 429}
+# Exception class names of transport failures in requests, httpx, groq and the stdlib
+TRANSIENT_ERROR_NAMES = {
+    "ConnectionError", "ConnectTimeout", "ReadTimeout", "Timeout", "TimeoutError",
+    "ChunkedEncodingError", "RemoteDisconnected", "APIConnectionError", "APITimeoutError",
+}
+LATENCY_WINDOW = 1000
+# Observed latencies needed before hedging switches to the measured p95
+MIN_HEDGE_SAMPLES = 20
+HEDGE_WORKERS = 16
+
+# Per-backend defaults, each overridable with <NAME>_<SETTING> environment
+# variables, e.g. KOKORO_TIMEOUT or LANDING_AI_FAILURE_THRESHOLD.
+# timeout bounds a whole attempt, however the client's own per-read timeouts
+# behave, and hedge_after starts a duplicate attempt. Paid backends hedge only
+# well past their usual latency, so duplicates stay rare.
+BACKEND_DEFAULTS = {
+    "landing_ai": {"timeout": 600.0, "hedge_after": 240.0, "max_attempts": 3, "base_delay": 1.0,
+                   "failure_threshold": 5, "reset_timeout": 60.0, "retry_unknown_errors": False},
+    "groq": {"timeout": 180.0, "hedge_after": 90.0, "max_attempts": 4, "base_delay": 1.0,
+             "failure_threshold": 5, "reset_timeout": 30.0, "retry_unknown_errors": False},
+    "kokoro": {"timeout": 120.0, "hedge_after": 20.0, "max_attempts": 2, "base_delay": 0.5,
+               "failure_threshold": 5, "reset_timeout": 60.0, "retry_unknown_errors": True},
+}
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a backend whose circuit breaker is open"""
+
+    def __init__(self, name, retry_in):
+        super().__init__(f"{name} is unavailable after repeated failures, retrying in {retry_in:.0f}s")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class BackendTimeoutError(TimeoutError):
+    """Raised when an attempt exceeds its backend's timeout"""
+
+
+def status_code(error):
+    """Return the HTTP status code carried by an exception, or None"""
+    response = getattr(error, "response", None)
+    return getattr(error, "status_code", None) or getattr(response, "status_code", None)
+
+
+def is_transient(error):
+    """Tell whether an error is worth retrying: 429/5xx, timeouts and connection failures"""
+    if isinstance(error, CircuitOpenError):
+        return False
+    code = status_code(error)
+    if code is not None:
+        return code in TRANSIENT_STATUS_CODES or code >= 500
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    return any(cls.__name__ in TRANSIENT_ERROR_NAMES for cls in type(error).__mro__)
+
+
+def retry_after(error):
+    """Return the Retry-After delay sent with an error response, or None"""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt, base_delay=0.5, max_delay=30.0):
+    """Exponential backoff with jitter over the upper half of the interval
+
+    Args:
+        attempt (int): 0-indexed attempt that just failed
+        base_delay (float): Delay of the first retry, in seconds
+        max_delay (float): Upper bound for the delay
+
+    Returns:
+        float: Seconds to wait before the next attempt
+    """
+    ceiling = min(max_delay, base_delay * (2 ** attempt))
+    return random.uniform(ceiling / 2, ceiling)
+
+
+class CircuitBreaker:
+    """Fail fast after consecutive failures, then let one probe call through
+
+    closed: calls pass. open: calls raise CircuitOpenError until
+    reset_timeout has elapsed. half_open: a single probe is allowed; its
+    success closes the circuit and its failure opens it again.
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Raise CircuitOpenError unless a call may be sent now"""
+        with self._lock:
+            if self.state == "open":
+                retry_in = self.opened_at + self.reset_timeout - time.monotonic()
+                if retry_in > 0:
+                    raise CircuitOpenError(self.name, retry_in)
+                self.state = "half_open"
+                self._probe_in_flight = False
+            if self.state == "half_open":
+                if self._probe_in_flight:
+                    raise CircuitOpenError(self.name, self.reset_timeout)
+                self._probe_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def release(self):
+        """Give back a probe that was allowed but never sent, e.g. a rate limiter failed first"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+
+class BackendMetrics:
+    """Call counters and a sliding window of attempt latencies"""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.calls = 0
+        self.successes = 0
+        self.failures = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.timeouts = 0
+        self.short_circuits = 0
+        self.latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency, ok):
+        with self._lock:
+            self.calls += 1
+            if ok:
+                self.successes += 1
+            else:
+                self.failures += 1
+            self.latencies.append(latency)
+
+    def increment(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def percentile(self, q):
+        """Return the q-th percentile (0-100) of the recorded latencies in seconds, or None"""
+        with self._lock:
+            latencies = sorted(self.latencies)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(len(latencies) * q / 100))]
+
+
+class Backend:
+    """Retries, timeouts, hedging and circuit breaking for one remote service
+
+    Calls are zero-argument callables (or coroutine functions for acall), so
+    the same policy wraps HTTP requests, SDK clients and test stubs alike.
+    """
+
+    def __init__(self, name, timeout=None, hedge_after=None, max_attempts=3, failure_threshold=5,
+                 reset_timeout=30.0, retry_unknown_errors=False, base_delay=0.5, max_delay=30.0):
+        self.name = name
+        self.timeout = timeout
+        self.hedge_after = hedge_after
+        self.max_attempts = max_attempts
+        self.retry_unknown_errors = retry_unknown_errors
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = CircuitBreaker(name, failure_threshold, reset_timeout)
+        self.metrics = BackendMetrics()
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def is_retryable(self, error):
+        if isinstance(error, CircuitOpenError):
+            return False
+        return self.retry_unknown_errors or is_transient(error)
+
+    def retry_delay(self, error, attempt):
+        """Seconds to wait before retrying after a failed attempt, honoring Retry-After"""
+        delay = retry_after(error)
+        return delay if delay is not None else backoff_delay(attempt, self.base_delay, self.max_delay)
+
+    def acquire(self):
+        """Check the circuit breaker before an attempt"""
+        try:
+            self.breaker.allow()
+        except CircuitOpenError:
+            self.metrics.increment("short_circuits")
+            raise
+
+    def release(self):
+        """Give back an attempt acquired with acquire() that was never sent"""
+        self.breaker.release()
+
+    def record_success(self, latency):
+        self.metrics.record(latency, ok=True)
+        self.breaker.record_success()
+
+    def record_failure(self, error, latency):
+        """Record a failed attempt; only retryable failures count against the breaker
+
+        Returns:
+            bool: Whether the error is retryable
+        """
+        self.metrics.record(latency, ok=False)
+        if isinstance(error, TimeoutError):
+            self.metrics.increment("timeouts")
+        retryable = self.is_retryable(error)
+        if retryable:
+            self.breaker.record_failure()
+        else:
+            # The backend answered, so it is healthy even if the request was bad
+            self.breaker.record_success()
+        return retryable
+
+    def hedge_delay(self):
+        """Delay before a hedged attempt: the observed p95 latency, at least hedge_after"""
+        if self.hedge_after is None:
+            return None
+        if len(self.metrics.latencies) >= MIN_HEDGE_SAMPLES:
+            return max(self.hedge_after, self.metrics.percentile(95))
+        return self.hedge_after
+
+    def _get_executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix=self.name)
+            return self._executor
+
+    def _run_attempt(self, fn):
+        """Run one attempt, bounded by the timeout and hedged when it is slow"""
+        if self.timeout is None and self.hedge_after is None:
+            return fn()
+        executor = self._get_executor()
+        fn = in_current_context(fn)
+        primary = executor.submit(fn)
+        pending = [primary]
+        deadline = time.monotonic() + self.timeout if self.timeout else None
+
+        hedge_delay = self.hedge_delay()
+        if hedge_delay is not None:
+            first_wait = hedge_delay if deadline is None else min(hedge_delay, deadline - time.monotonic())
+            done, _ = wait(pending, timeout=max(0, first_wait))
+            if not done and (deadline is None or time.monotonic() < deadline):
+                self.metrics.increment("hedges")
+                pending.append(executor.submit(fn))
+
+        error = None
+        while pending:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            done, _ = wait(pending, timeout=None if remaining is None else max(0, remaining),
+                           return_when=FIRST_COMPLETED)
+            if not done:
+                # The abandoned attempt keeps running, but the caller is released
+                raise BackendTimeoutError(f"{self.name} call timed out after {self.timeout}s")
+            for future in done:
+                pending.remove(future)
+                if future.exception() is None:
+                    if future is not primary:
+                        self.metrics.increment("hedge_wins")
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def call(self, fn, max_attempts=None, before_attempt=None, on_retry=None):
+        """Call fn with retries, timeouts, hedging and circuit breaking
+
+        Args:
+            fn (callable): Zero-argument callable performing one request
+            max_attempts (int, optional): Override the backend's attempt count
+            before_attempt (callable, optional): Called before every attempt, e.g. a rate limiter
+            on_retry (callable, optional): Called as on_retry(error, delay) before sleeping
+
+        Returns:
+            The result of fn
+        """
+        max_attempts = max_attempts or self.max_attempts
+        for attempt in range(max_attempts):
+            self.acquire()
+            if before_attempt:
+                try:
+                    before_attempt()
+                except BaseException:
+                    # Otherwise a half-open breaker would wait forever for this probe
+                    self.release()
+                    raise
+            start = time.monotonic()
+            try:
+                result = self._run_attempt(fn)
+            except Exception as e:
+                retryable = self.record_failure(e, time.monotonic() - start)
+                if not retryable or attempt == max_attempts - 1:
+                    raise
+                delay = self.retry_delay(e, attempt)
+                self.metrics.increment("retries")
+                print(f"{self.name} attempt {attempt + 1} failed ({str(e) or type(e).__name__}), "
+                      f"retrying in {delay:.1f}s")
+                if on_retry:
+                    on_retry(e, delay)
+                time.sleep(delay)
+                continue
+            self.record_success(time.monotonic() - start)
+            return result
+
+    async def _arun_attempt(self, coro_fn):
+        if self.timeout is None and self.hedge_after is None:
+            return await coro_fn()
+        primary = asyncio.ensure_future(coro_fn())
+        pending = {primary}
+        deadline = time.monotonic() + self.timeout if self.timeout else None
+        try:
+            hedge_delay = self.hedge_delay()
+            if hedge_delay is not None:
+                first_wait = hedge_delay if deadline is None else min(hedge_delay, deadline - time.monotonic())
+                done, _ = await asyncio.wait(pending, timeout=max(0, first_wait))
+                if not done and (deadline is None or time.monotonic() < deadline):
+                    self.metrics.increment("hedges")
+                    pending.add(asyncio.ensure_future(coro_fn()))
+
+            error = None
+            while pending:
+                remaining = None if deadline is None else max(0, deadline - time.monotonic())
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    raise BackendTimeoutError(f"{self.name} call timed out after {self.timeout}s")
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.metrics.increment("hedge_wins")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def acall(self, coro_fn, max_attempts=None, before_attempt=None, on_retry=None):
+        """Asynchronous counterpart of call for coroutine functions
+
+        before_attempt may be a coroutine function, e.g. a rate limiter's aacquire.
+        """
+        max_attempts = max_attempts or self.max_attempts
+        for attempt in range(max_attempts):
+            self.acquire()
+            if before_attempt:
+                try:
+                    waiting = before_attempt()
+                    if asyncio.iscoroutine(waiting):
+                        await waiting
+                except BaseException:
+                    self.release()
+                    raise
+            start = time.monotonic()
+            try:
+                result = await self._arun_attempt(coro_fn)
+            except Exception as e:
+                retryable = self.record_failure(e, time.monotonic() - start)
+                if not retryable or attempt == max_attempts - 1:
+                    raise
+                delay = self.retry_delay(e, attempt)
+                self.metrics.increment("retries")
+                print(f"{self.name} attempt {attempt + 1} failed ({str(e) or type(e).__name__}), "
+                      f"retrying in {delay:.1f}s")
+                if on_retry:
+                    on_retry(e, delay)
+                await asyncio.sleep(delay)
+                continue
+            self.record_success(time.monotonic() - start)
+            return result
+
+    def snapshot(self):
+        """Return the backend's metrics and breaker state as a flat dict"""
+        metrics = self.metrics
+
+        def ms(q):
+            value = metrics.percentile(q)
+            return value * 1000 if value is not None else None
+
+        return {
+            "backend": self.name,
+            "state": self.breaker.state,
+            "calls": metrics.calls,
+            "successes": metrics.successes,
+            "failures": metrics.failures,
+            "retries": metrics.retries,
+            "timeouts": metrics.timeouts,
+            "hedges": metrics.hedges,
+            "hedge_wins": metrics.hedge_wins,
+            "short_circuits": metrics.short_circuits,
+            "p50_ms": ms(50),
+            "p95_ms": ms(95),
+            "p99_ms": ms(99),
+        }
+
+
+def _env_setting(name, setting, default):
+    value = os.getenv(f"{name.upper()}_{setting.upper()}")
+    if value is None:
+        return default
+    if isinstance(default, bool):
+        return value.lower() in ("1", "true", "yes")
+    if value.lower() in ("", "none", "off"):
+        return None
+    return type(default)(value) if default is not None else float(value)
+
+
+def get_backend(name):
+    """Return the process-wide resilience policy for a backend
+
+    Known backends are "landing_ai", "groq" and "kokoro"; settings come from
+    BACKEND_DEFAULTS and <NAME>_<SETTING> environment variables.
+
+    Args:
+        name (str): Backend name
+
+    Returns:
+        Backend: Shared backend
+    """
+    with _backends_lock:
+        if name not in _backends:
+            defaults = BACKEND_DEFAULTS.get(name, BACKEND_DEFAULTS["landing_ai"])
+            _backends[name] = Backend(name, **{
+                setting: _env_setting(name, setting, default) for setting, default in defaults.items()
+            })
+        return _backends[name]
+
+
+def get_metrics():
+    """Return a snapshot of every backend used so far"""
+    with _backends_lock:
+        backends = list(_backends.values())
+    return [backend.snapshot() for backend in backends]
+
+
+class InjectedFault(Exception):
+    """HTTP-like error raised by FaultInjector, optionally with a Retry-After header"""
+
+    def __init__(self, status_code, retry_after=None):
+        super().__init__(f"Injected HTTP {status_code}")
+        self.status_code = status_code
+        headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+        self.response = SimpleNamespace(status_code=status_code, headers=headers)
+
+
+class FaultInjector:
+    """Local stub that wraps a callable and injects latency, hangs and errors
+
+    Used to exercise a Backend against a degraded upstream without network
+    access.
+
+    Args:
+        fn (callable): Callable to wrap, returning the successful result
+        failure_rate (float): Probability of raising an HTTP-like error
+        status_code (int): Status code of the injected errors
+        slow_rate (float): Probability of a slow (tail latency) response
+        latency (float): Normal latency in seconds
+        slow_latency (float): Latency of slow responses in seconds
+        seed (int, optional): Random seed for reproducible runs
+        fail_first (int): Calls that fail before the random faults apply
+        slow_first (int): Calls that are slow before the random latencies apply
+        retry_after (float, optional): Retry-After seconds sent with the errors
+    """
+
+    def __init__(self, fn, failure_rate=0.0, status_code=503, slow_rate=0.0, latency=0.01,
+                 slow_latency=1.0, seed=None, fail_first=0, slow_first=0, retry_after=None):
+        self.fn = fn
+        self.failure_rate = failure_rate
+        self.status_code = status_code
+        self.slow_rate = slow_rate
+        self.latency = latency
+        self.slow_latency = slow_latency
+        self.fail_first = fail_first
+        self.slow_first = slow_first
+        self.retry_after = retry_after
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _draw(self):
+        with self._lock:
+            self.calls += 1
+            fail = self.calls <= self.fail_first or self._random.random() < self.failure_rate
+            slow = self.calls <= self.slow_first or self._random.random() < self.slow_rate
+            return fail, slow
+
+    def __call__(self, *args, **kwargs):
+        fail, slow = self._draw()
+        time.sleep(self.slow_latency if slow else self.latency)
+        if fail:
+            raise InjectedFault(self.status_code, self.retry_after)
+        return self.fn(*args, **kwargs)
+
+
+if __name__ == "__main__":
+    # Compare tail latency against a degraded stub with and without hedging
+    def run(backend, stub, calls=200):
+        latencies = []
+        errors = 0
+        for _ in range(calls):
+            start = time.monotonic()
+            try:
+                backend.call(stub)
+            except Exception:
+                errors += 1
+            latencies.append(time.monotonic() - start)
+        latencies.sort()
+        return latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)], errors
+
+    scenarios = [
+        ("retries only", {"hedge_after": None}),
+        ("hedged", {"hedge_after": 0.05}),
+        ("hedged + 0.3s timeout", {"hedge_after": 0.05, "timeout": 0.3}),
+    ]
+    for label, settings in scenarios:
+        stub = FaultInjector(lambda: "ok", failure_rate=0.05, slow_rate=0.05, latency=0.01,
+                             slow_latency=1.0, seed=42)
+        backend = Backend(label, max_attempts=3, base_delay=0.01, failure_threshold=1000, **settings)
+        p50, p99, errors = run(backend, stub)
+        print(f"{label:24} p50={p50 * 1000:6.0f} ms  p99={p99 * 1000:6.0f} ms  "
+              f"errors={errors}  upstream calls={stub.calls}  hedges={backend.metrics.hedges}")
+
+    # The breaker opens after consecutive failures and short-circuits the rest
+    breaker_backend = Backend("breaker demo", max_attempts=1, failure_threshold=3, reset_timeout=60)
+    failing = FaultInjector(lambda: "ok", failure_rate=1.0, latency=0.01)
+    for _ in range(10):
+        try:
+            breaker_backend.call(failing)
+        except Exception:
+            pass
+    print(f"breaker: state={breaker_backend.breaker.state}  upstream calls={failing.calls}  "
+          f"short circuits={breaker_backend.metrics.short_circuits}")
@@ -0,0 +1,60 @@
+import importlib
+import threading
+
+# Processing entry points used by the Streamlit app and the modules they live
+# in. They pull in requests, pypdf, numpy, langchain and gradio_client, so
+# they are imported on first access instead of when the app starts.
+_EXPORTS = {
+    "PDFProcessor": "doc_extraction",
+    "stream_outputs": "pipeline",
+    "generate_outputs": "pipeline",
+    "DEFAULT_LLM_TIMEOUT": "pipeline",
+    "text_to_speech": "text2speech",
+    "get_index": "doc_index",
+    "index_ready": "doc_index",
+    "load_index_in_background": "doc_index",
+    "index_markdown_in_background": "doc_index",
+}
+# Heavy third-party packages the entry points need once a document is processed
+_BACKEND_MODULES = ("langchain_groq", "langchain.prompts", "gradio_client", "pypdf")
+
+_preload_lock = threading.Lock()
+_preload_thread = None
+
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_EXPORTS))
+
+
+def _import_all():
+    for module_name in sorted(set(_EXPORTS.values())) + list(_BACKEND_MODULES):
+        try:
+            importlib.import_module(module_name)
+        except Exception as e:
+            print(f"Preloading {module_name} failed: {str(e)}")
+
+
+def preload():
+    """Import the processing backends in a background thread
+
+    Lets the app render immediately while the first conversion still finds
+    everything loaded. Calling it again has no effect.
+
+    Returns:
+        threading.Thread: The preloading thread
+    """
+    global _preload_thread
+    with _preload_lock:
+        if _preload_thread is None:
+            _preload_thread = threading.Thread(target=_import_all, name="services-preload", daemon=True)
+            _preload_thread.start()
+        return _preload_thread
@@ -1,53 +1,286 @@
+import argparse
+import hashlib
+import multiprocessing
 import os
+import queue
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pypdf import PdfReader, PdfWriter
 from pathlib import Path
 
-def split_pdf_into_pages():
+CURRENT_DIR = Path(__file__).parent
+DEFAULT_INPUT_DIR = (CURRENT_DIR / ".." / "original_docs").resolve()
+DEFAULT_OUTPUT_DIR = (CURRENT_DIR / "splitted_docs").resolve()
+# Source PDFs submitted to the pool per worker process; later files are only
+# submitted as earlier ones finish
+FILES_PER_WORKER = 2
+# Seconds between checks for finished files while waiting for artifacts
+ARTIFACT_POLL_SECONDS = 0.05
+
+def parse_page_range(spec):
+    """
+    Parse a page range specification such as "1-5,8,10-12" (1-indexed, inclusive)
+
+    Args:
+        spec (str): Page range specification, or None for all pages
+
+    Returns:
+        list: Sorted 1-indexed page numbers, or None when spec is empty
+    """
+    if not spec:
+        return None
+    pages = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            start, end = part.split("-", 1)
+            pages.update(range(int(start), int(end) + 1))
+        else:
+            pages.add(int(part))
+    return sorted(pages)
+
+def plan_chunks(total_pages, page_range=None, pages_per_chunk=1):
+    """
+    Group the selected pages of a document into output chunks
+
+    Args:
+        total_pages (int): Number of pages in the document
+        page_range (list, optional): 1-indexed pages to keep, all pages if None
+        pages_per_chunk (int): Number of pages written to each output file
+
+    Returns:
+        list: Lists of 0-indexed page numbers, one list per output file
+    """
+    if page_range is None:
+        selected = list(range(total_pages))
+    else:
+        selected = [page - 1 for page in page_range if 1 <= page <= total_pages]
+    return [selected[i:i + pages_per_chunk] for i in range(0, len(selected), pages_per_chunk)]
+
+def output_filename(filename_base, page_indices):
+    """
+    Build the output filename for a chunk of pages
+
+    Single pages keep the historical "<name>_page_<n>.pdf" naming.
+    """
+    first_page, last_page = page_indices[0] + 1, page_indices[-1] + 1
+    if first_page == last_page:
+        return f"{filename_base}_page_{first_page}.pdf"
+    return f"{filename_base}_pages_{first_page}-{last_page}.pdf"
+
+def is_up_to_date(input_pdf_path, output_file_path):
+    """Check whether an output file exists and is newer than its source PDF"""
+    return (
+        os.path.exists(output_file_path)
+        and os.path.getmtime(output_file_path) >= os.path.getmtime(input_pdf_path)
+    )
+
+def page_fingerprint(page):
+    """
+    Hash what a page draws: its content stream, the XObjects it uses and its geometry
+
+    Unlike a hash of the file bytes, the fingerprint does not change when an
+    unrelated edit renumbers the objects of the source PDF.
+
+    Args:
+        page (pypdf.PageObject): Page to fingerprint
+
+    Returns:
+        str: Hex digest
+    """
+    digest = hashlib.sha256()
+    digest.update(repr([float(value) for value in page.mediabox]).encode("ascii"))
+    digest.update(str(page.get("/Rotate", 0)).encode("ascii"))
+    contents = page.get_contents()
+    if contents is not None:
+        digest.update(contents.get_data())
+    resources = page.get("/Resources")
+    xobjects = resources.get_object().get("/XObject") if resources is not None else None
+    if xobjects is not None:
+        xobjects = xobjects.get_object()
+        for name in sorted(xobjects):
+            digest.update(name.encode("utf-8"))
+            digest.update(xobjects[name].get_object().get_data())
+    return digest.hexdigest()
+
+def pdf_fingerprint(pdf_path):
+    """
+    Fingerprint every page of a (split) PDF
+
+    Returns:
+        str: Hex digest combining the page fingerprints in order
+    """
+    digest = hashlib.sha256()
+    for page in PdfReader(pdf_path).pages:
+        digest.update(page_fingerprint(page).encode("ascii"))
+    return digest.hexdigest()
+
+def _iter_chunks(pdf_reader, input_pdf_path, output_path, chunks, force=False):
+    """
+    Write the given page chunks of an open PDF, skipping outputs that are up to date
+
+    Yields:
+        tuple: (output_file_path, created)
+    """
+    filename_base = os.path.splitext(os.path.basename(input_pdf_path))[0]
+    for page_indices in chunks:
+        output_file_path = os.path.join(output_path, output_filename(filename_base, page_indices))
+        if not force and is_up_to_date(input_pdf_path, output_file_path):
+            yield output_file_path, False
+            continue
+
+        pdf_writer = PdfWriter()
+        for page_num in page_indices:
+            pdf_writer.add_page(pdf_reader.pages[page_num])
+
+        # Write to a temporary name first so an interrupted run never leaves
+        # a truncated file that looks up to date
+        tmp_file_path = f"{output_file_path}.tmp"
+        with open(tmp_file_path, 'wb') as output_file:
+            pdf_writer.write(output_file)
+        os.replace(tmp_file_path, output_file_path)
+        yield output_file_path, True
+
+def _iter_file(input_pdf_path, output_dir, page_range, pages_per_chunk, force):
+    """Split one PDF, parsing it only once for all of its chunks"""
+    pdf_reader = PdfReader(input_pdf_path)
+    chunks = plan_chunks(len(pdf_reader.pages), page_range, pages_per_chunk)
+    yield from _iter_chunks(pdf_reader, input_pdf_path, output_dir, chunks, force)
+
+def _split_file(artifacts, input_pdf_path, output_dir, page_range, pages_per_chunk, force):
+    """
+    Pool task splitting one PDF
+
+    Each artifact is put on the artifacts queue as soon as it is written, so
+    the first pages of a large file are handed on before the rest is split.
+    """
+    for artifact in _iter_file(input_pdf_path, output_dir, page_range, pages_per_chunk, force):
+        artifacts.put(artifact)
+
+def _report_error(on_error, input_pdf_path, error):
+    print(f"Could not split {os.path.basename(input_pdf_path)}: {error}")
+    if on_error is not None:
+        on_error(input_pdf_path, error)
+
+def iter_split_files(pdf_paths, output_dir=DEFAULT_OUTPUT_DIR, page_range=None, pages_per_chunk=1,
+                     workers=None, force=False, on_error=None):
+    """
+    Split the given PDFs across a process pool and yield page artifacts as
+    soon as they are written
+
+    Every file is split by a single worker, which parses it once. Only a few
+    files per worker are submitted at a time, so a large corpus is never
+    queued up front. A PDF that cannot be read or split is reported and
+    skipped, so one broken file does not stop the others.
+
+    Args:
+        pdf_paths (iterable): Paths to the source PDFs
+        output_dir (str): Directory where the split PDFs are written
+        page_range (list, optional): 1-indexed pages to keep, all pages if None
+        pages_per_chunk (int): Number of pages written to each output file
+        workers (int, optional): Number of worker processes, defaults to the CPU count;
+            1 splits in the current process
+        force (bool): Rewrite outputs even if they are up to date
+        on_error (callable, optional): Called with (input_pdf_path, error) for
+            every PDF that could not be split completely
+
+    Yields:
+        tuple: (output_file_path, created) where created is False for outputs
+        that were already up to date
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    pdf_paths = iter(pdf_paths)
+
+    if workers == 1:
+        for input_pdf_path in pdf_paths:
+            try:
+                yield from _iter_file(input_pdf_path, output_dir, page_range, pages_per_chunk, force)
+            except Exception as e:
+                _report_error(on_error, input_pdf_path, e)
+        return
+
+    workers = workers or os.cpu_count() or 1
+    with multiprocessing.Manager() as manager, ProcessPoolExecutor(max_workers=workers) as executor:
+        artifacts = manager.Queue()
+        running = deque()
+
+        def submit_more():
+            while len(running) < workers * FILES_PER_WORKER:
+                input_pdf_path = next(pdf_paths, None)
+                if input_pdf_path is None:
+                    return
+                future = executor.submit(_split_file, artifacts, input_pdf_path, output_dir,
+                                         page_range, pages_per_chunk, force)
+                running.append((future, input_pdf_path))
+
+        submit_more()
+        while running:
+            try:
+                yield artifacts.get(timeout=ARTIFACT_POLL_SECONDS)
+                continue
+            except queue.Empty:
+                pass
+            for future, input_pdf_path in [task for task in running if task[0].done()]:
+                running.remove((future, input_pdf_path))
+                try:
+                    future.result()
+                except Exception as e:
+                    _report_error(on_error, input_pdf_path, e)
+            submit_more()
+        # Artifacts put by the last files after the queue was found empty
+        while not artifacts.empty():
+            yield artifacts.get()
+
+def iter_split_pdfs(input_dir=DEFAULT_INPUT_DIR, output_dir=DEFAULT_OUTPUT_DIR, page_range=None,
+                    pages_per_chunk=1, workers=None, force=False):
+    """
+    Split every PDF in a directory, see iter_split_files
+
+    Yields:
+        tuple: (output_file_path, created)
+    """
+    pdf_files = sorted(f for f in os.listdir(input_dir) if f.lower().endswith('.pdf'))
+    pdf_paths = [os.path.join(input_dir, pdf_file) for pdf_file in pdf_files]
+    yield from iter_split_files(pdf_paths, output_dir, page_range, pages_per_chunk, workers, force)
+
+def split_pdf_into_pages(input_dir=DEFAULT_INPUT_DIR, output_dir=DEFAULT_OUTPUT_DIR, page_range=None,
+                         pages_per_chunk=1, workers=None, force=False):
     """
     Splits each PDF in the original_docs directory into individual pages
     and saves each page as a separate PDF file in the splitted_docs directory.
+
+    Returns:
+        list: Paths of all output files, created or already up to date
     """
-    # Define paths using relative paths
-    current_dir = Path(__file__).parent
-    original_docs_path = (current_dir / ".." / "original_docs").resolve()
-    output_path = (current_dir / "splitted_docs").resolve()
-    
-    # Create output directory if it doesn't exist
-    os.makedirs(output_path, exist_ok=True)
-    
-    # Get all PDF files from the original_docs directory
-    pdf_files = [f for f in os.listdir(original_docs_path) if f.lower().endswith('.pdf')]
-    
-    for pdf_file in pdf_files:
-        input_pdf_path = os.path.join(original_docs_path, pdf_file)
-        
-        # Open the PDF file
-        with open(input_pdf_path, 'rb') as file:
-            pdf_reader = PdfReader(file)
-            total_pages = len(pdf_reader.pages)
-            
-            # Extract the filename without extension
-            filename_base = os.path.splitext(pdf_file)[0]
-            
-            # Process each page
-            for page_num in range(total_pages):
-                # Create a PDF writer object for the output file
-                pdf_writer = PdfWriter()
-                
-                # Add the current page to the writer
-                pdf_writer.add_page(pdf_reader.pages[page_num])
-                
-                # Create output filename for this page
-                output_filename = f"{filename_base}_page_{page_num+1}.pdf"
-                output_file_path = os.path.join(output_path, output_filename)
-                
-                # Write the page to a new PDF file
-                with open(output_file_path, 'wb') as output_file:
-                    pdf_writer.write(output_file)
-                
-                print(f"Created: {output_filename}")
-    
-    print(f"All PDFs have been split into individual pages in: {output_path}")
+    output_files = []
+    for output_file_path, created in iter_split_pdfs(input_dir, output_dir, page_range,
+                                                     pages_per_chunk, workers, force):
+        output_files.append(output_file_path)
+        status = "Created" if created else "Up to date"
+        print(f"{status}: {os.path.basename(output_file_path)}")
+
+    print(f"All PDFs have been split into individual pages in: {output_dir}")
+    return output_files
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Split PDFs into single pages or page chunks")
+    parser.add_argument("--input-dir", default=str(DEFAULT_INPUT_DIR), help="Directory with the source PDFs")
+    parser.add_argument("--output-dir", default=str(DEFAULT_OUTPUT_DIR), help="Directory for the split PDFs")
+    parser.add_argument("--pages", help="Pages to keep, 1-indexed, e.g. '1-5,8'")
+    parser.add_argument("--chunk-size", type=int, default=1, help="Pages per output file")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="Rewrite outputs that are up to date")
+    return parser.parse_args()
 
 if __name__ == "__main__":
-    split_pdf_into_pages()
+    args = parse_args()
+    split_pdf_into_pages(
+        input_dir=args.input_dir,
+        output_dir=args.output_dir,
+        page_range=parse_page_range(args.pages),
+        pages_per_chunk=args.chunk_size,
+        workers=args.workers,
+        force=args.force
+    )
@@ -0,0 +1,346 @@
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from extraction_cache import hash_bytes, hash_file
+
+DEFAULT_STORAGE_DIR = os.path.join(".cache", "sessions")
+DEFAULT_MAX_SIZE_MB = 1024
+DEFAULT_SESSION_MAX_AGE_HOURS = 6
+DEFAULT_MEMORY_MB = 64
+DEFAULT_GC_INTERVAL_SECONDS = 60
+# Unreferenced blobs younger than this may be about to be linked by a writer
+BLOB_GRACE_SECONDS = 60
+
+_SESSION_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+class SessionStorage:
+    """Per-session files stored once by content hash, with quota and age limits
+
+    Contents live in blobs/<sha256><suffix>, so identical uploads, texts and
+    narrations are stored once however many sessions use them. Each session
+    holds hard links to its blobs in sessions/<session_id>/ (copies on
+    filesystems without hard links), and the directory's modification time
+    records the session's last activity. A blob whose only link is its own
+    is no longer used by any session.
+
+    collect() removes sessions idle for longer than max_age_seconds, then the
+    least recently active sessions until the blobs fit in max_size_bytes, and
+    finally the unreferenced blobs. It runs at most every gc_interval seconds
+    from touch() and the put_* methods. Texts read back with read_text() are
+    kept in a memory cache bounded to memory_bytes, so the app keeps paths
+    rather than documents in its session state.
+    """
+
+    def __init__(self, storage_dir=None, max_size_bytes=None, max_age_seconds=None, memory_bytes=None,
+                 gc_interval=None):
+        self.storage_dir = storage_dir or os.getenv("STORAGE_DIR", DEFAULT_STORAGE_DIR)
+        if max_size_bytes is None:
+            max_size_bytes = int(float(os.getenv("STORAGE_MAX_MB", DEFAULT_MAX_SIZE_MB)) * 1024 * 1024)
+        if max_age_seconds is None:
+            max_age_seconds = int(float(os.getenv("STORAGE_SESSION_MAX_AGE_HOURS", DEFAULT_SESSION_MAX_AGE_HOURS)) * 3600)
+        if memory_bytes is None:
+            memory_bytes = int(float(os.getenv("STORAGE_MEMORY_MB", DEFAULT_MEMORY_MB)) * 1024 * 1024)
+        if gc_interval is None:
+            gc_interval = float(os.getenv("STORAGE_GC_INTERVAL_SECONDS", DEFAULT_GC_INTERVAL_SECONDS))
+        self.max_size_bytes = max_size_bytes
+        self.max_age_seconds = max_age_seconds
+        self.memory_bytes = memory_bytes
+        self.gc_interval = gc_interval
+        self.blob_dir = os.path.join(self.storage_dir, "blobs")
+        self.session_root = os.path.join(self.storage_dir, "sessions")
+        self.memory_hits = 0
+        self.memory_misses = 0
+        self.gc_runs = 0
+        self.removed_sessions = 0
+        self.removed_bytes = 0
+        self._texts = OrderedDict()
+        self._texts_size = 0
+        self._last_gc = 0.0
+        self._lock = threading.RLock()
+        os.makedirs(self.blob_dir, exist_ok=True)
+        os.makedirs(self.session_root, exist_ok=True)
+
+    def _session_dir(self, session_id):
+        # Session ids become directory names, so nothing but a plain name is accepted
+        if not _SESSION_ID_PATTERN.match(session_id or ""):
+            raise ValueError(f"Invalid session id: {session_id!r}")
+        return os.path.join(self.session_root, session_id)
+
+    def touch(self, session_id):
+        """Record activity for a session, creating its directory if needed
+
+        Args:
+            session_id (str): Session identifier (letters, digits, "_" and "-")
+
+        Returns:
+            str: Session directory
+        """
+        session_dir = self._session_dir(session_id)
+        with self._lock:
+            os.makedirs(session_dir, exist_ok=True)
+            os.utime(session_dir)
+        self.maybe_collect(keep=session_id)
+        return session_dir
+
+    def scratch_path(self, session_id, suffix=""):
+        """Return a unique path in the session directory for a tool to write to
+
+        Pass the file to put_file() once it is written, so it is stored by
+        content hash like everything else.
+        """
+        return os.path.join(self.touch(session_id), f"scratch-{uuid.uuid4().hex}{suffix}")
+
+    def _link(self, session_id, digest, suffix):
+        """Link a stored blob into a session and return the session's path"""
+        blob_path = os.path.join(self.blob_dir, f"{digest}{suffix}")
+        session_path = os.path.join(self._session_dir(session_id), f"{digest}{suffix}")
+        if not os.path.exists(session_path):
+            try:
+                os.link(blob_path, session_path)
+            except OSError:
+                # Filesystems without hard links (FAT, some network shares)
+                # get a copy, which collect() counts towards the quota itself
+                shutil.copyfile(blob_path, session_path)
+        return session_path
+
+    def put_bytes(self, session_id, data, suffix=""):
+        """Store content for a session, once per distinct content
+
+        Args:
+            session_id (str): Session identifier
+            data (bytes-like): Content to store
+            suffix (str): File extension, e.g. ".pdf"
+
+        Returns:
+            str: Path of the session's copy (a hard link to the shared blob)
+        """
+        digest = hash_bytes(data)
+        blob_path = os.path.join(self.blob_dir, f"{digest}{suffix}")
+        self.touch(session_id)
+        with self._lock:
+            if not os.path.exists(blob_path):
+                tmp_path = f"{blob_path}.{uuid.uuid4().hex}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, blob_path)
+            return self._link(session_id, digest, suffix)
+
+    def put_file(self, session_id, path, suffix=None):
+        """Move a written file into the store for a session
+
+        Args:
+            session_id (str): Session identifier
+            path (str): File to store; it is moved, or removed if the content is already stored
+            suffix (str, optional): File extension, the file's own by default
+
+        Returns:
+            str: Path of the session's copy
+        """
+        if suffix is None:
+            suffix = os.path.splitext(path)[1]
+        digest = hash_file(path)
+        blob_path = os.path.join(self.blob_dir, f"{digest}{suffix}")
+        self.touch(session_id)
+        with self._lock:
+            if os.path.exists(blob_path):
+                os.remove(path)
+            else:
+                shutil.move(path, blob_path)
+            return self._link(session_id, digest, suffix)
+
+    def put_text(self, session_id, text, suffix=".txt"):
+        """Store a text for a session and keep it in the memory cache
+
+        Returns:
+            str: Path of the session's copy, to read back with read_text()
+        """
+        path = self.put_bytes(session_id, text.encode("utf-8"), suffix)
+        with self._lock:
+            self._remember(os.path.basename(path), text)
+        return path
+
+    def read_text(self, path):
+        """Return a stored text, from memory when possible
+
+        Args:
+            path (str): Path returned by put_text()
+
+        Returns:
+            str: Text, or None if the session has been collected
+        """
+        name = os.path.basename(path)
+        with self._lock:
+            # A collected session's texts are gone even if they are still in memory
+            if name in self._texts and os.path.exists(path):
+                self._texts.move_to_end(name)
+                self.memory_hits += 1
+                return self._texts[name]
+            self.memory_misses += 1
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            self._remember(name, text)
+        return text
+
+    def _remember(self, name, text):
+        """Add a text to the memory cache, dropping the least recently read ones"""
+        size = len(text.encode("utf-8"))
+        if name in self._texts or size > self.memory_bytes:
+            return
+        self._texts[name] = text
+        self._texts_size += size
+        while self._texts_size > self.memory_bytes:
+            _, dropped = self._texts.popitem(last=False)
+            self._texts_size -= len(dropped.encode("utf-8"))
+
+    def end_session(self, session_id):
+        """Remove a session's files; blobs no other session uses go at the next collection"""
+        with self._lock:
+            self._remove_session(self._session_dir(session_id))
+
+    def _remove_session(self, session_dir):
+        shutil.rmtree(session_dir, ignore_errors=True)
+        self.removed_sessions += 1
+
+    def maybe_collect(self, keep=None):
+        """Run collect() if the last collection is older than gc_interval"""
+        if time.time() - self._last_gc >= self.gc_interval:
+            self.collect(keep=keep)
+
+    def collect(self, keep=None):
+        """Remove idle sessions, then sessions over the quota, then unused blobs
+
+        Args:
+            keep (str, optional): Session that is never removed, e.g. the active one
+
+        Returns:
+            dict: Storage statistics after the collection
+        """
+        with self._lock:
+            now = time.time()
+            self._last_gc = now
+            self.gc_runs += 1
+            sessions = []
+            for session_id in os.listdir(self.session_root):
+                session_dir = os.path.join(self.session_root, session_id)
+                try:
+                    last_active = os.stat(session_dir).st_mtime
+                except FileNotFoundError:
+                    continue
+                if session_id != keep and now - last_active > self.max_age_seconds:
+                    self._remove_session(session_dir)
+                else:
+                    sessions.append((last_active, session_id, session_dir))
+
+            # Scratch files are small and short-lived, so only blobs and the
+            # copies made where hard links are unsupported count towards the quota
+            copied = {session_dir: self._copied_size(session_dir) for _, _, session_dir in sessions}
+            total_size = self._remove_unused_blobs(now) + sum(copied.values())
+            for _, session_id, session_dir in sorted(sessions):
+                if total_size <= self.max_size_bytes:
+                    break
+                if session_id == keep:
+                    continue
+                self._remove_session(session_dir)
+                del copied[session_dir]
+                total_size = self._remove_unused_blobs(now, grace=False) + sum(copied.values())
+        return self.stats()
+
+    @staticmethod
+    def _copied_size(session_dir):
+        """Return the size of a session's stored files that are copies rather than links"""
+        total_size = 0
+        for name in os.listdir(session_dir) if os.path.isdir(session_dir) else []:
+            if name.startswith("scratch-"):
+                continue
+            try:
+                stat = os.stat(os.path.join(session_dir, name))
+            except FileNotFoundError:
+                continue
+            if stat.st_nlink <= 1:
+                total_size += stat.st_size
+        return total_size
+
+    def _remove_unused_blobs(self, now, grace=True):
+        """Delete blobs no session links to and return the size of the rest"""
+        total_size = 0
+        for name in os.listdir(self.blob_dir):
+            path = os.path.join(self.blob_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            in_grace = grace and now - stat.st_mtime < BLOB_GRACE_SECONDS
+            if stat.st_nlink <= 1 and not in_grace:
+                os.remove(path)
+                self.removed_bytes += stat.st_size
+            else:
+                total_size += stat.st_size
+        return total_size
+
+    def stats(self):
+        """Return disk and memory usage and collection counters
+
+        "linked_bytes" is what the sessions' files would take without
+        deduplication; "disk_bytes" is what the blobs, and the copies made
+        where hard links are unsupported, actually take.
+
+        Returns:
+            dict: Storage statistics
+        """
+        sessions, linked_bytes, copied_bytes = 0, 0, 0
+        for session_id in os.listdir(self.session_root):
+            sessions += 1
+            session_dir = os.path.join(self.session_root, session_id)
+            copied_bytes += self._copied_size(session_dir)
+            for name in os.listdir(session_dir) if os.path.isdir(session_dir) else []:
+                try:
+                    linked_bytes += os.path.getsize(os.path.join(session_dir, name))
+                except FileNotFoundError:
+                    continue
+        blobs, disk_bytes = 0, copied_bytes
+        for name in os.listdir(self.blob_dir):
+            try:
+                disk_bytes += os.path.getsize(os.path.join(self.blob_dir, name))
+                blobs += 1
+            except FileNotFoundError:
+                continue
+        with self._lock:
+            return {
+                "sessions": sessions,
+                "blobs": blobs,
+                "disk_bytes": disk_bytes,
+                "linked_bytes": linked_bytes,
+                "max_bytes": self.max_size_bytes,
+                "memory_entries": len(self._texts),
+                "memory_bytes": self._texts_size,
+                "memory_hits": self.memory_hits,
+                "memory_misses": self.memory_misses,
+                "gc_runs": self.gc_runs,
+                "removed_sessions": self.removed_sessions,
+                "removed_bytes": self.removed_bytes,
+            }
+
+
+def get_storage():
+    """Return the process-wide session storage
+
+    Returns:
+        SessionStorage: Shared storage configured from the STORAGE_* variables
+    """
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            _storage = SessionStorage()
+        return _storage
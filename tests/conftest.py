@@ -0,0 +1,299 @@
+import io
+import json
+import multiprocessing
+import os
+import threading
+import time
+import wave
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject, NumberObject
+
+# Tests never reach the real services or the shared on-disk caches
+os.environ["GROQ_API_KEY"] = "test"
+os.environ["LANDING_AI_API_KEY"] = "test"
+os.environ["GROQ_REQUESTS_PER_MINUTE"] = "1000000"
+os.environ.pop("GROQ_TOKENS_PER_MINUTE", None)
+os.environ["EXTRACTION_CACHE_DISABLED"] = "true"
+os.environ["AUDIO_CACHE_DISABLED"] = "true"
+os.environ["LLM_CACHE_DISABLED"] = "true"
+os.environ["DOC_INDEX_EMBEDDER"] = "hashing"
+os.environ.pop("TRACE_JSONL_PATH", None)
+
+import pytest
+import resilience
+from langchain_core.messages import AIMessageChunk
+
+
+@pytest.fixture(autouse=True)
+def fresh_backends():
+    """Give every test its own retry policies and circuit breakers"""
+    with resilience._backends_lock:
+        resilience._backends.clear()
+    yield
+    with resilience._backends_lock:
+        resilience._backends.clear()
+
+
+class FakeStreamingLLM:
+    """Chat model stand-in that streams a fixed response in the given pieces
+
+    Like the Groq client, the last chunk carries the finish_reason. sent
+    counts the pieces handed out; closed tells whether the last astream()
+    was closed or ran out.
+    """
+
+    model_name = "fake-model"
+    temperature = 0
+    max_tokens = None
+
+    def __init__(self, pieces, finish_reason="stop"):
+        self.pieces = pieces
+        self.finish_reason = finish_reason
+        self.calls = 0
+        self.sent = 0
+        self.closed = False
+
+    def stream(self, prompt):
+        self.calls += 1
+        for piece in self.pieces:
+            self.sent += 1
+            yield AIMessageChunk(content=piece)
+        yield AIMessageChunk(content="", response_metadata={"finish_reason": self.finish_reason})
+
+    async def astream(self, prompt):
+        self.closed = False
+        try:
+            for chunk in self.stream(prompt):
+                yield chunk
+        finally:
+            self.closed = True
+
+
+SENTENCE = "The robot arm follows the planned trajectory while the controller corrects the joint errors"
+
+
+def _text_content(page_number):
+    lines = [f"{SENTENCE} on page {page_number}, line {line}." for line in range(30)]
+    return "\n".join(["BT", "/F1 9 Tf", "11 TL", "40 760 Td"] + [f"({line}) '" for line in lines] + ["ET"]).encode("latin-1")
+
+
+def build_pdf(pages, image_pages=(), image_bytes=1024):
+    """Build a PDF whose pages have a text layer; image_pages also draw a random image
+
+    Text-only pages are routed to the local fast path, pages with an image
+    to the remote API. Random image data does not compress, so image_bytes
+    sets the size of the document.
+    """
+    writer = PdfWriter()
+    font = writer._add_object(DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    }))
+    side = int(image_bytes ** 0.5)
+    for index in range(pages):
+        page = writer.add_blank_page(612, 792)
+        resources = DictionaryObject({NameObject("/Font"): DictionaryObject({NameObject("/F1"): font})})
+        content = _text_content(index)
+        if index in image_pages:
+            image = DecodedStreamObject()
+            image.set_data(os.urandom(side * side))
+            image.update({
+                NameObject("/Type"): NameObject("/XObject"),
+                NameObject("/Subtype"): NameObject("/Image"),
+                NameObject("/Width"): NumberObject(side),
+                NameObject("/Height"): NumberObject(side),
+                NameObject("/ColorSpace"): NameObject("/DeviceGray"),
+                NameObject("/BitsPerComponent"): NumberObject(8),
+            })
+            resources[NameObject("/XObject")] = DictionaryObject({NameObject("/Im1"): writer._add_object(image)})
+            content += b"\nq 500 0 0 500 50 50 cm /Im1 Do Q"
+        stream = DecodedStreamObject()
+        stream.set_data(content)
+        page[NameObject("/Resources")] = resources
+        page[NameObject("/Contents")] = writer._add_object(stream)
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+def page_response(page_count, label="remote"):
+    """Landing AI response with one chunk per page"""
+    chunks = [
+        {"text": f"{label} {page}", "chunk_type": "text", "grounding": [{"page": page}]}
+        for page in range(page_count)
+    ]
+    return {"data": {"markdown": "", "chunks": chunks}}
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        # Read the upload in small pieces, like the real API, without keeping it
+        remaining = int(self.headers["Content-Length"])
+        while remaining:
+            remaining -= len(self.rfile.read(min(remaining, 1 << 20)))
+        body = json.dumps(page_response(1)).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _serve(ports):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+    ports.put(server.server_port)
+    server.serve_forever()
+
+
+@pytest.fixture(scope="module")
+def stub_server_url():
+    """URL of a local HTTP server standing in for the Landing AI endpoint
+
+    The server runs in its own process, so its allocations never show up in
+    the memory measurements of the test process.
+    """
+    context = multiprocessing.get_context("spawn")
+    ports = context.Queue()
+    process = context.Process(target=_serve, args=(ports,), daemon=True)
+    process.start()
+    yield f"http://127.0.0.1:{ports.get(timeout=30)}/"
+    process.terminate()
+    process.join()
+
+
+class _CountingHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so that connection reuse can be observed
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        server = self.server
+        with server.lock:
+            server.in_flight += 1
+            server.peak_in_flight = max(server.peak_in_flight, server.in_flight)
+            server.requests += 1
+            server.connections.add(self.client_address)
+        try:
+            self.rfile.read(int(self.headers["Content-Length"]))
+            time.sleep(server.delay)
+            body = json.dumps(page_response(1)).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def counting_server():
+    """In-process stub Landing AI server recording concurrency and connections
+
+    Every request takes server.delay seconds. server.peak_in_flight is the
+    largest number of requests served at once, server.connections the
+    client (host, port) pairs seen, one per TCP connection.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _CountingHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.delay = 0.05
+    server.in_flight = server.peak_in_flight = server.requests = 0
+    server.connections = set()
+    server.url = f"http://127.0.0.1:{server.server_port}/"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class PageSession:
+    """requests.Session stand-in answering each upload with one chunk per page
+
+    fail(filename, times) makes the uploads of a file name fail with a
+    non-retryable 422 response.
+    """
+
+    def __init__(self):
+        self.uploads = []
+        self.failures = {}
+        self._lock = threading.Lock()
+
+    def fail(self, filename, times=1):
+        self.failures[filename] = times
+
+    def post(self, url, data=None, headers=None, timeout=None):
+        body = b"".join(bytes(chunk) for chunk in data)
+        filename = body.split(b'filename="', 1)[1].split(b'"', 1)[0].decode("utf-8")
+        pdf_data = body[body.index(b"%PDF"):body.rindex(b"%%EOF") + len(b"%%EOF")]
+        with self._lock:
+            self.uploads.append(filename)
+            failing = self.failures.get(filename, 0) > 0
+            if failing:
+                self.failures[filename] -= 1
+        if failing:
+            return _SessionResponse(422, {"detail": "injected failure"})
+        return _SessionResponse(200, page_response(len(PdfReader(io.BytesIO(pdf_data)).pages)))
+
+    def close(self):
+        pass
+
+
+class _SessionResponse:
+    headers = {}
+
+    def __init__(self, status_code, payload):
+        self.status_code = status_code
+        self.payload = payload
+        self.text = json.dumps(payload)
+
+    def json(self):
+        return self.payload
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            import requests
+            raise requests.exceptions.HTTPError(f"{self.status_code} error", response=self)
+
+
+def pcm_for(text):
+    """16-bit PCM frames that FakeSynthesizer writes for a text segment"""
+    data = text.encode("utf-8")
+    return data + b"\0" * (len(data) % 2)
+
+
+class FakeSynthesizer:
+    """Kokoro stand-in writing each segment's text as the PCM of a WAV file
+
+    delay(text) sets how long a segment takes, to reorder completions;
+    texts lists the synthesized segments in call order.
+    """
+
+    def __init__(self, output_dir, delay=None):
+        self.output_dir = output_dir
+        self.delay = delay
+        self.texts = []
+        self._lock = threading.Lock()
+
+    def __call__(self, text, voice_name=None, speed=1.0):
+        with self._lock:
+            index = len(self.texts)
+            self.texts.append(text)
+        if self.delay:
+            time.sleep(self.delay(text))
+        path = os.path.join(self.output_dir, f"segment_{index}.wav")
+        with wave.open(path, "wb") as output:
+            output.setnchannels(1)
+            output.setsampwidth(2)
+            output.setframerate(24000)
+            output.writeframes(pcm_for(text))
+        return path, {"chars": len(text)}, {"index": index}
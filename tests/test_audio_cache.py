@@ -0,0 +1,62 @@
+import os
+import time
+
+import pytest
+import text2speech
+from audio_cache import AudioCache
+from conftest import FakeSynthesizer
+
+
+@pytest.fixture
+def audio_cache(tmp_path, monkeypatch):
+    cache = AudioCache(cache_dir=str(tmp_path / "cache"), enabled=True)
+    monkeypatch.setattr(text2speech, "_audio_cache", cache)
+    return cache
+
+
+def write_wav(path, size):
+    with open(path, "wb") as f:
+        f.write(b"\0" * size)
+    return str(path)
+
+
+def test_cached_narration_makes_no_remote_call(audio_cache, tmp_path):
+    synthesizer = FakeSynthesizer(str(tmp_path))
+    first_input = tmp_path / "first.txt"
+    first_input.write_text("Hello world.\n\nSecond paragraph.", encoding="utf-8")
+    second_input = tmp_path / "second.txt"
+    # Same narration, formatted differently
+    second_input.write_text("Hello   world.\n\n  Second paragraph.\n", encoding="utf-8")
+
+    first = text2speech.text_to_speech(str(first_input), str(tmp_path / "first.wav"), synthesizer=synthesizer)
+    calls = len(synthesizer.texts)
+    second = text2speech.text_to_speech(str(second_input), str(tmp_path / "second.wav"), synthesizer=synthesizer)
+
+    assert calls == 2
+    assert len(synthesizer.texts) == calls
+    assert audio_cache.hits == 1
+    with open(first[0], "rb") as a, open(second[0], "rb") as b:
+        assert a.read() == b.read()
+
+
+def test_least_recently_used_narrations_are_evicted(tmp_path):
+    cache = AudioCache(cache_dir=str(tmp_path / "cache"), max_size_bytes=300, enabled=True)
+    for index, key in enumerate(["a", "b", "c"]):
+        cache.set(key, write_wav(tmp_path / f"{key}.wav", 100))
+        os.utime(cache._entry_path(key), (time.time() - 100 + index, time.time()))
+    cache.get("a")
+
+    cache.set("d", write_wav(tmp_path / "d.wav", 100))
+
+    assert [key for key in "abcd" if os.path.exists(cache._entry_path(key))] == ["a", "c", "d"]
+
+
+def test_key_normalizes_whitespace_and_unicode_but_not_voice_or_speed(tmp_path):
+    cache = AudioCache(cache_dir=str(tmp_path / "cache"), enabled=True)
+    key = cache.make_key("Café olé", "af_sky", 1.0)
+
+    # Decomposed accents and extra whitespace
+    assert cache.make_key("  Cafe\u0301\n ole\u0301 ", "af_sky", 1) == key
+    assert cache.make_key("Café olé", "af_bella", 1.0) != key
+    assert cache.make_key("Café olé", "af_sky", 1.2) != key
+    assert cache.make_key("Cafe ole", "af_sky", 1.0) != key
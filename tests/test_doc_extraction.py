@@ -0,0 +1,116 @@
+import local_extraction
+from conftest import PageSession, build_pdf
+from doc_extraction import PDFProcessor
+
+
+def make_processor(**kwargs):
+    processor = PDFProcessor(use_cache=False, url="http://landing.test/", api_key="test", **kwargs)
+    processor.session = PageSession()
+    return processor
+
+
+def chunk_pages(response):
+    return sorted(chunk["grounding"][0]["page"] for chunk in response["data"]["chunks"])
+
+
+def write_documents(tmp_path, count, pages=1):
+    paths = []
+    for index in range(count):
+        path = tmp_path / f"doc{index}.pdf"
+        path.write_bytes(build_pdf(pages))
+        paths.append(str(path))
+    return paths
+
+
+def test_failed_page_group_is_retried():
+    processor = make_processor(max_workers=3, local_fast_path=False, page_group_size=5)
+    processor.session.fail("doc_pages_6-10.pdf")
+
+    response = processor.process_pdf_bytes(build_pdf(12), "doc.pdf")
+
+    assert chunk_pages(response) == list(range(12))
+    assert "failed_pages" not in response
+    assert processor.session.uploads.count("doc_pages_6-10.pdf") == 2
+
+
+def test_pages_of_a_group_that_keeps_failing_are_reported():
+    processor = make_processor(max_workers=3, local_fast_path=False, page_group_size=5)
+    processor.session.fail("doc_pages_6-10.pdf", times=10)
+
+    response = processor.process_pdf_bytes(build_pdf(12), "doc.pdf")
+
+    assert chunk_pages(response) == [0, 1, 2, 3, 4, 10, 11]
+    assert response["failed_pages"] == [5, 6, 7, 8, 9]
+
+
+def test_subset_write_error_fails_the_group_instead_of_raising(monkeypatch):
+    write_subset = local_extraction._write_subset
+
+    def failing_write(pdf_data, page_indices, output):
+        if page_indices[0] == 0:
+            raise ValueError("broken page tree")
+        write_subset(pdf_data, page_indices, output)
+
+    monkeypatch.setattr(local_extraction, "_write_subset", failing_write)
+    processor = make_processor(max_workers=3, local_fast_path=False, page_group_size=5)
+
+    response = processor.process_pdf_bytes(build_pdf(12), "doc.pdf")
+
+    assert chunk_pages(response) == list(range(5, 12))
+    assert response["failed_pages"] == [0, 1, 2, 3, 4]
+
+
+def test_remote_pages_of_a_routed_document_are_grouped_from_the_original():
+    processor = make_processor(max_workers=3, local_fast_path=True, page_group_size=2)
+    pdf_data = build_pdf(12, image_pages={1, 3, 5, 7, 9, 11})
+
+    response = processor.process_pdf_bytes(pdf_data, "doc.pdf")
+
+    assert sorted(processor.session.uploads) == ["doc_pages_10-12.pdf", "doc_pages_2-4.pdf", "doc_pages_6-8.pdf"]
+    remote_pages = [
+        chunk["grounding"][0]["page"] for chunk in response["data"]["chunks"] if chunk["text"].startswith("remote")
+    ]
+    assert remote_pages == [1, 3, 5, 7, 9, 11]
+    assert [page["route"] for page in response["routing"]] == ["local", "remote"] * 6
+
+
+def test_page_groups_of_concurrent_documents_share_the_upload_cap(counting_server, tmp_path):
+    counting_server.delay = 0.2
+    paths = write_documents(tmp_path, 3, pages=8)
+    processor = PDFProcessor(use_cache=False, url=counting_server.url, api_key="test", max_workers=3,
+                             local_fast_path=False, page_group_size=2)
+
+    results = dict(processor.process_many(paths))
+
+    assert all(chunk_pages(results[path]) == [0, 2, 4, 6] for path in paths)
+    assert counting_server.requests == 12
+    assert 1 < counting_server.peak_in_flight <= 3
+
+
+def test_process_many_caps_uploads_at_the_pool_size_and_reuses_connections(counting_server, tmp_path):
+    paths = write_documents(tmp_path, 8)
+    processor = PDFProcessor(use_cache=False, url=counting_server.url, api_key="test", max_workers=3,
+                             local_fast_path=False, page_group_size=0)
+
+    # Asking for more workers than the pool holds is capped
+    first = dict(processor.process_many(paths, max_workers=8))
+    second = dict(processor.process_many(paths, max_workers=8))
+
+    assert sorted(first) == sorted(second) == sorted(paths)
+    assert all(result is not None for result in [*first.values(), *second.values()])
+    assert counting_server.requests == 16
+    assert 1 < counting_server.peak_in_flight <= 3
+    # 16 uploads over at most one connection per worker
+    assert len(counting_server.connections) <= 3
+
+
+def test_process_many_respects_a_smaller_worker_count(counting_server, tmp_path):
+    paths = write_documents(tmp_path, 6)
+    processor = PDFProcessor(use_cache=False, url=counting_server.url, api_key="test", max_workers=4,
+                             local_fast_path=False, page_group_size=0)
+
+    results = dict(processor.process_many(paths, max_workers=2))
+
+    assert len(results) == 6 and all(results.values())
+    assert counting_server.peak_in_flight == 2
+    assert len(counting_server.connections) <= 2
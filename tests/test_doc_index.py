@@ -0,0 +1,91 @@
+import os
+import threading
+import doc_index
+import pytest
+from doc_index import DocumentIndex, HashingEmbedder
+
+
+@pytest.fixture
+def slow_index(tmp_path, monkeypatch):
+    """Shared index whose embedder takes until loaded.set() to load, like a model download"""
+    loaded = threading.Event()
+
+    def load_index():
+        loaded.wait(timeout=10)
+        return DocumentIndex(str(tmp_path / "index"), HashingEmbedder())
+
+    monkeypatch.setattr(doc_index, "_index", None)
+    monkeypatch.setattr(doc_index, "DocumentIndex", load_index)
+    yield loaded
+    loaded.set()
+
+
+def test_background_indexing_does_not_wait_for_the_embedder(slow_index):
+    future = doc_index.index_markdown_in_background("doc", "# Robot\n\nEl brazo sigue la trayectoria planificada.")
+
+    assert not future.done()
+    assert not doc_index.index_ready()
+    slow_index.set()
+    assert future.result(timeout=10) == 1
+    assert doc_index.index_ready()
+    assert doc_index.get_index().search("trayectoria")[0]["document"] == "doc"
+
+
+def data_files(index):
+    return sorted(name for name in os.listdir(index.index_dir) if name.startswith(("vectors.", "chunks.")))
+
+
+def test_old_generations_that_cannot_be_deleted_yet_are_removed_later(tmp_path, monkeypatch):
+    index = DocumentIndex(str(tmp_path / "index"), HashingEmbedder())
+    index.add_document("doc", "# Robot\n\nPrimera versión.")
+    assert index.search("versión")[0]["text"] == "Primera versión."
+    remove = os.remove
+
+    def mapped_remove(path):
+        # Windows refuses to delete a memory-mapped file
+        if os.path.basename(path).startswith("vectors.0"):
+            raise PermissionError(f"file in use: {path}")
+        remove(path)
+
+    monkeypatch.setattr(os, "remove", mapped_remove)
+    index.add_document("doc", "# Robot\n\nSegunda versión.")
+    # Two thirds of the rows are unused, so the index is compacted into generation 1
+    index.add_document("doc", "# Robot\n\nTercera versión.")
+
+    assert data_files(index) == ["chunks.1.jsonl", "vectors.0.f32", "vectors.1.f32"]
+    assert index.search("versión")[0]["text"] == "Tercera versión."
+
+    monkeypatch.setattr(os, "remove", remove)
+    index.add_document("other", "# Brazo\n\nOtro documento.")
+
+    assert data_files(index) == ["chunks.1.jsonl", "vectors.1.f32"]
+
+
+class FakeMsvcrt:
+    """msvcrt stand-in recording byte-range lock calls"""
+
+    LK_LOCK = 1
+    LK_UNLCK = 0
+
+    def __init__(self, busy_attempts=0):
+        self.busy_attempts = busy_attempts
+        self.calls = []
+
+    def locking(self, fd, mode, nbytes):
+        self.calls.append((mode, os.lseek(fd, 0, os.SEEK_CUR), nbytes))
+        if mode == self.LK_LOCK and self.busy_attempts:
+            self.busy_attempts -= 1
+            raise OSError("deadlock avoided")
+
+
+def test_writers_lock_the_index_with_msvcrt_without_fcntl(tmp_path, monkeypatch):
+    msvcrt = FakeMsvcrt(busy_attempts=2)
+    monkeypatch.setattr(doc_index, "fcntl", None)
+    monkeypatch.setattr(doc_index, "msvcrt", msvcrt)
+    index = DocumentIndex(str(tmp_path / "index"), HashingEmbedder())
+
+    index.add_document("doc", "# Robot\n\nEl brazo sigue la trayectoria planificada.")
+
+    # The lock is retried while another process holds it, then released
+    assert msvcrt.calls == [(1, 0, 1)] * 3 + [(0, 0, 1)]
+    assert index.search("trayectoria")[0]["document"] == "doc"
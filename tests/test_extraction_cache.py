@@ -0,0 +1,105 @@
+import os
+import time
+
+from conftest import PageSession, build_pdf
+from doc_extraction import PDFProcessor
+from extraction_cache import ExtractionCache
+
+
+def make_cache(tmp_path, **kwargs):
+    return ExtractionCache(cache_dir=str(tmp_path / "cache"), enabled=True, **kwargs)
+
+
+def make_processor(cache):
+    processor = PDFProcessor(cache=cache, url="http://landing.test/", api_key="test", max_workers=1,
+                             local_fast_path=False)
+    processor.session = PageSession()
+    return processor
+
+
+def test_get_counts_hits_and_misses(tmp_path):
+    cache = make_cache(tmp_path)
+
+    assert cache.get("missing") is None
+    cache.set("key", {"data": 1})
+
+    assert cache.get("key") == {"data": 1}
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 1)
+
+
+def test_key_ignores_authorization_but_not_other_headers(tmp_path):
+    cache = make_cache(tmp_path)
+
+    assert cache.make_key("abc", {"Authorization": "Basic a"}) == cache.make_key("abc", {"Authorization": "Basic b"})
+    assert cache.make_key("abc", {"X-Mode": "a"}) != cache.make_key("abc", {"X-Mode": "b"})
+
+
+def test_least_recently_used_entries_are_evicted_over_the_size_limit(tmp_path):
+    cache = make_cache(tmp_path, max_size_bytes=200)
+    for index, key in enumerate(["a", "b", "c"]):
+        cache.set(key, {"text": key * 50})
+        # Distinct access times, oldest first
+        os.utime(cache._entry_path(key), (time.time() - 100 + index, time.time()))
+    cache.get("a")
+
+    cache.set("d", {"text": "d" * 50})
+
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+    assert cache.get("c") is not None
+    assert cache.get("d") is not None
+
+
+def test_entries_expire_after_max_age(tmp_path):
+    cache = make_cache(tmp_path, max_age_seconds=60)
+    cache.set("old", {"data": 1})
+    cache.set("new", {"data": 2})
+    written = time.time() - 120
+    os.utime(cache._entry_path("old"), (written, written))
+
+    assert cache.get("old") is None
+    assert not os.path.exists(cache._entry_path("old"))
+    assert cache.get("new") == {"data": 2}
+
+
+def test_eviction_tolerates_entries_removed_by_another_process(tmp_path, monkeypatch):
+    cache = make_cache(tmp_path, max_size_bytes=0)
+    cache.set("a", {"data": 1})
+    remove = os.remove
+
+    def racing_remove(path):
+        remove(path)
+        raise FileNotFoundError(path)
+
+    monkeypatch.setattr(os, "remove", racing_remove)
+    cache.set("b", {"data": 2})
+
+    # The new entry is kept even though it alone exceeds the limit
+    assert cache.stats()["entries"] == 1
+    assert cache.get("b") == {"data": 2}
+
+
+def test_cached_document_is_not_uploaded_again_unless_bypassed(tmp_path):
+    processor = make_processor(make_cache(tmp_path))
+    pdf_data = build_pdf(2)
+
+    first = processor.process_pdf_bytes(pdf_data, "doc.pdf")
+    second = processor.process_pdf_bytes(pdf_data, "renamed.pdf")
+    bypassed = processor.process_pdf_bytes(pdf_data, "doc.pdf", bypass_cache=True)
+
+    assert first == second == bypassed
+    assert processor.session.uploads == ["doc.pdf", "doc.pdf"]
+
+
+def test_cache_write_error_keeps_the_response(tmp_path, monkeypatch):
+    cache = make_cache(tmp_path)
+    processor = make_processor(cache)
+
+    def full_disk(*args, **kwargs):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(os, "replace", full_disk)
+    response = processor.process_pdf_bytes(build_pdf(2), "doc.pdf")
+
+    assert len(response["data"]["chunks"]) == 2
+    assert cache.stats()["entries"] == 0
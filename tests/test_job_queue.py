@@ -0,0 +1,139 @@
+import os
+import sqlite3
+import time
+import doc_extraction
+import doc_index
+import pipeline
+import pytest
+import text2speech
+from job_queue import DONE, FAILED, QUEUED, RUNNING, JobQueue, heartbeat, run_job
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(db_path=str(tmp_path / "jobs.sqlite3"), job_dir=str(tmp_path / "jobs"))
+
+
+@pytest.fixture
+def fake_stages(monkeypatch):
+    """Replace the extraction, LLM, index and TTS stages with instant fakes"""
+    audio_paths = []
+
+    class FakeProcessor:
+        def process_pdf(self, pdf_path):
+            return {"data": {"chunks": []}}
+
+    def fake_text_to_speech(input_file_path, output_file_path="output_audio.wav", voice_name=None):
+        audio_paths.append(output_file_path)
+        return output_file_path, {}, ""
+
+    monkeypatch.setattr(doc_extraction, "PDFProcessor", FakeProcessor)
+    monkeypatch.setattr(pipeline, "generate_outputs",
+                        lambda result: {"markdown": "# Doc", "audio_text": "Narración", "errors": {}})
+    monkeypatch.setattr(doc_index, "index_markdown", lambda name, markdown: 1)
+    monkeypatch.setattr(text2speech, "text_to_speech", fake_text_to_speech)
+    return audio_paths
+
+
+def test_each_job_writes_its_own_audio_file(queue, fake_stages):
+    job_ids = [queue.submit(f"%PDF-{index}".encode(), f"doc{index}.pdf", {"tts": True}) for index in range(2)]
+
+    for job_id in job_ids:
+        outputs = run_job(queue, queue.claim("worker"))
+        assert outputs["audio_path"] == os.path.join(queue.job_dir, f"{job_id}.wav")
+    assert len(set(fake_stages)) == 2
+
+
+def age_job(queue, job_id, seconds):
+    with sqlite3.connect(queue.db_path) as conn:
+        conn.execute("UPDATE jobs SET updated_at = updated_at - ? WHERE id = ?", (seconds, job_id))
+
+
+def test_heartbeats_keep_a_long_stage_from_being_requeued(queue):
+    queue.submit(b"%PDF-1", "doc.pdf")
+    job = queue.claim("worker")
+
+    with heartbeat(queue, job["id"], interval=0.01):
+        age_job(queue, job["id"], 3600)
+        time.sleep(0.1)
+        assert queue.requeue_stale(stale_after=60) == 0
+    assert queue.get(job["id"])["status"] == RUNNING
+
+
+def test_job_is_failed_after_max_attempts(queue):
+    job_id = queue.submit(b"%PDF-1", "doc.pdf")
+
+    for attempt in range(1, 3):
+        assert queue.claim("worker")["attempts"] == attempt
+        age_job(queue, job_id, 3600)
+        assert queue.requeue_stale(stale_after=60, max_attempts=2) == (1 if attempt < 2 else 0)
+
+    job = queue.get(job_id)
+    assert job["status"] == FAILED
+    assert job["error"] == "Worker stopped responding 2 times"
+    assert queue.claim("worker") is None
+
+
+def test_stale_job_is_requeued(queue):
+    job_id = queue.submit(b"%PDF-1", "doc.pdf")
+    queue.claim("worker")
+    age_job(queue, job_id, 3600)
+
+    assert queue.requeue_stale(stale_after=60) == 1
+    assert queue.get(job_id)["status"] == QUEUED
+
+
+def test_only_the_worker_running_a_job_can_finish_it(queue):
+    job_id = queue.submit(b"%PDF-1", "doc.pdf")
+    queue.claim("stalled")
+    age_job(queue, job_id, 3600)
+    queue.requeue_stale(stale_after=60)
+    queue.claim("current")
+
+    # The stalled worker comes back after its job was handed over
+    assert not queue.complete(job_id, {"markdown": "# Old"}, "stalled")
+    assert not queue.fail(job_id, "late error", "stalled")
+    job = queue.get(job_id)
+    assert (job["status"], job["worker"], job["result"], job["error"]) == (RUNNING, "current", None, None)
+
+    assert queue.complete(job_id, {"markdown": "# New"}, "current")
+    assert queue.get(job_id)["status"] == DONE
+    assert not queue.fail(job_id, "late error", "current")
+    assert queue.get(job_id)["status"] == DONE
+
+
+def age_file(path, seconds):
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime - seconds, stat.st_mtime - seconds))
+
+
+def test_cleanup_removes_old_finished_jobs_and_their_files(queue, fake_stages):
+    old_id = queue.submit(b"%PDF-old", "old.pdf", {"tts": True})
+    queue.complete(old_id, run_job(queue, queue.claim("worker")), "worker")
+    active_id = queue.submit(b"%PDF-active", "active.pdf")
+    queue.claim("worker")
+    for name in os.listdir(queue.job_dir):
+        age_file(os.path.join(queue.job_dir, name), 3 * 86400)
+    age_job(queue, old_id, 2 * 86400)
+    age_job(queue, active_id, 2 * 86400)
+
+    stats = queue.cleanup(max_age_seconds=86400)
+
+    assert stats["jobs"] == 1
+    assert stats["files"] == 2
+    assert queue.get(old_id) is None
+    assert queue.get(active_id)["status"] == RUNNING
+    assert os.listdir(queue.job_dir) == [os.path.basename(queue.get(active_id)["pdf_path"])]
+
+
+def test_cleanup_keeps_a_pdf_submitted_again(queue):
+    job_id = queue.submit(b"%PDF-1", "doc.pdf")
+    queue.fail(queue.claim("worker")["id"], "error", "worker")
+    pdf_path = queue.get(job_id)["pdf_path"]
+    age_file(pdf_path, 3 * 86400)
+    age_job(queue, job_id, 2 * 86400)
+
+    queue.submit(b"%PDF-1", "doc.pdf")
+    queue.cleanup(max_age_seconds=86400)
+
+    assert os.path.exists(pdf_path)
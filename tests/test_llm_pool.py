@@ -0,0 +1,40 @@
+import time
+from conftest import FakeStreamingLLM
+from llm_pool import stream_llm
+from resilience import get_backend
+
+
+def read_until_fence(stream):
+    """Consume a stream like stream_complete: stop and close it at the closing fence"""
+    text = ""
+    for chunk in stream:
+        text += chunk.content
+        if text.count("```") == 2:
+            break
+    stream.close()
+    return text
+
+
+def test_closed_stream_resets_breaker_failures():
+    breaker = get_backend("groq").breaker
+    breaker.failures = breaker.failure_threshold - 1
+    llm = FakeStreamingLLM(["```markdown\n", "# Title", "\n```", " trailing remarks"])
+
+    assert read_until_fence(stream_llm(llm, "prompt")) == "```markdown\n# Title\n```"
+    assert breaker.failures == 0
+    assert get_backend("groq").metrics.successes == 1
+
+
+def test_closed_stream_releases_half_open_probe():
+    breaker = get_backend("groq").breaker
+    breaker.state = "open"
+    breaker.opened_at = time.monotonic() - breaker.reset_timeout - 1
+    llm = FakeStreamingLLM(["```text\n", "hola", "\n```", " more"])
+
+    # The probe stream succeeds but is closed early by its consumer
+    read_until_fence(stream_llm(llm, "prompt"))
+    assert breaker.state == "closed"
+    assert not breaker._probe_in_flight
+
+    # Later calls are let through again
+    assert read_until_fence(stream_llm(llm, "prompt")) == "```text\nhola\n```"
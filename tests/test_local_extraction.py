@@ -0,0 +1,89 @@
+from local_extraction import classify_page, text_to_chunks
+
+PROSE = "\n".join([
+    "Autotuned robot modeling. While robot manufacturers are",
+    "often able to provide proprietary model files for their robot",
+    "hardwares, the models mostly serve a starting reference for",
+    "robot real-to-sim effort rather than ground truth models that",
+    "can be used without modifications. Empirical solutions to",
+    "increase modeling accuracy range from hand-tuning the robot",
+    "model constants and simulatable physical parameters to re-",
+    "formulating specific kinematic structures in the simulator.",
+])
+
+# A pseudocode listing as pypdf extracts it from a two-column paper
+ALGORITHM = "\n".join([
+    "Algorithm 1 Real-to-sim autotune module",
+    "1: Initialize the simulated environments with random parameters",
+    "2: for each calibration sequence of joint position targets do",
+    "3: Execute the targets on the real robot and in simulation",
+    "4: Compute the tracking error of every simulated environment",
+    "5: end for",
+    "6: return the parameter set with the lowest mean squared error",
+])
+
+
+class FakePage:
+    """pypdf page stand-in with a text layer and no embedded figures"""
+
+    def __init__(self, text):
+        self.text = text
+
+    def extract_text(self):
+        return self.text
+
+    def get(self, key):
+        return None
+
+
+def test_plain_prose_is_extracted_locally():
+    decision = classify_page(FakePage(PROSE))
+
+    assert decision["route"] == "local"
+    assert decision["reason"] == "text layer"
+
+
+def test_pages_with_pseudocode_go_to_the_remote_api():
+    with_caption = classify_page(FakePage(f"{PROSE}\n{ALGORITHM}"))
+    # Numbered steps without a caption, as when the caption is on the previous page
+    without_caption = classify_page(FakePage(f"{PROSE}\n" + ALGORITHM.split("\n", 1)[1]))
+
+    assert (with_caption["route"], with_caption["reason"]) == ("remote", "algorithm")
+    assert (without_caption["route"], without_caption["reason"]) == ("remote", "algorithm")
+
+
+def test_prose_mentioning_an_algorithm_stays_local():
+    text = PROSE.replace("Empirical solutions to", "As in Algorithm 1, solutions to")
+
+    assert classify_page(FakePage(text))["route"] == "local"
+
+
+def test_short_and_table_pages_go_to_the_remote_api():
+    assert classify_page(FakePage("Figure 3"))["reason"] == "no text layer"
+    assert classify_page(FakePage(f"TABLE II\n{PROSE}"))["reason"] == "tables"
+
+
+def test_lines_are_joined_into_paragraphs_and_headings():
+    text = "\n".join([
+        "III. METHOD",
+        "The policy is trained in simulation with domain random-",
+        "ization over the friction and mass of every object so that",
+        "it transfers to the real robot.",
+        "A second paragraph starts on a new line and it goes on",
+        "until the end of the page without a final period",
+    ])
+
+    chunks = text_to_chunks(text, 3)
+
+    assert [(chunk["chunk_type"], chunk["text"]) for chunk in chunks] == [
+        ("title", "III. METHOD"),
+        ("text", "The policy is trained in simulation with domain randomization over the friction "
+                 "and mass of every object so that it transfers to the real robot."),
+        ("text", "A second paragraph starts on a new line and it goes on "
+                 "until the end of the page without a final period"),
+    ]
+    assert all(chunk["grounding"] == [{"page": 3, "box": None}] for chunk in chunks)
+
+
+def test_blank_text_has_no_chunks():
+    assert text_to_chunks(" \n\n ", 0) == []
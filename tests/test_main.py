@@ -0,0 +1,134 @@
+import json
+import os
+import time
+
+import main
+import pytest
+from conftest import build_pdf
+
+
+class FakeProcessor:
+    """PDFProcessor stand-in that records the converted pages"""
+
+    converted = []
+    failing = set()
+
+    def __init__(self, max_workers=None):
+        pass
+
+    def process_pdf(self, page_path):
+        name = os.path.basename(page_path)
+        FakeProcessor.converted.append(name)
+        if name in FakeProcessor.failing:
+            return None
+        return {"data": {"markdown": name, "chunks": []}}
+
+    def close(self):
+        pass
+
+
+def write_markdown(result, markdown_path):
+    content = f"# {result['data']['markdown']}"
+    with open(markdown_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    return content
+
+
+@pytest.fixture
+def corpus(tmp_path, monkeypatch):
+    FakeProcessor.converted = []
+    FakeProcessor.failing = set()
+    monkeypatch.setattr(main, "PDFProcessor", FakeProcessor)
+    monkeypatch.setattr(main, "process_json_to_markdown", write_markdown)
+    source_dir = tmp_path / "source"
+    source_dir.mkdir()
+    output_dir = tmp_path / "md"
+
+    def run():
+        FakeProcessor.converted = []
+        return main.run_pipeline([str(source_dir)], output_dir=str(output_dir), split_dir=str(tmp_path / "split"),
+                                 split_workers=1, index=False)
+
+    return source_dir, output_dir, run
+
+
+def test_rerun_skips_converted_pages(corpus):
+    source_dir, output_dir, run = corpus
+    (source_dir / "doc.pdf").write_bytes(build_pdf(3))
+
+    first = run()
+    second = run()
+
+    assert (first["converted"], first["skipped"]) == (3, 0)
+    assert (second["converted"], second["skipped"]) == (0, 3)
+    assert FakeProcessor.converted == []
+    assert (output_dir / "doc.md").read_text(encoding="utf-8") == (
+        "# doc_page_1.pdf\n\n# doc_page_2.pdf\n\n# doc_page_3.pdf\n"
+    )
+
+
+def test_only_changed_pages_are_reconverted(corpus):
+    source_dir, output_dir, run = corpus
+    (source_dir / "doc.pdf").write_bytes(build_pdf(3))
+    run()
+
+    # Rewriting the source renumbers its objects, but only page 2 draws something new
+    (source_dir / "doc.pdf").write_bytes(build_pdf(3, image_pages={1}))
+    future = time.time() + 10
+    os.utime(source_dir / "doc.pdf", (future, future))
+    summary = run()
+
+    assert FakeProcessor.converted == ["doc_page_2.pdf"]
+    assert (summary["converted"], summary["skipped"]) == (1, 2)
+
+
+def test_failed_page_is_retried_on_resume_and_blocks_assembly(corpus):
+    source_dir, output_dir, run = corpus
+    (source_dir / "doc.pdf").write_bytes(build_pdf(3))
+    FakeProcessor.failing = {"doc_page_2.pdf"}
+
+    first = run()
+
+    assert first["failed"] == 1
+    assert list(first["incomplete_documents"]) == ["doc"]
+    assert not (output_dir / "doc.md").exists()
+    manifest = json.loads((output_dir / "manifest.json").read_text(encoding="utf-8"))["pages"]
+    assert sorted(entry["status"] for entry in manifest.values()) == ["done", "done", "failed"]
+
+    FakeProcessor.failing = set()
+    second = run()
+
+    assert FakeProcessor.converted == ["doc_page_2.pdf"]
+    assert (second["converted"], second["skipped"], second["failed"]) == (1, 2, 0)
+    assert second["incomplete_documents"] == {}
+    assert (output_dir / "doc.md").exists()
+
+
+def test_unreadable_source_is_recorded_and_the_batch_continues(corpus):
+    source_dir, output_dir, run = corpus
+    (source_dir / "broken.pdf").write_bytes(b"%PDF-1.7 not really a pdf")
+    (source_dir / "doc.pdf").write_bytes(build_pdf(2))
+
+    summary = run()
+
+    assert (summary["converted"], summary["failed"]) == (2, 1)
+    assert list(summary["incomplete_documents"]) == ["broken"]
+    assert (output_dir / "doc.md").exists()
+    manifest = json.loads((output_dir / "manifest.json").read_text(encoding="utf-8"))["pages"]
+    assert manifest[str(source_dir / "broken.pdf")]["status"] == "failed"
+
+
+def test_unreadable_page_pdf_is_recorded_and_the_batch_continues(corpus, tmp_path):
+    _, output_dir, _ = corpus
+    pages_dir = tmp_path / "pages"
+    pages_dir.mkdir()
+    (pages_dir / "doc_page_1.pdf").write_bytes(build_pdf(1))
+    (pages_dir / "doc_page_2.pdf").write_bytes(b"truncated")
+    (pages_dir / "other_page_1.pdf").write_bytes(build_pdf(1))
+
+    summary = main.run_pipeline([str(pages_dir)], output_dir=str(output_dir), split=False, index=False)
+
+    assert (summary["converted"], summary["failed"]) == (2, 1)
+    assert list(summary["incomplete_documents"]) == ["doc"]
+    assert not (output_dir / "doc.md").exists()
+    assert (output_dir / "other.md").exists()
@@ -0,0 +1,149 @@
+import asyncio
+import time
+import pytest
+import md_generator
+from conftest import FakeStreamingLLM
+from llm_cache import LLMCache
+from tracing import get_tracer
+from md_generator import MARKDOWN_PROMPT_TEMPLATE, acomplete, stream_complete, stream_json_to_markdown
+
+VARIABLES = {"content": "Robot arm", "part_guidelines": ""}
+
+
+@pytest.fixture
+def llm_cache(tmp_path, monkeypatch):
+    cache = LLMCache(db_path=str(tmp_path / "llm_cache.sqlite3"), enabled=True)
+    monkeypatch.setattr(md_generator, "get_llm_cache", lambda: cache)
+    return cache
+
+
+def complete(llm):
+    return "".join(stream_complete(llm, MARKDOWN_PROMPT_TEMPLATE, VARIABLES, "markdown"))
+
+
+def test_closed_block_is_cached(llm_cache):
+    llm = FakeStreamingLLM(["<think>plan</think>", "```markdown\n", "# Título", "\n```", " done"])
+
+    assert complete(llm) == "# Título"
+    assert complete(llm) == "# Título"
+    assert llm.calls == 1
+
+
+def test_stream_cut_off_at_max_tokens_is_not_cached(llm_cache):
+    llm = FakeStreamingLLM(["<think>plan</think>", "```markdown\n", "# Título\n", "Texto cortado"],
+                           finish_reason="length")
+
+    assert complete(llm) == "# Título\nTexto cortado"
+    complete(llm)
+    assert llm.calls == 2
+    assert llm_cache.stats()["entries"] == 0
+
+
+def test_unfenced_answer_of_a_stream_that_stopped_is_cached(llm_cache):
+    llm = FakeStreamingLLM(["# Título\n", "Texto"], finish_reason="stop")
+
+    assert complete(llm) == "# Título\nTexto"
+    assert complete(llm) == "# Título\nTexto"
+    assert llm.calls == 1
+
+
+def test_reasoning_only_completion_is_not_cached(llm_cache):
+    llm = FakeStreamingLLM(["<think>", "the content is about robots", "</think>", "\n  \n"])
+
+    assert complete(llm) == ""
+    complete(llm)
+    assert llm.calls == 2
+    assert llm_cache.stats()["entries"] == 0
+
+
+def test_failed_stream_is_not_cached(llm_cache):
+    class FailingLLM(FakeStreamingLLM):
+        def stream(self, prompt):
+            yield from super().stream(prompt)
+            raise ConnectionError("stream reset")
+
+    llm = FailingLLM(["```markdown\n", "# Título parcial"])
+
+    with pytest.raises(ConnectionError):
+        complete(llm)
+    assert llm_cache.stats()["entries"] == 0
+
+
+def test_async_completion_closes_the_stream_at_the_closing_fence(llm_cache):
+    llm = FakeStreamingLLM(["<think>plan</think>", "```markdown\n", "# Título", "\n```", " done", " more"])
+
+    text = asyncio.run(acomplete(llm, MARKDOWN_PROMPT_TEMPLATE, VARIABLES, "markdown"))
+
+    assert text == "<think>plan</think>```markdown\n# Título\n```"
+    # Nothing is read past the fence
+    assert llm.sent == 4
+    assert llm.closed
+    assert asyncio.run(acomplete(llm, MARKDOWN_PROMPT_TEMPLATE, VARIABLES, "markdown")) == text
+    assert llm.calls == 1
+
+
+class PromptFailingLLM(FakeStreamingLLM):
+    """Answers every prompt with a fenced block, except those mentioning failing_text"""
+
+    def __init__(self, failing_text):
+        super().__init__(["```markdown\n", "# Parte", "\n```"])
+        self.failing_text = failing_text
+
+    def stream(self, prompt):
+        if self.failing_text in prompt:
+            raise ValueError("model rejected the request")
+        yield from super().stream(prompt)
+
+
+def three_windows():
+    chunks = [{"text": f"Section {index} " + "word " * 40, "chunk_type": "text"} for index in range(3)]
+    return {"data": {"chunks": chunks}}
+
+
+def test_failed_background_window_is_raised_after_the_streamed_part():
+    stream = stream_json_to_markdown(three_windows(), llm=PromptFailingLLM("Section 2"), max_tokens=60)
+    streamed = ""
+
+    with pytest.raises(ValueError):
+        for piece in stream:
+            streamed += piece
+    assert streamed == "# Parte\n\n## Parte"
+
+
+def test_failed_first_window_is_raised():
+    stream = stream_json_to_markdown(three_windows(), llm=PromptFailingLLM("Section 0"), max_tokens=60)
+
+    with pytest.raises(ValueError):
+        "".join(stream)
+
+
+class SlowBackgroundLLM(FakeStreamingLLM):
+    """Answers the first window at once and every later one after delay seconds"""
+
+    def __init__(self, delay):
+        super().__init__(["```markdown\n", "# Parte", "\n```"])
+        self.delay = delay
+
+    def stream(self, prompt):
+        if "Section 0" not in prompt:
+            time.sleep(self.delay)
+        yield from super().stream(prompt)
+
+
+def test_closing_an_abandoned_stream_does_not_wait_for_background_windows():
+    stream = stream_json_to_markdown(three_windows(), llm=SlowBackgroundLLM(1.0), max_tokens=60, max_workers=2)
+    assert next(stream).startswith("# Pa")
+
+    start = time.perf_counter()
+    stream.close()
+
+    assert time.perf_counter() - start < 0.5
+
+
+def test_background_windows_record_their_extraction_span():
+    get_tracer().clear()
+
+    "".join(stream_json_to_markdown(three_windows(), llm=SlowBackgroundLLM(0), max_tokens=60))
+
+    parts = sorted(span.attributes["part"] for span in get_tracer().spans() if span.name == "markdown_extraction")
+    assert parts == [2, 3]
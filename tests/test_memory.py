@@ -0,0 +1,57 @@
+import gc
+import tracemalloc
+import pytest
+from conftest import build_pdf
+from doc_extraction import PDFProcessor
+
+IMAGE_PAGES = 8
+IMAGE_BYTES = 2 * 1024 * 1024
+
+
+@pytest.fixture(scope="module")
+def pdf_data():
+    # Half text pages (local fast path), half large image pages (remote API)
+    return build_pdf(2 * IMAGE_PAGES, image_pages=range(1, 2 * IMAGE_PAGES, 2), image_bytes=IMAGE_BYTES)
+
+
+def peak_memory(pdf_data, url, **options):
+    """Return the peak traced allocation while a processor extracts pdf_data"""
+    processor = PDFProcessor(use_cache=False, url=url, api_key="test", max_workers=4, **options)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        response = processor.process_pdf_bytes(pdf_data, "document.pdf")
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        processor.close()
+    assert response is not None and not response.get("failed_pages")
+    return peak
+
+
+def test_whole_upload_does_not_copy_the_pdf(pdf_data, stub_server_url):
+    peak = peak_memory(pdf_data, stub_server_url, local_fast_path=False, page_group_size=0)
+
+    assert peak < 0.1 * len(pdf_data)
+
+
+def test_routing_holds_one_copy_of_the_remote_pages_at_most(pdf_data, stub_server_url):
+    # Writing the subset of remote pages is the only step that holds their objects
+    peak = peak_memory(pdf_data, stub_server_url, local_fast_path=True, page_group_size=0)
+
+    assert peak < 1.5 * len(pdf_data)
+
+
+# Written groups are freed by the cycle collector, not as soon as they are
+# uploaded, so the bound is one copy of the document rather than one group
+
+def test_page_groups_hold_one_copy_of_the_document_at_most(pdf_data, stub_server_url):
+    peak = peak_memory(pdf_data, stub_server_url, local_fast_path=False, page_group_size=4)
+
+    assert peak < 1.5 * len(pdf_data)
+
+
+def test_routed_page_groups_hold_one_copy_of_the_document_at_most(pdf_data, stub_server_url):
+    peak = peak_memory(pdf_data, stub_server_url, local_fast_path=True, page_group_size=2)
+
+    assert peak < 1.5 * len(pdf_data)
@@ -0,0 +1,44 @@
+from prompt_serializer import count_tokens, serialize_extraction
+
+
+def chunk(text, page, chunk_type="text"):
+    return {"text": text, "chunk_type": chunk_type, "grounding": [{"page": page, "box": {"l": 0.1, "t": 0.2}}]}
+
+
+def test_every_chunk_text_is_kept_in_page_order():
+    response = {"data": {"markdown": "", "chunks": [
+        chunk("Second page intro", 1),
+        chunk("<a id='c1'></a>\nTitle of the paper", 0, "title"),
+        chunk("| a | b |\n|---|---|\n| 1 | 2 |", 1, "table"),
+        chunk("   ", 0),
+        chunk("First page body <!-- chunk c3 -->\n\n\n\nwith a gap", 0),
+        chunk("Third page", 2),
+    ]}}
+
+    lines = serialize_extraction(response).split("\n")
+
+    assert lines == [
+        "<page 1>",
+        "[title] Title of the paper",
+        "[text] First page body",
+        "",
+        "with a gap",
+        "<page 2>",
+        "[text] Second page intro",
+        "[table] | a | b |",
+        "|---|---|",
+        "| 1 | 2 |",
+        "<page 3>",
+        "[text] Third page",
+    ]
+
+
+def test_response_without_chunks_falls_back_to_the_markdown():
+    response = {"data": {"markdown": "# Title\n\n\n\nBody <a id='x'></a>", "chunks": []}}
+
+    assert serialize_extraction(response) == "# Title\n\nBody"
+
+
+def test_count_tokens_counts_something_for_any_text():
+    assert count_tokens("Hola, mundo") > 0
+    assert count_tokens("word " * 100) > count_tokens("word " * 10)
@@ -0,0 +1,99 @@
+import time
+import pytest
+from resilience import Backend, BackendTimeoutError, CircuitOpenError, FaultInjector, InjectedFault
+
+
+def test_transient_errors_are_retried_with_jittered_backoff():
+    stub = FaultInjector(lambda: "ok", fail_first=2, latency=0)
+    backend = Backend("test", max_attempts=3, base_delay=0.01)
+    delays = []
+
+    assert backend.call(stub, on_retry=lambda error, delay: delays.append(delay)) == "ok"
+    assert stub.calls == 3
+    assert backend.metrics.retries == 2
+    # Exponential ceilings of 0.01s then 0.02s, jittered over their upper half
+    assert 0.005 <= delays[0] <= 0.01
+    assert 0.01 <= delays[1] <= 0.02
+
+
+def test_retry_after_header_sets_the_delay():
+    stub = FaultInjector(lambda: "ok", status_code=429, fail_first=1, latency=0, retry_after=0.05)
+    backend = Backend("test", max_attempts=2, base_delay=10)
+    delays = []
+
+    assert backend.call(stub, on_retry=lambda error, delay: delays.append(delay)) == "ok"
+    assert delays == [0.05]
+
+
+def test_client_errors_are_not_retried():
+    stub = FaultInjector(lambda: "ok", status_code=400, fail_first=1, latency=0)
+    backend = Backend("test", max_attempts=3)
+
+    with pytest.raises(InjectedFault):
+        backend.call(stub)
+    assert stub.calls == 1
+    assert backend.breaker.failures == 0
+
+
+def test_attempt_timeout_releases_the_caller():
+    stub = FaultInjector(lambda: "ok", slow_first=1, slow_latency=0.5, latency=0)
+    backend = Backend("test", timeout=0.05, max_attempts=1)
+
+    start = time.monotonic()
+    with pytest.raises(BackendTimeoutError):
+        backend.call(stub)
+    assert time.monotonic() - start < 0.3
+    assert backend.metrics.timeouts == 1
+
+
+def test_slow_attempt_is_hedged():
+    stub = FaultInjector(lambda: "ok", slow_first=1, slow_latency=0.5, latency=0.01)
+    backend = Backend("test", hedge_after=0.05, max_attempts=1)
+
+    start = time.monotonic()
+    assert backend.call(stub) == "ok"
+    assert time.monotonic() - start < 0.3
+    assert stub.calls == 2
+    assert backend.metrics.hedges == 1
+    assert backend.metrics.hedge_wins == 1
+
+
+def test_breaker_opens_then_half_opens_then_closes():
+    failing = FaultInjector(lambda: "ok", failure_rate=1.0, latency=0)
+    backend = Backend("test", max_attempts=1, failure_threshold=2, reset_timeout=0.05)
+
+    for _ in range(2):
+        with pytest.raises(InjectedFault):
+            backend.call(failing)
+    assert backend.breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        backend.call(failing)
+    assert failing.calls == 2
+    assert backend.metrics.short_circuits == 1
+
+    # A failed probe opens the circuit again
+    time.sleep(0.06)
+    with pytest.raises(InjectedFault):
+        backend.call(failing)
+    assert backend.breaker.state == "open"
+
+    time.sleep(0.06)
+    assert backend.call(FaultInjector(lambda: "ok", latency=0)) == "ok"
+    assert backend.breaker.state == "closed"
+    assert backend.breaker.failures == 0
+
+
+def test_probe_that_fails_before_its_attempt_does_not_block_the_breaker():
+    failing = FaultInjector(lambda: "ok", failure_rate=1.0, latency=0)
+    backend = Backend("test", max_attempts=1, failure_threshold=1, reset_timeout=0.05)
+    with pytest.raises(InjectedFault):
+        backend.call(failing)
+    time.sleep(0.06)
+
+    def rate_limiter_error():
+        raise RuntimeError("rate limiter unavailable")
+
+    with pytest.raises(RuntimeError):
+        backend.call(failing, before_attempt=rate_limiter_error)
+    assert backend.call(FaultInjector(lambda: "ok", latency=0)) == "ok"
+    assert backend.breaker.state == "closed"
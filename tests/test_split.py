@@ -0,0 +1,75 @@
+import io
+import os
+import time
+
+from conftest import build_pdf
+from pypdf import PdfReader, PdfWriter
+from spliter_doc.split import iter_split_files, page_fingerprint, parse_page_range, plan_chunks
+
+
+def test_parse_page_range():
+    assert parse_page_range(None) is None
+    assert parse_page_range("") is None
+    assert parse_page_range("10-11, 8,,1-3,2") == [1, 2, 3, 8, 10, 11]
+
+
+def test_plan_chunks():
+    assert plan_chunks(3) == [[0], [1], [2]]
+    assert plan_chunks(5, pages_per_chunk=2) == [[0, 1], [2, 3], [4]]
+    # 1-indexed range, pages past the end are dropped
+    assert plan_chunks(5, page_range=[2, 3, 5, 9], pages_per_chunk=2) == [[1, 2], [4]]
+    assert plan_chunks(0) == []
+
+
+def test_unchanged_outputs_are_skipped_until_the_source_changes(tmp_path):
+    source = tmp_path / "doc.pdf"
+    source.write_bytes(build_pdf(3))
+    output_dir = tmp_path / "split"
+
+    first = list(iter_split_files([str(source)], str(output_dir), pages_per_chunk=2, workers=1))
+    second = list(iter_split_files([str(source)], str(output_dir), pages_per_chunk=2, workers=1))
+    future = time.time() + 10
+    os.utime(source, (future, future))
+    third = list(iter_split_files([str(source)], str(output_dir), pages_per_chunk=2, workers=1))
+
+    names = [os.path.basename(path) for path, _ in first]
+    assert names == ["doc_pages_1-2.pdf", "doc_page_3.pdf"]
+    assert [created for _, created in first] == [True, True]
+    assert [created for _, created in second] == [False, False]
+    assert [created for _, created in third] == [True, True]
+    assert len(PdfReader(str(output_dir / "doc_pages_1-2.pdf")).pages) == 2
+
+
+def test_pool_splits_every_file_and_reports_broken_ones(tmp_path):
+    paths = []
+    for index in range(5):
+        path = tmp_path / f"doc{index}.pdf"
+        path.write_bytes(build_pdf(3))
+        paths.append(str(path))
+    broken = tmp_path / "broken.pdf"
+    broken.write_bytes(b"%PDF-1.7 not really a pdf")
+    errors = []
+
+    artifacts = list(iter_split_files(paths + [str(broken)], str(tmp_path / "split"), workers=2,
+                                      on_error=lambda path, error: errors.append(path)))
+
+    assert sorted(os.path.basename(path) for path, _ in artifacts) == sorted(
+        f"doc{index}_page_{page}.pdf" for index in range(5) for page in range(1, 4)
+    )
+    assert errors == [str(broken)]
+
+
+def test_page_fingerprint_follows_page_content_not_object_numbers():
+    original = PdfReader(io.BytesIO(build_pdf(3)))
+    writer = PdfWriter()
+    for index in (2, 0, 1):
+        writer.add_page(original.pages[index])
+    output = io.BytesIO()
+    writer.write(output)
+    reordered = PdfReader(output)
+    edited = PdfReader(io.BytesIO(build_pdf(3, image_pages={1})))
+
+    assert page_fingerprint(reordered.pages[1]) == page_fingerprint(original.pages[0])
+    assert page_fingerprint(edited.pages[0]) == page_fingerprint(original.pages[0])
+    assert page_fingerprint(edited.pages[1]) != page_fingerprint(original.pages[1])
+    assert page_fingerprint(original.pages[1]) != page_fingerprint(original.pages[2])
@@ -0,0 +1,10 @@
+from bench_support import APP_STARTUP_MODULES, import_time_ms
+
+# Import time allowed for the modules app.py imports before rendering the page
+STARTUP_BUDGET_MS = 100
+
+
+def test_app_startup_imports_fit_the_budget():
+    timings = sorted(import_time_ms(APP_STARTUP_MODULES) for _ in range(3))
+
+    assert timings[1] <= STARTUP_BUDGET_MS, f"startup imports take {timings[1]:.1f} ms"
@@ -0,0 +1,98 @@
+import os
+import time
+
+import pytest
+from storage import BLOB_GRACE_SECONDS, SessionStorage
+
+
+@pytest.fixture
+def storage(tmp_path):
+    # Collections only run when a test calls collect()
+    return SessionStorage(storage_dir=str(tmp_path / "sessions"), max_size_bytes=250, max_age_seconds=3600,
+                          memory_bytes=8, gc_interval=3600)
+
+
+def age(path, seconds):
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+
+def session_ids(storage):
+    return sorted(os.listdir(storage.session_root))
+
+
+def test_least_recently_active_sessions_are_removed_over_the_quota(storage):
+    for index, session_id in enumerate(["a", "b", "c"]):
+        storage.put_bytes(session_id, bytes([index]) * 100, ".pdf")
+        age(storage._session_dir(session_id), 300 - index)
+
+    stats = storage.collect(keep="a")
+
+    # "a" is the oldest but is kept, so "b" goes instead
+    assert session_ids(storage) == ["a", "c"]
+    assert stats["blobs"] == 2
+    assert stats["disk_bytes"] == 200
+
+
+def test_idle_sessions_are_removed_unless_kept(storage):
+    for session_id in ["idle", "active", "current"]:
+        storage.put_bytes(session_id, session_id.encode("utf-8"))
+    age(storage._session_dir("idle"), 2 * 3600)
+    age(storage._session_dir("current"), 2 * 3600)
+
+    storage.collect(keep="current")
+
+    assert session_ids(storage) == ["active", "current"]
+
+
+def test_blobs_no_session_links_to_are_removed_after_the_grace_period(storage):
+    path = storage.put_bytes("a", b"shared", ".txt")
+    storage.put_bytes("b", b"shared", ".txt")
+    blob_path = os.path.join(storage.blob_dir, os.path.basename(path))
+    storage.end_session("a")
+    storage.collect()
+    assert os.path.exists(blob_path)
+
+    storage.end_session("b")
+    storage.collect()
+    # A writer may be about to link a new blob
+    assert os.path.exists(blob_path)
+
+    age(blob_path, BLOB_GRACE_SECONDS + 1)
+    storage.collect()
+    assert not os.path.exists(blob_path)
+
+
+def test_memory_cache_keeps_the_most_recently_read_texts(storage):
+    first = storage.put_text("a", "uno")
+    second = storage.put_text("a", "dos")
+    storage.read_text(first)
+    third = storage.put_text("a", "tres")
+
+    stats = storage.stats()
+    assert stats["memory_bytes"] <= 8
+    assert stats["memory_entries"] == 2
+    # "dos" was dropped from memory but is still read from disk
+    assert storage.read_text(second) == "dos"
+    assert storage.memory_misses == 1
+    assert storage.read_text(third) == "tres"
+    assert storage.read_text(first) == "uno"
+
+
+def test_sessions_get_copies_without_hard_links(storage, monkeypatch):
+    def no_link(source, destination):
+        raise OSError("hard links are not supported")
+
+    monkeypatch.setattr(os, "link", no_link)
+    for index, session_id in enumerate(["a", "b", "c"]):
+        path = storage.put_bytes(session_id, bytes([index]) * 100, ".pdf")
+        age(storage._session_dir(session_id), 300 - index)
+
+    with open(path, "rb") as f:
+        assert f.read() == bytes([2]) * 100
+
+    stats = storage.collect()
+
+    # The copies count towards the quota
+    assert session_ids(storage) == ["b", "c"]
+    assert stats["disk_bytes"] <= 250
@@ -0,0 +1,29 @@
+import time
+from bench_support import replay_llm_class
+from md_generator import stream_json_to_markdown
+
+FIRST_TOKEN_LATENCY = 0.05
+CHUNK_LATENCY = 0.001
+
+
+def document(windows):
+    chunks = [{"text": f"Section {index} " + "word " * 40, "chunk_type": "text"} for index in range(windows)]
+    return {"data": {"chunks": chunks}}
+
+
+def test_first_content_arrives_with_the_first_tokens():
+    answer = "\n\n".join(f"## Sección {index}\n\n" + "Contenido del documento. " * 12 for index in range(25))
+    llm = replay_llm_class([f"```markdown\n{answer}\n```"], FIRST_TOKEN_LATENCY, CHUNK_LATENCY)(model_name="replay")
+
+    start = time.perf_counter()
+    stream = stream_json_to_markdown(document(3), llm=llm, max_tokens=60, max_workers=2)
+    first_piece = next(stream)
+    time_to_first_content = time.perf_counter() - start
+    markdown = first_piece + "".join(stream)
+    total_time = time.perf_counter() - start
+
+    assert markdown.startswith("## Sección 0")
+    assert markdown.count("## Sección 0") == 3
+    # The first window is read chunk by chunk instead of after its whole completion
+    assert time_to_first_content < FIRST_TOKEN_LATENCY + 0.05
+    assert time_to_first_content < 0.4 * total_time
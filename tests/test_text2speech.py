@@ -0,0 +1,61 @@
+import os
+import wave
+
+from conftest import FakeSynthesizer, pcm_for
+from text2speech import split_narration, synthesize_long_text
+
+
+def test_segments_never_span_paragraphs():
+    text = "First one. Second one.\n\nThird one.\n  \nFourth one."
+
+    assert split_narration(text, max_chars=100) == ["First one. Second one.", "Third one.", "Fourth one."]
+
+
+def test_sentences_are_packed_up_to_the_segment_size():
+    text = "Alpha beta. Gamma delta! Epsilon zeta? Eta theta."
+
+    assert split_narration(text, max_chars=25) == ["Alpha beta. Gamma delta!", "Epsilon zeta? Eta theta."]
+
+
+def test_long_sentence_is_split_at_word_boundaries():
+    text = "one two three four five six seven eight nine ten."
+
+    segments = split_narration(text, max_chars=15)
+
+    assert all(len(segment) <= 15 for segment in segments)
+    assert " ".join(segments) == text
+    assert segments[0] == "one two three"
+
+
+def test_parallel_segments_are_stitched_in_reading_order(tmp_path):
+    segments_dir = tmp_path / "segments"
+    segments_dir.mkdir()
+    text = "First sentence here. Second sentence here. Third sentence here. Fourth sentence here."
+    segments = split_narration(text, max_chars=25)
+    # The first segment finishes last
+    synthesizer = FakeSynthesizer(str(segments_dir), delay=lambda segment: 0.2 if segment == segments[0] else 0.0)
+    ready = []
+
+    audio_path, metrics, _ = synthesize_long_text(
+        text, str(tmp_path / "narration.wav"), synthesizer=synthesizer, max_workers=4,
+        on_segment=lambda index, path: ready.append(index), max_chars=25
+    )
+
+    assert len(segments) == 4
+    assert ready == [0, 1, 2, 3]
+    assert [metric["chars"] for metric in metrics] == [len(segment) for segment in segments]
+    with wave.open(audio_path, "rb") as stitched:
+        assert stitched.readframes(stitched.getnframes()) == b"".join(pcm_for(segment) for segment in segments)
+
+
+def test_segment_files_are_deleted_once_stitched(tmp_path):
+    segments_dir = tmp_path / "segments"
+    segments_dir.mkdir()
+    synthesizer = FakeSynthesizer(str(segments_dir))
+
+    audio_path, _, _ = synthesize_long_text("One. Two.\n\nThree.", str(tmp_path / "narration.wav"),
+                                            synthesizer=synthesizer)
+
+    assert len(synthesizer.texts) == 2
+    assert os.listdir(segments_dir) == []
+    assert os.path.exists(audio_path)
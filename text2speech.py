@@ -1,50 +1,300 @@
-from gradio_client import Client
+import contextlib
+import os
+import re
+import shutil
+import threading
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from audio_cache import AudioCache
+from resilience import get_backend
+from tracing import get_tracer, in_current_context
 
-def text_to_speech(input_file_path, output_file_path="output_audio.wav", voice_name=None, speed=1.0):
+DEFAULT_SPACE = "Remsky/Kokoro-TTS-Zero"
+DEFAULT_SEGMENT_CHARS = 600
+DEFAULT_TTS_WORKERS = 3
+
+SENTENCE_END = re.compile(r"(?<=[.!?…])\s+")
+
+
+class KokoroSynthesizer:
+    """Synthesize one text segment with the Kokoro-TTS-Zero Gradio space
+
+    Any callable with the same signature, (text, voice_name, speed) returning
+    (wav_path, metrics, performance), can be used instead, e.g. a local fake
+    for testing.
+    """
+
+    def __init__(self, space=DEFAULT_SPACE):
+        self.space = space
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                # gradio_client is slow to import, so load it on first use
+                from gradio_client import Client
+
+                self._client = Client(self.space)
+            return self._client
+
+    def __call__(self, text, voice_name=None, speed=1.0):
+        return self.client.predict(
+            text=text,
+            voice_names=voice_name,
+            speed=speed,
+            api_name="/generate_speech_from_ui"
+        )
+
+
+_synthesizer = None
+_audio_cache = None
+_registry_lock = threading.Lock()
+
+
+def get_synthesizer():
+    """Return the process-wide Kokoro synthesizer
+
+    The Gradio client fetches the space config when it connects, so one
+    client is shared by every call instead of being rebuilt each time.
+    """
+    global _synthesizer
+    with _registry_lock:
+        if _synthesizer is None:
+            _synthesizer = KokoroSynthesizer()
+        return _synthesizer
+
+
+def get_audio_cache():
+    """Return the process-wide audio cache"""
+    global _audio_cache
+    with _registry_lock:
+        if _audio_cache is None:
+            _audio_cache = AudioCache()
+        return _audio_cache
+
+
+def split_narration(text, max_chars=DEFAULT_SEGMENT_CHARS):
+    """Split text into segments at paragraph and sentence boundaries
+
+    Sentences are packed into segments of at most max_chars; a single
+    sentence longer than that is split at word boundaries.
+
+    Args:
+        text (str): Narration text
+        max_chars (int): Maximum characters per segment
+
+    Returns:
+        list: Text segments in reading order
+    """
+    segments = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        current = ""
+        for sentence in SENTENCE_END.split(paragraph.strip()):
+            sentence = " ".join(sentence.split())
+            while len(sentence) > max_chars:
+                cut = sentence.rfind(" ", 0, max_chars)
+                cut = cut if cut > 0 else max_chars
+                if current:
+                    segments.append(current)
+                    current = ""
+                segments.append(sentence[:cut])
+                sentence = sentence[cut:].strip()
+            if not sentence:
+                continue
+            if current and len(current) + 1 + len(sentence) > max_chars:
+                segments.append(current)
+                current = sentence
+            else:
+                current = f"{current} {sentence}" if current else sentence
+        if current:
+            segments.append(current)
+    return segments
+
+
+def concatenate_wavs(wav_paths, output_path):
+    """Join WAV files by copying their PCM frames, without re-encoding
+
+    Args:
+        wav_paths (list): WAV files in playback order, all with the same format
+        output_path (str): Path of the joined WAV file
+
+    Returns:
+        str: output_path
+    """
+    params = None
+    with wave.open(output_path, "wb") as output:
+        for path in wav_paths:
+            with wave.open(path, "rb") as segment:
+                segment_params = segment.getparams()[:3]
+                if params is None:
+                    params = segment_params
+                    output.setparams(segment.getparams())
+                elif segment_params != params:
+                    raise ValueError(f"WAV format mismatch in {path}: {segment_params} != {params}")
+                output.writeframes(segment.readframes(segment.getnframes()))
+    return output_path
+
+
+def _synthesize_segment(synthesizer, index, text, voice_name, speed):
+    """Synthesize one segment under the "kokoro" backend policy
+
+    Failed segments are retried on their own, slow ones are hedged and a hung
+    call is abandoned after KOKORO_TIMEOUT seconds.
+    """
+    with get_tracer().span("tts.segment", index=index, text_chars=len(text)) as span:
+        audio_path, metrics, performance = get_backend("kokoro").call(
+            lambda: synthesizer(text, voice_name, speed)
+        )
+        span.set_attribute("remote_metrics", str(metrics))
+        span.set_attribute("remote_performance", str(performance))
+        return audio_path, metrics, performance
+
+
+def iter_speech_segments(text, voice_name=None, speed=1.0, synthesizer=None,
+                         max_workers=DEFAULT_TTS_WORKERS, max_chars=DEFAULT_SEGMENT_CHARS):
+    """Synthesize narration segments concurrently, yielding them in order
+
+    The first segment is yielded as soon as it is ready, while the following
+    segments are still being synthesized.
+
+    Args:
+        text (str): Narration text
+        voice_name (str, optional): Name of the voice to use
+        speed (float, optional): Speech speed multiplier
+        synthesizer (callable, optional): Segment backend, the shared Kokoro synthesizer by default
+        max_workers (int): Segments synthesized in parallel
+        max_chars (int): Maximum characters per segment
+
+    Yields:
+        tuple: (index, wav_path, metrics, performance)
+    """
+    synthesizer = synthesizer or get_synthesizer()
+    segments = split_narration(text, max_chars)
+    synthesize = in_current_context(_synthesize_segment)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(synthesize, synthesizer, index, segment, voice_name, speed)
+            for index, segment in enumerate(segments)
+        ]
+        try:
+            for index, future in enumerate(futures):
+                yield (index, *future.result())
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def synthesize_long_text(text, output_file_path, voice_name=None, speed=1.0, synthesizer=None,
+                         max_workers=DEFAULT_TTS_WORKERS, on_segment=None, max_chars=DEFAULT_SEGMENT_CHARS):
+    """Synthesize a narration segment by segment and stitch it into one WAV file
+
+    Args:
+        text (str): Narration text
+        output_file_path (str): Path of the stitched WAV file
+        voice_name (str, optional): Name of the voice to use
+        speed (float, optional): Speech speed multiplier
+        synthesizer (callable, optional): Segment backend, the shared Kokoro synthesizer by default
+        max_workers (int): Segments synthesized in parallel
+        on_segment (callable, optional): Called as on_segment(index, wav_path)
+            when each segment is ready, e.g. to play the first one early
+        max_chars (int): Maximum characters per segment
+
+    The segment files returned by the synthesizer (Gradio downloads them to
+    a temporary directory) are deleted once they are stitched, or when the
+    synthesis fails.
+
+    Returns:
+        tuple: (audio_path, metrics, performance_summary), with per-segment lists
+    """
+    wav_paths, metrics, performance = [], [], []
+    try:
+        for index, wav_path, segment_metrics, segment_performance in iter_speech_segments(
+                text, voice_name, speed, synthesizer, max_workers, max_chars):
+            wav_paths.append(wav_path)
+            metrics.append(segment_metrics)
+            performance.append(segment_performance)
+            if on_segment:
+                on_segment(index, wav_path)
+        if not wav_paths:
+            raise ValueError("No text to synthesize")
+        return concatenate_wavs(wav_paths, output_file_path), metrics, performance
+    finally:
+        for wav_path in wav_paths:
+            if os.path.abspath(wav_path) != os.path.abspath(output_file_path):
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(wav_path)
+
+
+def text_to_speech(input_file_path, output_file_path="output_audio.wav", voice_name=None, speed=1.0,
+                   synthesizer=None, max_workers=DEFAULT_TTS_WORKERS, on_segment=None, use_cache=True):
     """Convert text from a file to speech using Kokoro-TTS-Zero
     
+    The text is split at sentence boundaries and the segments are synthesized
+    in parallel, then stitched into output_file_path. Narrations already
+    synthesized with the same voice and speed are copied from the audio cache.
+
     Args:
         input_file_path (str): Path to the input text file
         output_file_path (str): Path to save the output audio file
         voice_name (str, optional): Name of the voice to use
         speed (float, optional): Speech speed multiplier
+        synthesizer (callable, optional): Segment backend, the shared Kokoro synthesizer by default
+        max_workers (int): Segments synthesized in parallel
+        on_segment (callable, optional): Called as on_segment(index, wav_path) per ready segment
+        use_cache (bool): Serve and store the narration in the audio cache
     
     Returns:
         tuple: (audio_path, metrics, performance_summary)
     """
-    try:
-        # Read text from file
-        with open(input_file_path, 'r', encoding='utf-8') as file:
-            text_content = file.read().strip()
-        
-        if not text_content:
-            raise ValueError("Input file is empty")
+    with get_tracer().span("tts", voice=voice_name, speed=speed) as span:
+        try:
+            # Read text from file
+            with open(input_file_path, 'r', encoding='utf-8') as file:
+                text_content = file.read().strip()
         
-        # Initialize Kokoro-TTS-Zero client
-        client = Client("Remsky/Kokoro-TTS-Zero")
+            if not text_content:
+                raise ValueError("Input file is empty")
+            span.set_attribute("text_chars", len(text_content))
         
-        # Generate speech
-        result = client.predict(
-            text=text_content,
-            voice_names=voice_name,
-            speed=speed,
-            api_name="/generate_speech_from_ui"
-        )
+            cache = get_audio_cache() if use_cache else None
+            cache_key = cache.make_key(text_content, voice_name, speed) if cache else None
+            cached_path = cache.get(cache_key) if cache else None
+            span.set_attribute("cache_hit", cached_path is not None)
+            if cached_path:
+                # Copy so a later eviction cannot remove audio that is being served
+                shutil.copyfile(cached_path, output_file_path)
+                print(f"Audio served from cache: {output_file_path}")
+                return output_file_path, [], []
         
-        # Unpack results
-        audio_path, metrics, performance = result
+            # Generate speech segment by segment
+            result = synthesize_long_text(
+                text_content,
+                output_file_path,
+                voice_name=voice_name,
+                speed=speed,
+                synthesizer=synthesizer,
+                max_workers=max_workers,
+                on_segment=on_segment
+            )
         
-        print(f"Audio generated successfully: {audio_path}")
-        print(f"Performance summary: {performance}")
+            audio_path, metrics, performance = result
+            span.set_attribute("segments", len(metrics))
+            if cache:
+                cache.set(cache_key, audio_path)
+            print(f"Audio generated successfully: {audio_path}")
         
-        return result
+            return result
         
-    except FileNotFoundError:
-        print(f"Error: Input file '{input_file_path}' not found")
-        return None
-    except Exception as e:
-        print(f"Error during text-to-speech conversion: {str(e)}")
-        return None
+        except FileNotFoundError:
+            span.status, span.error = "error", "Input file not found"
+            print(f"Error: Input file '{input_file_path}' not found")
+            return None
+        except Exception as e:
+            span.status, span.error = "error", str(e)
+            print(f"Error during text-to-speech conversion: {str(e)}")
+            return None
 
 # Example usage
 if __name__ == "__main__":
@@ -0,0 +1,15 @@
+import unicodedata
+
+
+def normalize_text(text):
+    """Normalize text so formatting-only differences share a cache entry
+
+    Used for the audio and LLM cache keys.
+
+    Args:
+        text (str): Text to normalize
+
+    Returns:
+        str: NFC-normalized text with collapsed whitespace
+    """
+    return " ".join(unicodedata.normalize("NFC", text).split())
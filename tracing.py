@@ -0,0 +1,219 @@
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+MAX_SPANS = 10000
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """A timed pipeline stage with free-form attributes"""
+
+    def __init__(self, name, trace_id, parent_id=None, attributes=None, start=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.start = start if start is not None else time.time()
+        self.end = None
+        self.status = "ok"
+        self.error = None
+
+    @property
+    def duration_ms(self):
+        if self.end is None:
+            return None
+        return (self.end - self.start) * 1000
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def to_dict(self):
+        """Return the span as a flat record, one JSON line per span"""
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "end": self.end,
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+    def to_otel(self):
+        """Return the span in the OpenTelemetry (OTLP/JSON) span layout"""
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "startTimeUnixNano": int(self.start * 1e9),
+            "endTimeUnixNano": int((self.end or self.start) * 1e9),
+            "attributes": [
+                {"key": key, "value": _otel_value(value)}
+                for key, value in self.attributes.items()
+                if value is not None
+            ],
+            "status": {"code": 2, "message": self.error} if self.status == "error" else {"code": 1},
+        }
+
+
+def _otel_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class Tracer:
+    """Collects finished spans in memory, optionally appending them to a JSON lines file
+
+    Set TRACE_JSONL_PATH to stream every finished span to disk.
+    """
+
+    def __init__(self, max_spans=MAX_SPANS, export_path=None):
+        self._spans = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+        self.export_path = export_path or os.getenv("TRACE_JSONL_PATH")
+
+    def _start(self, name, attributes, start=None):
+        parent = _current_span.get()
+        trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        return Span(name, trace_id, parent.span_id if parent else None, attributes, start)
+
+    def _finish(self, span):
+        with self._lock:
+            self._spans.append(span)
+            if self.export_path:
+                with open(self.export_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(span.to_dict(), default=str) + "\n")
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """Time a block of code as a child of the current span
+
+        Args:
+            name (str): Stage name, e.g. "llm.invoke"
+            **attributes: Initial span attributes
+
+        Yields:
+            Span: The running span, to add attributes to
+        """
+        span = self._start(name, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "error"
+            span.error = str(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end = time.time()
+            self._finish(span)
+
+    def record_span(self, name, start, end, status="ok", error=None, **attributes):
+        """Record a stage whose boundaries were measured by the caller
+
+        Args:
+            name (str): Stage name
+            start (float): Start time (epoch seconds)
+            end (float): End time (epoch seconds)
+            status (str): "ok" or "error"
+            error (str, optional): Error message for failed stages
+            **attributes: Span attributes
+
+        Returns:
+            Span: The recorded span
+        """
+        span = self._start(name, attributes, start)
+        span.end = end
+        span.status = status
+        span.error = error
+        self._finish(span)
+        return span
+
+    def spans(self, trace_id=None):
+        """Return finished spans, optionally only those of one trace"""
+        with self._lock:
+            spans = list(self._spans)
+        if trace_id:
+            spans = [span for span in spans if span.trace_id == trace_id]
+        return spans
+
+    def summary(self, trace_id=None):
+        """Aggregate span durations by stage name
+
+        Returns:
+            list: Dicts with name, count, total_ms and avg_ms, slowest stage first
+        """
+        stages = {}
+        for span in self.spans(trace_id):
+            stage = stages.setdefault(span.name, {"name": span.name, "count": 0, "total_ms": 0.0})
+            stage["count"] += 1
+            stage["total_ms"] += span.duration_ms or 0.0
+        for stage in stages.values():
+            stage["avg_ms"] = stage["total_ms"] / stage["count"]
+        return sorted(stages.values(), key=lambda stage: stage["total_ms"], reverse=True)
+
+    def export_jsonl(self, path, trace_id=None):
+        """Write finished spans to a JSON lines file"""
+        with open(path, "w", encoding="utf-8") as f:
+            for span in self.spans(trace_id):
+                f.write(json.dumps(span.to_dict(), default=str) + "\n")
+
+    def to_otel(self, trace_id=None):
+        """Return finished spans as an OTLP/JSON resourceSpans payload"""
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": "doc2mark"}}]},
+                "scopeSpans": [{
+                    "scope": {"name": "tracing"},
+                    "spans": [span.to_otel() for span in self.spans(trace_id)],
+                }],
+            }]
+        }
+
+    def clear(self):
+        with self._lock:
+            self._spans.clear()
+
+
+_tracer = Tracer()
+
+
+def get_tracer():
+    """Return the process-wide tracer"""
+    return _tracer
+
+
+def current_span():
+    """Return the span running in the current context, or None"""
+    return _current_span.get()
+
+
+def in_current_context(fn):
+    """Wrap a callable so it runs with the caller's span as parent
+
+    Thread pools do not propagate context variables; wrap functions before
+    submitting them so their spans stay in the caller's trace.
+    """
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return context.copy().run(fn, *args, **kwargs)
+
+    return run